@@ -0,0 +1,102 @@
+"""On-disk cache of parsed logs and analysis results, keyed on log fingerprints and analysis parameters."""
+import hashlib
+import os
+import pickle
+from .log_parser import parse_log
+
+ANALYSIS_CACHE_DIR = '.analysis_cache'
+ANALYSIS_CACHE_MAX_BYTES = 512 * 1024 * 1024
+CACHE_VERSION = 3  # bump when parse_log or analyze_run results change
+
+
+def fingerprint(path):
+    """(absolute path, size, mtime in ns) of a file, or None if it does not exist."""
+    if path is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+
+class AnalysisCache:
+    """
+    :param directory: Cache folder, created on first write.
+    :param max_bytes: Least recently used entries are removed once the folder grows past this.
+    """
+
+    def __init__(self, directory=ANALYSIS_CACHE_DIR, max_bytes=ANALYSIS_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(self, kind, *parts):
+        digest = hashlib.sha1(repr((CACHE_VERSION, kind) + parts).encode()).hexdigest()
+        return f"{kind}-{digest}"
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    def get(self, key):
+        """Cached object or None; a hit marks the entry as recently used."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            print(f"Ignoring unreadable cache entry {path}: {e}")
+            return None
+        return value
+
+    def put(self, key, value):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        try:
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if entry.name.endswith('.pkl'):
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        except FileNotFoundError:
+            return
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        max_bytes, self.max_bytes = self.max_bytes, -1
+        self.evict()
+        self.max_bytes = max_bytes
+
+    def parse(self, path):
+        """parse_log through the cache."""
+        key = self.key('parse', fingerprint(path))
+        frame = self.get(key)
+        if frame is None:
+            frame = parse_log(path)
+            self.put(key, frame)
+        return frame
+
+    def result_key(self, temperature_path, uv_path, **params):
+        return self.key('result', fingerprint(temperature_path), fingerprint(uv_path), sorted(params.items()))
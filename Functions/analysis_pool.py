@@ -0,0 +1,94 @@
+"""Process pool that analyses one sensor log per task for the Data Analysis tab."""
+import concurrent.futures
+import multiprocessing
+import os
+from .lcst_analysis import analyze_run
+
+TEMPERATURE_LOG_PREFIX = "temperature_log_sensor_"
+
+
+def find_runs(folders):
+    """
+    One (folder, sensor, temperature log, UV log or None) tuple per temperature log,
+    in folder order and then by sensor number.
+    """
+    runs = []
+    for folder in folders:
+        sensors = []
+        for file in os.listdir(folder):
+            sensor = file[len(TEMPERATURE_LOG_PREFIX):-len(".txt")]
+            if file.startswith(TEMPERATURE_LOG_PREFIX) and file.endswith(".txt") and sensor.isdigit():
+                sensors.append(int(sensor))
+        for sensor in sorted(sensors):
+            uv_path = os.path.join(folder, f"uv_log_sensor_{sensor}.txt")
+            runs.append((folder, sensor, os.path.join(folder, f"{TEMPERATURE_LOG_PREFIX}{sensor}.txt"),
+                         uv_path if os.path.exists(uv_path) else None))
+    return runs
+
+
+def analyze_and_store(cache, key, temperature_path, uv_path, params):
+    """Worker task: analyze_run through the cache, storing the result under `key`."""
+    result = analyze_run(temperature_path, uv_path, cache=cache, **params)
+    cache.put(key, result)
+    return result
+
+
+class AnalysisPool:
+    """
+    Process pool for log analysis, created on first use and kept for later analyses.
+    :param max_workers: Worker processes; None uses one per CPU.
+    :param cache: AnalysisCache for parsed logs and results; None disables caching.
+    """
+
+    def __init__(self, max_workers=None, cache=None):
+        self.max_workers = max_workers
+        self.cache = cache
+        self.executor = None
+        self.futures = []
+        self.batch = 0
+
+    def submit(self, runs, on_result, **params):
+        """
+        Cancel the current batch and analyse `runs` (from find_runs).
+        on_result(batch, run, future) is called as each run finishes or is cancelled: from a
+        pool thread, or right away for cached results. Results whose batch is no longer
+        current should be ignored.
+        :param params: Passed to analyze_run (window_minutes, rolling_window).
+        :return: Batch number.
+        """
+        self.cancel()
+        batch = self.batch
+        for run in runs:
+            if self.cache is None:
+                future = self._executor().submit(analyze_run, run[2], run[3], **params)
+            else:
+                key = self.cache.result_key(run[2], run[3], **params)
+                result = self.cache.get(key)
+                if result is None:
+                    future = self._executor().submit(analyze_and_store, self.cache, key, run[2], run[3], params)
+                else:
+                    future = concurrent.futures.Future()
+                    future.set_result(result)
+            future.add_done_callback(lambda future, run=run: on_result(batch, run, future))
+            self.futures.append(future)
+        return batch
+
+    def _executor(self):
+        if self.executor is None:
+            # Forking a process that runs the Qt and hardware-runtime threads is not safe
+            self.executor = concurrent.futures.ProcessPoolExecutor(self.max_workers,
+                                                                   mp_context=multiprocessing.get_context('spawn'))
+        return self.executor
+
+    def cancel(self):
+        """Drop queued tasks of the current batch; tasks already running finish and are ignored."""
+        for future in self.futures:
+            future.cancel()
+        self.futures = []
+        self.batch += 1
+
+    def shutdown(self):
+        self.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
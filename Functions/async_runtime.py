@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+
+
+class HardwareRuntime:
+    """
+    Single asyncio event loop, running in one background thread, that multiplexes serial
+    ingestion, control loops, sweeps and motor jobs as named tasks.
+    :param clock: Clock object (time module or ScaledClock); sleeps are scaled by its speedup.
+    :param on_task_done: Optional callable(name, exception) invoked when a task finishes; exception is
+                         None on success and asyncio.CancelledError for a cancelled task. Pass a bound
+                         pyqtSignal.emit to deliver completions on the Qt thread.
+    """
+
+    def __init__(self, clock=time, on_task_done=None):
+        self.clock = clock
+        self.speedup = getattr(clock, 'speedup', 1.0)
+        self.on_task_done = on_task_done
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, name='HardwareRuntime', daemon=True)
+        self.tasks = {}  # name -> asyncio.Task, only touched from the loop thread
+
+    def start(self):
+        self.thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def sleep(self, seconds):
+        """Sleep for `seconds` of (possibly simulated) clock time."""
+        await asyncio.sleep(seconds / self.speedup)
+
+    def now(self):
+        return self.clock.monotonic()
+
+    def submit(self, name, coro):
+        """
+        Schedule a coroutine as a named task; safe to call from any thread.
+        Returns the asyncio.Task, or None if a task with that name is still running.
+        """
+        if threading.current_thread() is self.thread:
+            return self._create_task(name, coro)
+
+        async def create():
+            return self._create_task(name, coro)
+        return asyncio.run_coroutine_threadsafe(create(), self.loop).result()
+
+    def _create_task(self, name, coro):
+        if self.is_running(name):
+            coro.close()
+            return None
+        task = self.loop.create_task(self._run_task(name, coro), name=name)
+        self.tasks[name] = task
+        return task
+
+    async def _run_task(self, name, coro):
+        task = asyncio.current_task()
+        error = None
+        try:
+            return await coro
+        except asyncio.CancelledError as e:
+            error = e
+            raise
+        except Exception as e:
+            error = e
+            print(f"Task {name} failed: {e}")
+        finally:
+            if self.tasks.get(name) is task:
+                del self.tasks[name]
+            if self.on_task_done:
+                self.on_task_done(name, error)
+
+    def is_running(self, name):
+        task = self.tasks.get(name)
+        return task is not None and not task.done()
+
+    def cancel(self, name):
+        """Request cancellation of a named task; its finally blocks run on the loop thread."""
+        self.loop.call_soon_threadsafe(self._cancel, name)
+
+    def _cancel(self, name):
+        task = self.tasks.get(name)
+        if task is not None:
+            task.cancel()
+
+    def shutdown(self, timeout=5):
+        """Cancel every task, wait for their cleanup, then stop the loop and join its thread."""
+        if not self.thread.is_alive():
+            return
+
+        async def cancel_all():
+            tasks = [task for task in self.tasks.values() if not task.done()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(cancel_all(), self.loop).result(timeout)
+        except Exception as e:
+            print(f"Error while cancelling runtime tasks: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+        print("Hardware runtime stopped")
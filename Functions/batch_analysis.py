@@ -0,0 +1,119 @@
+"""Headless LCST analysis of every run below the given folders: python -m Functions.batch_analysis Data"""
+import argparse
+import concurrent.futures
+import os
+import re
+import pandas as pd
+from .analysis_pool import AnalysisPool, find_runs, TEMPERATURE_LOG_PREFIX
+from .analysis_cache import AnalysisCache
+from .lcst_analysis import HOLD_WINDOW_MINUTES, ROLLING_WINDOW, NORMALIZE_TAIL
+
+RUN_FOLDER_PATTERN = re.compile(r'Sensor\d+_\d{8}_\d{6}')
+MIN_HOLDS = NORMALIZE_TAIL + 2  # with fewer holds the 0 % reference reaches back to the first holds
+RESULT_COLUMNS = ['run', 'sensor', 'lcst', 'crossing_slope', 'lcst_low', 'lcst_high', 'sigmoid_lcst', 'sigmoid_width',
+                  'sigmoid_lcst_low', 'sigmoid_lcst_high', 'n_holds', 'n_samples', 'flags', 'folder']
+
+
+def find_run_folders(roots):
+    """Run folders at or below each root, sorted: sweep folders and any folder holding temperature logs."""
+    folders = []
+    for root in roots:
+        for directory, subdirectories, files in os.walk(root):
+            if (RUN_FOLDER_PATTERN.fullmatch(os.path.basename(os.path.normpath(directory)))
+                    or any(file.startswith(TEMPERATURE_LOG_PREFIX) for file in files)):
+                folders.append(directory)
+                subdirectories[:] = []
+    return sorted(set(folders))
+
+
+def quality_flags(uv_path, result):
+    """Reasons a run's LCST should not be trusted as is; an empty list for a clean run."""
+    flags = []
+    if uv_path is None:
+        flags.append('no_uv_log')
+    elif not result['temperatures']:
+        flags.append('no_uv_samples')
+    elif len(result['temperatures']) < MIN_HOLDS:
+        flags.append('few_holds')
+    if uv_path is not None and result['lcst'] is None:
+        flags.append('no_crossing')
+    if result['n_crossings'] > 1:
+        flags.append('multiple_crossings')
+    if result['end'] is None:
+        flags.append('incomplete')
+    elif result['end'] == 'stopped':
+        flags.append('stopped')
+    return flags
+
+
+def result_row(run, future):
+    folder, sensor, _, uv_path = run
+    row = {'run': os.path.basename(os.path.normpath(folder)), 'sensor': sensor, 'lcst': None,
+           'crossing_slope': None, 'n_holds': 0, 'n_samples': 0, 'folder': folder}
+    try:
+        result = future.result()
+    except Exception as e:
+        print(f"Error analyzing {run[2]}: {e}")
+        row['flags'] = 'error'
+        return row
+    row.update(lcst=result['lcst'], crossing_slope=result['crossing_slope'], sigmoid_lcst=result['sigmoid_lcst'],
+               sigmoid_width=result['sigmoid_width'], n_holds=len(result['temperatures']),
+               n_samples=result['n_samples'], flags=';'.join(quality_flags(uv_path, result)))
+    for prefix in ('lcst', 'sigmoid_lcst'):
+        interval = result.get(prefix + '_ci')
+        if interval is not None:
+            row[prefix + '_low'], row[prefix + '_high'] = interval
+    return row
+
+
+def analyze_tree(roots, max_workers=None, cache=None, window_minutes=HOLD_WINDOW_MINUTES,
+                 rolling_window=ROLLING_WINDOW, bootstrap=0):
+    """
+    Analyse every run below `roots` and wait for all of them.
+    :param cache: AnalysisCache; unchanged runs are read from it instead of re-analysed.
+    :param bootstrap: Resamples for the LCST confidence intervals (lcst_low/high columns); 0 skips them.
+    :return: DataFrame with RESULT_COLUMNS, one row per sensor log, sorted by folder and sensor.
+    """
+    runs = find_runs(find_run_folders(roots))
+    pool = AnalysisPool(max_workers, cache)
+    try:
+        pool.submit(runs, lambda batch, run, future: None,
+                    window_minutes=window_minutes, rolling_window=rolling_window, bootstrap=bootstrap)
+        concurrent.futures.wait(pool.futures)
+        # Read the futures themselves: wait() can return before their done-callbacks have run
+        rows = [result_row(run, future) for run, future in zip(runs, pool.futures)]
+    finally:
+        pool.shutdown()
+    frame = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+    return frame.sort_values(['folder', 'sensor'], ignore_index=True)
+
+
+def write_results(frame, path):
+    """CSV, or Parquet when the path ends in .parquet (needs pyarrow or fastparquet)."""
+    if path.endswith('.parquet'):
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compute the LCST of every run in a data tree")
+    parser.add_argument('roots', nargs='*', default=['Data'], help="data folders or run folders (default: Data)")
+    parser.add_argument('-o', '--output', default='lcst_results.csv', help="results table, .csv or .parquet")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument('--window', type=float, default=HOLD_WINDOW_MINUTES, help="hold window in minutes")
+    parser.add_argument('--rolling', type=int, default=ROLLING_WINDOW, help="samples in the rolling mean")
+    parser.add_argument('--bootstrap', type=int, default=0, metavar='N',
+                        help="bootstrap resamples for LCST confidence intervals (default: none)")
+    parser.add_argument('--no-cache', action='store_true', help="do not read or write .analysis_cache/")
+    args = parser.parse_args()
+
+    results = analyze_tree(args.roots, args.workers, None if args.no_cache else AnalysisCache(),
+                           window_minutes=args.window, rolling_window=args.rolling, bootstrap=args.bootstrap)
+    try:
+        write_results(results, args.output)
+    except ImportError as e:
+        print(f"Cannot write {args.output}: {e}")
+    else:
+        flagged = (results['flags'] != '').sum()
+        print(f"Analyzed {len(results)} sensor logs ({flagged} flagged), results written to {args.output}")
@@ -0,0 +1,62 @@
+"""Incremental min/max decimation of long telemetry histories for the strip charts."""
+import numpy as np
+
+STRIP_CHART_BUCKETS = 1000
+
+
+def _reduce(timestamps, values, width):
+    """(bucket numbers, minima, maxima) of chronological samples, NaN values left out."""
+    keep = ~np.isnan(values)
+    timestamps, values = timestamps[keep], values[keep]
+    if not len(values):
+        return np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0)
+    buckets = np.floor(timestamps / width).astype(np.int64)
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    return buckets[starts], np.minimum.reduceat(values, starts), np.maximum.reduceat(values, starts)
+
+
+def _envelope(buckets, minima, maxima, width):
+    """Each bucket as a vertical min-max stroke at its start time."""
+    return np.repeat(buckets * width, 2), np.column_stack((minima, maxima)).ravel()
+
+
+class MinMaxDecimator:
+    """
+    Incremental min/max envelope of the last `span` seconds of one signal.
+    :param span: Seconds of history kept.
+    :param n_buckets: Buckets across the span; the envelope has at most 2 * (n_buckets + 1) points.
+    """
+
+    def __init__(self, span, n_buckets=STRIP_CHART_BUCKETS):
+        self.width = span / n_buckets
+        self.n_buckets = n_buckets
+        self.buckets = np.zeros(0, dtype=np.int64)
+        self.minima = np.zeros(0)
+        self.maxima = np.zeros(0)
+
+    def add(self, timestamps, values):
+        """Merge chronological samples newer than everything added before."""
+        buckets, minima, maxima = _reduce(np.asarray(timestamps, dtype=float), np.asarray(values, dtype=float),
+                                          self.width)
+        if not len(buckets):
+            return
+        if len(self.buckets) and buckets[0] == self.buckets[-1]:
+            self.minima[-1] = min(self.minima[-1], minima[0])
+            self.maxima[-1] = max(self.maxima[-1], maxima[0])
+            buckets, minima, maxima = buckets[1:], minima[1:], maxima[1:]
+        self.buckets = np.concatenate((self.buckets, buckets))
+        self.minima = np.concatenate((self.minima, minima))
+        self.maxima = np.concatenate((self.maxima, maxima))
+        expired = np.searchsorted(self.buckets, self.buckets[-1] - self.n_buckets)
+        self.buckets, self.minima, self.maxima = self.buckets[expired:], self.minima[expired:], self.maxima[expired:]
+
+    def envelope(self):
+        """(times, values) of the kept buckets, two points per bucket."""
+        return _envelope(self.buckets, self.minima, self.maxima, self.width)
+
+    def value_range(self, since=-np.inf):
+        """(smallest, largest) value of the buckets starting at or after `since`, or None."""
+        visible = self.buckets * self.width >= since
+        if not visible.any():
+            return None
+        return float(self.minima[visible].min()), float(self.maxima[visible].max())
@@ -0,0 +1,202 @@
+"""Pump volumes and a greedy open-shop schedule of valve and pump moves for a batch of target compositions."""
+import argparse
+import asyncio
+import csv
+from .motor_control import (VOLUME_PER_STEP_MOTOR1, VOLUME_PER_STEP_MOTOR2, VOLUME_PER_STEP_MOTOR3,
+                            ENABLE_SETTLING_TIME, DISABLE_DELAY, STEPPER_ACCELERATION, SPEED_DELAYS, step_rate)
+from .stepper_firmata import move_duration
+
+STOCK_CONCENTRATIONS = {'NaCl': 1.0, 'NaBr': 2.0, 'CaCl2': 1.0, 'polymer': 10.0}  # M; polymer in wt%
+TOTAL_VOLUME = 800.0  # µL per sample, as in LCSTPredictor.calculate_volumes
+N_HOLDERS = 5
+
+# Pump -> (stock it carries, valve group routing it to the holders)
+PUMP_REAGENTS = {'motor1': ('NaCl', 'Group1'), 'motor2': ('NaBr', 'Group2'), 'motor3': ('CaCl2', 'Group3')}
+VOLUME_PER_STEP = {'motor1': VOLUME_PER_STEP_MOTOR1, 'motor2': VOLUME_PER_STEP_MOTOR2,
+                   'motor3': VOLUME_PER_STEP_MOTOR3}
+DISPENSE_DIRECTION = 1
+DISPENSE_SPEED = 'fast'
+VALVE_SWITCH_TIME = 0.1  # s for an air valve to switch before the pump starts
+
+
+def calculate_volumes(composition, stock_concentrations=STOCK_CONCENTRATIONS, total_volume=TOTAL_VOLUME):
+    """
+    Volumes in µL of each stock (and water) for one target composition.
+    :param composition: {'NaCl': M, 'NaBr': M, 'CaCl2': M, 'polymer': wt%}; missing entries are 0.
+    """
+    volumes = {}
+    for component, stock in stock_concentrations.items():
+        volumes[component] = composition.get(component, 0.0) * total_volume / stock
+    volumes['water'] = total_volume - sum(volumes.values())
+    if volumes['water'] < 0:
+        raise ValueError(f"Invalid solution - negative water volume: {volumes['water']:.1f} μL")
+    return volumes
+
+
+def move_time(steps, speed=DISPENSE_SPEED, firmware_steppers=True):
+    """Expected seconds for one pump move, including enabling and disabling the driver."""
+    delay = SPEED_DELAYS[speed]
+    if firmware_steppers:
+        pulses = move_duration(steps, step_rate(delay), STEPPER_ACCELERATION)
+    else:
+        pulses = 0.5 + steps * 2 * delay / 1000000.0  # direction settling + two phases per step
+    return ENABLE_SETTLING_TIME + pulses + DISABLE_DELAY
+
+
+def plan_dispense(compositions, pump_reagents=PUMP_REAGENTS, n_holders=N_HOLDERS, speed=DISPENSE_SPEED,
+                  firmware_steppers=True):
+    """
+    Plan a batch of compositions; holders are filled in rounds of n_holders samples.
+    :return: dict with 'rounds' (each a list of scheduled moves), 'samples', 'manual' volumes
+             per sample for components without a pump, and the planned 'duration' in seconds.
+    """
+    samples, rounds, offset = [], [], 0.0
+    pumped = {reagent for reagent, _ in pump_reagents.values()}
+    for index, composition in enumerate(compositions):
+        volumes = calculate_volumes(composition)
+        sample = {'index': index, 'holder': index % n_holders, 'composition': composition, 'volumes': volumes,
+                  'manual': {c: v for c, v in volumes.items() if c not in pumped and v > 0}, 'dispensed': {}}
+        samples.append(sample)
+
+    for start in range(0, len(samples), n_holders):
+        jobs = []
+        for sample in samples[start:start + n_holders]:
+            for pump, (reagent, group) in pump_reagents.items():
+                steps = round(sample['volumes'][reagent] / VOLUME_PER_STEP[pump])
+                sample['dispensed'][reagent] = steps * VOLUME_PER_STEP[pump]
+                if steps > 0:
+                    jobs.append({'pump': pump, 'group': group, 'holder': sample['holder'], 'sample': sample['index'],
+                                 'steps': steps, 'duration': VALVE_SWITCH_TIME + move_time(steps, speed, firmware_steppers)})
+        schedule = schedule_jobs(jobs)
+        for job in schedule:
+            job['start'] += offset
+            job['end'] += offset
+        round_end = max((job['end'] for job in schedule), default=offset)
+        rounds.append(schedule)
+        offset = round_end
+
+    return {'samples': samples, 'rounds': rounds, 'duration': offset,
+            'sequential_duration': sum(job['duration'] for schedule in rounds for job in schedule)}
+
+
+def schedule_jobs(jobs):
+    """
+    Greedy open-shop schedule: whenever a pump is idle it takes the job whose holder is free and
+    has the most remaining work (ties: the longest job). Sets 'start'/'end' on every job.
+    """
+    remaining = list(jobs)
+    pump_free = {job['pump']: 0.0 for job in jobs}
+    holder_free = {job['holder']: 0.0 for job in jobs}
+    scheduled = []
+    while remaining:
+        holder_work = {}
+        for job in remaining:
+            holder_work[job['holder']] = holder_work.get(job['holder'], 0.0) + job['duration']
+
+        def ready_time(job):
+            return max(pump_free[job['pump']], holder_free[job['holder']])
+        earliest = min(ready_time(job) for job in remaining)
+        candidates = [job for job in remaining if ready_time(job) <= earliest + 1e-9]
+        job = max(candidates, key=lambda j: (holder_work[j['holder']], j['duration']))
+        job['start'] = earliest
+        job['end'] = earliest + job['duration']
+        pump_free[job['pump']] = job['end']
+        holder_free[job['holder']] = job['end']
+        remaining.remove(job)
+        scheduled.append(job)
+    return sorted(scheduled, key=lambda j: j['start'])
+
+
+async def execute_plan(plan, motion, valve_group_pins, outputs, runtime, rounds=None):
+    """
+    Run a plan as scheduled: every move starts at its planned offset from the start of its round,
+    with the routing valve opened before and closed after it. A move that overruns delays the
+    later moves of its pump and holder instead of letting two pumps share a holder.
+    :param motion: MotionManager driving the pumps.
+    :param outputs: PinOutputManager the valve pins are written through.
+    :param rounds: Indices of the rounds to run back to back; None runs all of them.
+    """
+    for round_index, schedule in enumerate(plan['rounds']):
+        if rounds is not None and round_index not in rounds:
+            continue
+        holder_locks = {job['holder']: asyncio.Lock() for job in schedule}
+        planned_start = min((job['start'] for job in schedule), default=0.0)
+
+        async def run_pump(jobs):
+            for job in jobs:
+                wait = job['start'] - planned_start - (runtime.now() - start)
+                if wait > 0:
+                    await runtime.sleep(wait)
+                async with holder_locks[job['holder']]:
+                    valve = outputs.pin(f"d:{valve_group_pins[job['group']][job['holder']]}:o")
+                    valve.write(1)
+                    try:
+                        await runtime.sleep(VALVE_SWITCH_TIME)
+                        await asyncio.wrap_future(motion.move_steps(job['pump'], DISPENSE_DIRECTION,
+                                                                    SPEED_DELAYS[DISPENSE_SPEED], job['steps']))
+                    finally:
+                        valve.write(0)
+
+        start = runtime.now()
+        pumps = sorted({job['pump'] for job in schedule})
+        await asyncio.gather(*(run_pump([job for job in schedule if job['pump'] == pump]) for pump in pumps))
+        print(f"Dispense round {round_index + 1}/{len(plan['rounds'])} finished in {runtime.now() - start:.1f} s")
+
+
+def load_compositions(path):
+    """Read target compositions from a CSV file with NaCl, NaBr, CaCl2 and polymer columns."""
+    with open(path, newline='') as f:
+        return [{key: float(value) for key, value in row.items() if key in STOCK_CONCENTRATIONS and value}
+                for row in csv.DictReader(f)]
+
+
+def format_plan(plan):
+    lines = []
+    for sample in plan['samples']:
+        dispensed = ", ".join(f"{reagent} {volume:.1f} µL" for reagent, volume in sample['dispensed'].items())
+        manual = ", ".join(f"{component} {volume:.1f} µL" for component, volume in sample['manual'].items())
+        lines.append(f"Sample {sample['index'] + 1} -> holder {sample['holder'] + 1}: {dispensed}; add by hand: {manual}")
+    for round_index, schedule in enumerate(plan['rounds']):
+        lines.append(f"Round {round_index + 1}:")
+        for job in schedule:
+            lines.append(f"  {job['start']:7.1f}-{job['end']:7.1f} s  {job['pump']} -> holder {job['holder'] + 1} "
+                         f"({job['group']} valve {job['holder'] + 1}), {job['steps']} steps")
+    lines.append(f"Planned duration {plan['duration']:.1f} s "
+                 f"(one move at a time: {plan['sequential_duration']:.1f} s)")
+    return "\n".join(lines)
+
+
+def run_simulated(plan, speedup=20.0):
+    """Execute a plan against the simulated board and return the measured duration in clock seconds."""
+    from .simulator import SimulatedArduinoMega, ScaledClock
+    from .initialize_board import setup_board
+    from .async_runtime import HardwareRuntime
+    from .motion_manager import MotionManager
+
+    clock = ScaledClock(speedup)
+    _, motor_pins, _, valve_group_pins, outputs = setup_board(SimulatedArduinoMega(clock=clock), firmware_steppers=True)
+    runtime = HardwareRuntime(clock)
+    runtime.start()
+    try:
+        motion = MotionManager(motor_pins, runtime)
+        start = clock.monotonic()
+        future = asyncio.run_coroutine_threadsafe(execute_plan(plan, motion, valve_group_pins, outputs, runtime),
+                                                  runtime.loop)
+        future.result()
+        return clock.monotonic() - start
+    finally:
+        runtime.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Plan pump and valve moves for a batch of target compositions")
+    parser.add_argument('targets', help="CSV file with NaCl, NaBr, CaCl2 (M) and polymer (wt%%) columns")
+    parser.add_argument('--per-step', action='store_true', help="plan for per-step Firmata toggling instead of firmware moves")
+    parser.add_argument('--simulate', action='store_true', help="execute the plan on the simulated board")
+    parser.add_argument('--speedup', type=float, default=20.0)
+    args = parser.parse_args()
+
+    plan = plan_dispense(load_compositions(args.targets), firmware_steppers=not args.per_step)
+    print(format_plan(plan))
+    if args.simulate:
+        print(f"Simulated execution took {run_simulated(plan, args.speedup):.1f} s")
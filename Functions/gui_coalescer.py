@@ -0,0 +1,65 @@
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+
+class ReadingCoalescer(QObject):
+    """
+    Delivers telemetry to the GUI at a fixed frame rate instead of once per serial line.
+    Each frame only carries the latest value of the channels that changed since the last frame;
+    the intermediate readings are counted as merged.
+    :param telemetry: TelemetryStore written by the serial reader.
+    :param frame_rate_hz: GUI refresh rate in frames per second.
+    """
+    readings_updated = pyqtSignal(dict, dict)  # {channel: temperature}, {channel: analog value}
+
+    def __init__(self, telemetry, frame_rate_hz=15, parent=None):
+        super().__init__(parent)
+        self.telemetry = telemetry
+        self.frames = 0
+        self.delivered_updates = 0
+        self.merged_updates = 0
+        self._temperature_counts = [0] * telemetry.n_channels
+        self._analog_counts = [0] * telemetry.n_channels
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.flush)
+        self.set_frame_rate(frame_rate_hz)
+
+    def set_frame_rate(self, frame_rate_hz):
+        self.frame_rate_hz = frame_rate_hz
+        self.timer.setInterval(max(1, int(1000 / frame_rate_hz)))
+
+    def start(self):
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def flush(self):
+        temperatures = self._collect(self.telemetry.temperature, self._temperature_counts)
+        analogs = self._collect(self.telemetry.analog, self._analog_counts)
+        if temperatures or analogs:
+            self.frames += 1
+            self.readings_updated.emit(temperatures, analogs)
+
+    def _collect(self, buffers, seen_counts):
+        latest = {}
+        for channel, buffer in enumerate(buffers):
+            count = buffer.count
+            new_samples = count - seen_counts[channel]
+            if new_samples <= 0:
+                continue
+            seen_counts[channel] = count
+            sample = buffer.latest()
+            if sample is None:
+                continue
+            latest[channel] = sample[1]
+            self.delivered_updates += 1
+            self.merged_updates += new_samples - 1
+        return latest
+
+    def get_stats(self):
+        return {
+            'frame_rate_hz': self.frame_rate_hz,
+            'frames': self.frames,
+            'delivered_updates': self.delivered_updates,
+            'merged_updates': self.merged_updates,
+        }
@@ -1,10 +1,18 @@
 # motor_control.py
 from pyfirmata import ArduinoMega, util, OUTPUT
 import time
+from .pin_output import PinOutputManager
+from .stepper_firmata import StepperController
 
 # Initialize the board and motors
-def initialize_board(port):
-    board = ArduinoMega(port)
+def initialize_board(port, firmware_steppers=False):
+    return setup_board(ArduinoMega(port), firmware_steppers)
+
+# Configure motor, Peltier and valve pins on an already opened (real or simulated) board.
+# With firmware_steppers the board generates step pulses itself (AccelStepperFirmata).
+def setup_board(board, firmware_steppers=False):
+    # All outputs go through one manager that caches pins and suppresses redundant writes
+    outputs = PinOutputManager(board)
     motor_pins = {
         # 'motor1': {'dir': 23, 'step': 22, 'enable': 44},
         # 绿色direction， 蓝色step，白色enable
@@ -16,17 +24,22 @@ def initialize_board(port):
     }
 
     for motor in motor_pins.values():
-        motor['dir_pin'] = board.get_pin(f'd:{motor["dir"]}:o')
-        motor['step_pin'] = board.get_pin(f'd:{motor["step"]}:o')
-        motor['enable_pin'] = board.get_pin(f'd:{motor["enable"]}:o')
+        motor['dir_pin'] = outputs.pin(f'd:{motor["dir"]}:o')
+        motor['step_pin'] = outputs.pin(f'd:{motor["step"]}:o')
+        motor['enable_pin'] = outputs.pin(f'd:{motor["enable"]}:o')
         motor['enable_pin'].write(0)
 
+    if firmware_steppers:
+        steppers = StepperController(board)
+        for device, motor in enumerate(motor_pins.values()):
+            motor['stepper'] = steppers.stepper(device, motor['step'], motor['dir'])
+
     mdd3a_pins = {
-        'board5': {'inputA': board.get_pin('d:13:p'), 'inputB': board.get_pin('d:12:p')},
-        'board4': {'inputA': board.get_pin('d:11:p'), 'inputB': board.get_pin('d:10:p')},
-        'board3': {'inputA': board.get_pin('d:9:p'), 'inputB': board.get_pin('d:8:p')},
-        'board2': {'inputA': board.get_pin('d:7:p'), 'inputB': board.get_pin('d:6:p')},
-        'board1': {'inputA': board.get_pin('d:5:p'), 'inputB': board.get_pin('d:4:p')},
+        'board5': {'inputA': outputs.pin('d:13:p'), 'inputB': outputs.pin('d:12:p')},
+        'board4': {'inputA': outputs.pin('d:11:p'), 'inputB': outputs.pin('d:10:p')},
+        'board3': {'inputA': outputs.pin('d:9:p'), 'inputB': outputs.pin('d:8:p')},
+        'board2': {'inputA': outputs.pin('d:7:p'), 'inputB': outputs.pin('d:6:p')},
+        'board1': {'inputA': outputs.pin('d:5:p'), 'inputB': outputs.pin('d:4:p')},
     }
 
     # photodiode_pins = {
@@ -45,6 +58,6 @@ def initialize_board(port):
 
     for group in valve_group_pins.values():
         for pin in group:
-            board.get_pin(f'd:{pin}:o').mode = OUTPUT
+            outputs.pin(f'd:{pin}:o').mode = OUTPUT
 
-    return board, motor_pins, mdd3a_pins,valve_group_pins
\ No newline at end of file
+    return board, motor_pins, mdd3a_pins, valve_group_pins, outputs
\ No newline at end of file
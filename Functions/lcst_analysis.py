@@ -0,0 +1,190 @@
+"""Hold-window averaging and normalization of parsed temperature/UV logs."""
+import numpy as np
+from .log_parser import parse_log, hold_temperatures
+from .run_log import EVENT_SAMPLE, EVENT_SETPOINT, EVENT_HOLD_START, EVENT_COMPLETED, EVENT_STOPPED
+
+HOLD_WINDOW_MINUTES = 5.0
+ROLLING_WINDOW = 20
+NORMALIZE_HEAD = 5  # holds whose largest average is 100%
+NORMALIZE_TAIL = 8  # holds whose smallest average is 0%
+
+
+def _hold_windows(temp_df, uv_df, window_minutes):
+    """(hold setpoints, sorted UV values, first sample and sample count of each hold window), empty windows left out."""
+    events = temp_df['event'].to_numpy()
+    times = temp_df['time'].to_numpy().view(np.int64)
+    holds = np.flatnonzero(events == EVENT_HOLD_START)
+    starts = times[holds]
+    ends = starts + int(window_minutes * 60e9)
+    # Adaptive holds can be shorter than the window; never average into the next setpoint
+    setpoint_times = np.sort(times[events == EVENT_SETPOINT])
+    following = np.searchsorted(setpoint_times, starts, side='right')
+    has_next = following < len(setpoint_times)
+    if len(setpoint_times):
+        ends = np.where(has_next, np.minimum(ends, setpoint_times[np.minimum(following, len(setpoint_times) - 1)]), ends)
+
+    samples = uv_df[(uv_df['event'] == EVENT_SAMPLE) & uv_df['uv'].notna()]
+    uv_times = samples['time'].to_numpy().view(np.int64)
+    values = samples['uv'].to_numpy()
+    if np.any(np.diff(uv_times) < 0):
+        order = np.argsort(uv_times, kind='stable')
+        uv_times, values = uv_times[order], values[order]
+
+    first = np.searchsorted(uv_times, starts, side='left')
+    last = np.searchsorted(uv_times, ends, side='right')
+    counts = np.maximum(last - first, 0)
+    kept = counts > 0
+    return temp_df['setpoint'].to_numpy()[holds][kept], values, first[kept], counts[kept]
+
+
+def hold_window_averages(temp_df, uv_df, window_minutes=HOLD_WINDOW_MINUTES, rolling_window=ROLLING_WINDOW):
+    """
+    Mean rolling-average UV reading of every hold.
+    :param window_minutes: Longest stretch after the "Holding" line that is averaged.
+    :param rolling_window: Samples in the rolling mean; it restarts in every window and
+                           averages fewer samples at the start of a window (min_periods=1).
+    :return: (hold setpoints, averages, UV samples per hold); holds without UV samples are left out.
+    """
+    setpoints, values, first, counts = _hold_windows(temp_df, uv_df, window_minutes)
+    if not len(counts):
+        return setpoints, np.zeros(0), counts
+
+    # Rolling mean at every sample j of window k: mean of values[max(first_k, j - rolling_window + 1):j + 1]
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    window = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    sample = first[window] + np.arange(len(window)) - offsets[window]
+    low = np.maximum(first[window], sample - rolling_window + 1)
+    rolling = (cumulative[sample + 1] - cumulative[low]) / (sample + 1 - low)
+    averages = np.bincount(window, weights=rolling, minlength=len(counts)) / counts
+
+    return setpoints, averages, counts
+
+
+def hold_window_samples(temp_df, uv_df, window_minutes=HOLD_WINDOW_MINUTES):
+    """(hold setpoints, list with the UV samples of every hold window), as averaged by hold_window_averages."""
+    setpoints, values, first, counts = _hold_windows(temp_df, uv_df, window_minutes)
+    return setpoints, [values[start:start + count] for start, count in zip(first, counts)]
+
+
+def normalize_averages(averages, head=NORMALIZE_HEAD, tail=NORMALIZE_TAIL):
+    """
+    Scale hold averages to 0-100 % between the largest of the first holds and the smallest of the last.
+    A 2-D array is normalized row by row.
+    """
+    averages = np.asarray(averages, dtype=float)
+    if not averages.shape[-1]:
+        return averages
+    max_val = averages[..., :head].max(axis=-1, keepdims=True)
+    min_val = averages[..., -tail:].min(axis=-1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        normalized = (averages - min_val) / (max_val - min_val) * 100
+    return np.where(max_val == min_val, np.nan, normalized)  # too few holds to span the transition yet
+
+
+def rolling_mean_average(values, rolling_window=ROLLING_WINDOW):
+    """Mean of the rolling mean (min_periods=1) of one hold window's samples, or of every row of a 2-D array."""
+    values = np.asarray(values, dtype=float)
+    cumulative = np.concatenate((np.zeros(values.shape[:-1] + (1,)), np.cumsum(values, axis=-1)), axis=-1)
+    sample = np.arange(values.shape[-1])
+    low = np.maximum(sample - rolling_window + 1, 0)
+    return ((cumulative[..., sample + 1] - cumulative[..., low]) / (sample + 1 - low)).mean(axis=-1)
+
+
+def find_crossings(temperatures, normalized_avgs, level=50.0):
+    """
+    Every crossing of `level` between neighbouring holds, in one pass.
+    :param normalized_avgs: One curve, or a 2-D array with one curve per row.
+    :return: (crossing mask, interpolated temperatures, slopes in %/°C), each shaped like the
+             curve(s) minus the last hold; entries without a crossing are NaN.
+    """
+    temps = np.asarray(temperatures, dtype=float)
+    avgs = np.asarray(normalized_avgs, dtype=float)
+    v1, v2 = avgs[..., :-1], avgs[..., 1:]
+    dt = np.diff(temps)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mask = ((v1 - level) * (v2 - level) <= 0) & (v1 != v2)
+        t_50 = np.where(mask, temps[:-1] + dt * (level - v1) / (v2 - v1), np.nan)
+        slopes = np.where(mask, np.abs(v2 - v1) / dt, np.nan)
+    return mask, t_50, slopes
+
+
+def steepest_crossings(temperatures, normalized_avgs):
+    """
+    Steepest crossing of 50 % of every row of a 2-D array of curves.
+    :return: (interpolated temperatures, slopes, numbers of crossings); NaN for rows without a crossing.
+    """
+    mask, t_50, slopes = find_crossings(temperatures, normalized_avgs)
+    if not mask.shape[1]:
+        empty = np.full(len(mask), np.nan)
+        return empty, empty, np.zeros(len(mask), dtype=int)
+    rows = np.arange(len(mask))
+    steepest = np.argmax(np.where(mask, slopes, -np.inf), axis=1)
+    found = mask.any(axis=1)
+    return (np.where(found, t_50[rows, steepest], np.nan), np.where(found, slopes[rows, steepest], np.nan),
+            mask.sum(axis=1))
+
+
+def steepest_crossing(temperatures, normalized_avgs):
+    """
+    Steepest crossing of 50 % between neighbouring holds.
+    :return: (interpolated temperature, slope in %/°C, number of crossings), or None without a crossing.
+    """
+    t_50, slopes, n_crossings = steepest_crossings(temperatures, np.asarray(normalized_avgs, dtype=float)[None])
+    if not n_crossings[0]:
+        return None
+    return float(t_50[0]), float(slopes[0]), int(n_crossings[0])
+
+
+def interpolate_temperature(temperatures, normalized_avgs):
+    """
+    Temperature of the steepest crossing of 50 %, linearly interpolated.
+    Returns a message string when the curve never crosses 50 %.
+    """
+    crossing = steepest_crossing(temperatures, normalized_avgs)
+    if crossing is None:
+        return "50% is out of the interpolation range."
+    return crossing[0]
+
+
+def analyze_run(temperature_path, uv_path=None, window_minutes=HOLD_WINDOW_MINUTES, rolling_window=ROLLING_WINDOW,
+                cache=None, bootstrap=0):
+    """
+    Parse one sensor's logs once and compute what both Data Analysis plots need.
+    Runs in worker processes, so it only returns small picklable results.
+    :param uv_path: UV log of the same sensor; without it only the hold temperatures are returned.
+    :param cache: AnalysisCache that parsed logs are read from and stored in.
+    :param bootstrap: Bootstrap resamples for the LCST confidence intervals; 0 skips them.
+    :return: dict with 'holds' (set vs real-time hold temperatures), 'temperatures' and
+             'normalized_avgs' (lists, empty without a UV log), 'lcst' and 'crossing_slope'
+             (float or None), 'n_crossings', 'n_samples' (UV samples averaged), 'end'
+             ('completed', 'stopped' or None when the log has no end line), 'sigmoid_lcst' and
+             'sigmoid_width' of the Boltzmann fit (float or None) and, with bootstrap,
+             'lcst_ci' and 'sigmoid_lcst_ci' ((low, high) or None).
+    """
+    from .lcst_estimation import fit_sigmoid, bootstrap_lcst  # lcst_estimation builds on this module
+
+    load = cache.parse if cache is not None else parse_log
+    temp_df = load(temperature_path)
+    events = temp_df['event'].to_numpy()
+    end = 'completed' if np.any(events == EVENT_COMPLETED) else 'stopped' if np.any(events == EVENT_STOPPED) else None
+    result = {'holds': hold_temperatures(temp_df), 'temperatures': [], 'normalized_avgs': [], 'lcst': None,
+              'crossing_slope': None, 'n_crossings': 0, 'n_samples': 0, 'end': end, 'sigmoid_lcst': None,
+              'sigmoid_width': None, 'lcst_ci': None, 'sigmoid_lcst_ci': None}
+    if uv_path is not None:
+        uv_df = load(uv_path)
+        temperatures, averages, counts = hold_window_averages(temp_df, uv_df, window_minutes, rolling_window)
+        if len(averages):
+            normalized_avgs = normalize_averages(averages)
+            result.update(temperatures=temperatures.tolist(), normalized_avgs=normalized_avgs.tolist(),
+                          n_samples=int(counts.sum()))
+            crossing = steepest_crossing(temperatures, normalized_avgs)
+            if crossing is not None:
+                result.update(lcst=crossing[0], crossing_slope=crossing[1], n_crossings=crossing[2])
+            fit = fit_sigmoid(temperatures, normalized_avgs)
+            if not np.isnan(fit['lcst']):
+                result.update(sigmoid_lcst=fit['lcst'], sigmoid_width=fit['width'])
+            if bootstrap:
+                samples = hold_window_samples(temp_df, uv_df, window_minutes)[1]
+                result.update(bootstrap_lcst(temperatures, samples, bootstrap, rolling_window, seed=0))
+    return result
@@ -0,0 +1,138 @@
+"""Batched Boltzmann sigmoid fits and bootstrap confidence intervals of the LCST."""
+import concurrent.futures
+import multiprocessing
+import numpy as np
+from .lcst_analysis import ROLLING_WINDOW, normalize_averages, rolling_mean_average, steepest_crossings
+
+SIGMOID_ITERATIONS = 60
+BOOTSTRAP_RESAMPLES = 2000
+BOOTSTRAP_CONFIDENCE = 0.95
+BOOTSTRAP_CHUNK_ELEMENTS = 4_000_000  # resampled UV values held in memory at once
+MAX_EXPONENT = 50.0
+SIGMOID_PARAMETERS = 4
+
+
+def _sigmoid(temperatures, params):
+    """Model values and Jacobian for params (batch, 4) = top, bottom, T_mid, width."""
+    top, bottom, middle, width = (params[:, i:i + 1] for i in range(4))
+    z = np.clip((temperatures - middle) / width, -MAX_EXPONENT, MAX_EXPONENT)
+    s = 1 / (1 + np.exp(z))
+    slope = (top - bottom) * s * (1 - s) / width
+    jacobian = np.stack((s, 1 - s, slope, slope * z), axis=-1)
+    return bottom + (top - bottom) * s, jacobian
+
+
+def fit_sigmoid(temperatures, normalized_avgs, iterations=SIGMOID_ITERATIONS):
+    """
+    Least-squares Boltzmann fit of one normalized curve or of every row of a 2-D array.
+    :return: dict of arrays (scalars for one curve): 'lcst' (temperature where the fit crosses
+             50 %), 'middle', 'width' (°C), 'top', 'bottom' and 'rms' residual; NaN where a
+             curve has missing values or the fit never reaches 50 %.
+    """
+    temps = np.asarray(temperatures, dtype=float)
+    curves = np.asarray(normalized_avgs, dtype=float)
+    single = curves.ndim == 1
+    curves = np.atleast_2d(curves)
+    if curves.shape[1] < SIGMOID_PARAMETERS:
+        missing = np.full(len(curves), np.nan)
+        return {key: float(missing[0]) if single else missing
+                for key in ('lcst', 'middle', 'width', 'top', 'bottom', 'rms')}
+    valid = np.isfinite(curves).all(axis=1)
+    y = np.where(valid[:, None], curves, 0.0)
+
+    # Start from the data range, the interpolated crossing and a tenth of the swept range
+    falling = y[:, :len(temps) // 2].mean(axis=1) >= y[:, len(temps) // 2:].mean(axis=1)
+    crossing = steepest_crossings(temps, y)[0]
+    span = max(np.ptp(temps), 1e-3)
+    params = np.column_stack((y.max(axis=1), y.min(axis=1), np.where(np.isnan(crossing), temps.mean(), crossing),
+                              np.where(falling, span / 10, -span / 10)))
+
+    damping = np.full(len(y), 1e-3)
+    model, jacobian = _sigmoid(temps, params)
+    cost = ((y - model) ** 2).sum(axis=1)
+    for _ in range(iterations):
+        normal = np.einsum('bni,bnj->bij', jacobian, jacobian)
+        gradient = np.einsum('bni,bn->bi', jacobian, y - model)
+        diagonal = np.einsum('bii->bi', normal)
+        # Marquardt scaling, plus a tiny ridge so flat directions never make the system singular
+        scale = damping[:, None] * diagonal + 1e-12 * (diagonal.sum(axis=1, keepdims=True) + 1)
+        system = normal + scale[:, :, None] * np.eye(SIGMOID_PARAMETERS)
+        step = np.linalg.solve(system, gradient[:, :, None])[:, :, 0]
+        trial = params + step
+        trial_model, trial_jacobian = _sigmoid(temps, trial)
+        trial_cost = ((y - trial_model) ** 2).sum(axis=1)
+        better = (trial_cost < cost) & np.isfinite(trial_cost) & (np.abs(trial[:, 3]) > 1e-6)
+        params = np.where(better[:, None], trial, params)
+        model = np.where(better[:, None], trial_model, model)
+        jacobian = np.where(better[:, None, None], trial_jacobian, jacobian)
+        cost = np.where(better, trial_cost, cost)
+        damping = np.where(better, damping / 3, damping * 2)
+
+    top, bottom, middle, width = params.T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lcst = middle + width * np.log((top - 50) / (50 - bottom))
+    result = {'lcst': lcst, 'middle': middle, 'width': width, 'top': top, 'bottom': bottom,
+              'rms': np.sqrt(cost / max(len(temps), 1))}
+    for key, value in result.items():
+        value = np.where(valid & np.isfinite(value), value, np.nan)
+        result[key] = float(value[0]) if single else value
+    return result
+
+
+def resample_averages(samples, count, rng, rolling_window=ROLLING_WINDOW):
+    """(count, holds) hold averages of `count` bootstrap resamples of every hold's UV samples."""
+    averages = np.empty((count, len(samples)))
+    for hold, values in enumerate(samples):
+        drawn = values[rng.integers(0, len(values), (count, len(values)))]
+        averages[:, hold] = rolling_mean_average(drawn, rolling_window)
+    return averages
+
+
+def bootstrap_estimates(temperatures, samples, count, rolling_window=ROLLING_WINDOW, seed=None):
+    """
+    Interpolated and sigmoid LCST of `count` bootstrap resamples; worker task of bootstrap_lcst.
+    :param samples: UV samples of every hold (lcst_analysis.hold_window_samples).
+    :return: (interpolated LCSTs, sigmoid LCSTs), NaN for resamples without a crossing.
+    """
+    rng = np.random.default_rng(seed)
+    chunk = max(1, BOOTSTRAP_CHUNK_ELEMENTS // max(sum(len(values) for values in samples), 1))
+    interpolated, fitted = [], []
+    for start in range(0, count, chunk):
+        normalized = normalize_averages(resample_averages(samples, min(chunk, count - start), rng, rolling_window))
+        interpolated.append(steepest_crossings(temperatures, normalized)[0])
+        fitted.append(fit_sigmoid(temperatures, normalized)['lcst'])
+    if not interpolated:
+        return np.zeros(0), np.zeros(0)
+    return np.concatenate(interpolated), np.concatenate(fitted)
+
+
+def _interval(estimates, confidence):
+    estimates = estimates[np.isfinite(estimates)]
+    if not len(estimates):
+        return None
+    low, high = np.percentile(estimates, [50 * (1 - confidence), 50 * (1 + confidence)])
+    return float(low), float(high)
+
+
+def bootstrap_lcst(temperatures, samples, n_resamples=BOOTSTRAP_RESAMPLES, rolling_window=ROLLING_WINDOW,
+                   confidence=BOOTSTRAP_CONFIDENCE, processes=None, seed=None):
+    """
+    Percentile bootstrap confidence intervals of the interpolated and sigmoid LCST.
+    :param samples: UV samples of every hold (lcst_analysis.hold_window_samples).
+    :param processes: Spread the resamples over this many worker processes; None or 1 runs here.
+    :param seed: Seed of the resampling; the same seed and processes give the same intervals.
+    :return: dict with 'lcst_ci' and 'sigmoid_lcst_ci' ((low, high) or None when no resample
+             crosses 50 %) and 'crossing_fraction' (share of resamples with a crossing).
+    """
+    if processes is None or processes <= 1:
+        interpolated, fitted = bootstrap_estimates(temperatures, samples, n_resamples, rolling_window, seed)
+    else:
+        seeds = np.random.SeedSequence(seed).spawn(processes)
+        counts = [n_resamples // processes + (i < n_resamples % processes) for i in range(processes)]
+        with concurrent.futures.ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn')) as pool:
+            parts = list(pool.map(bootstrap_estimates, [temperatures] * processes, [samples] * processes, counts,
+                                  [rolling_window] * processes, seeds))
+        interpolated = np.concatenate([part[0] for part in parts])
+        fitted = np.concatenate([part[1] for part in parts])
+    return {'lcst_ci': _interval(interpolated, confidence), 'sigmoid_lcst_ci': _interval(fitted, confidence),
+            'crossing_fraction': float(np.isfinite(interpolated).mean()) if len(interpolated) else 0.0}
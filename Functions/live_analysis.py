@@ -0,0 +1,95 @@
+"""Provisional LCST curve of a running sweep, updated from the records appended to its run log."""
+import os
+import numpy as np
+from .run_log import (HEADER, RECORD_DTYPE, read_header, EVENT_SAMPLE, EVENT_HOLD_SAMPLE, EVENT_SETPOINT,
+                      EVENT_HOLD_START, EVENT_HOLD_CONVERGED, EVENT_HOLD_ELAPSED, EVENT_COMPLETED, EVENT_STOPPED)
+from .lcst_analysis import (HOLD_WINDOW_MINUTES, ROLLING_WINDOW, rolling_mean_average, normalize_averages,
+                            interpolate_temperature)
+
+HOLD_END_EVENTS = (EVENT_SETPOINT, EVENT_HOLD_CONVERGED, EVENT_HOLD_ELAPSED, EVENT_COMPLETED, EVENT_STOPPED)
+BOUNDARY_EVENTS = HOLD_END_EVENTS + (EVENT_HOLD_START,)
+
+
+class RunLogFollower:
+    """Reads the records appended to a run log since the previous poll."""
+
+    def __init__(self, path):
+        self.path = path
+        self.header = None
+        self.offset = HEADER.size
+
+    def poll(self):
+        """New complete records (RECORD_DTYPE array); a record still being written is left for the next poll."""
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        if self.header is None:
+            if size < HEADER.size:
+                return np.zeros(0, dtype=RECORD_DTYPE)
+            self.header = read_header(self.path)
+        count = (size - self.offset) // RECORD_DTYPE.itemsize
+        if count <= 0:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        records = np.fromfile(self.path, dtype=RECORD_DTYPE, count=count, offset=self.offset)
+        self.offset += len(records) * RECORD_DTYPE.itemsize
+        return records
+
+
+class LiveLCST:
+    """
+    Incremental hold averages of one followed run log.
+    :param window_minutes: Longest stretch after the start of a hold that is averaged.
+    :param rolling_window: Samples in the rolling mean.
+    """
+
+    def __init__(self, path, window_minutes=HOLD_WINDOW_MINUTES, rolling_window=ROLLING_WINDOW):
+        self.follower = RunLogFollower(path)
+        self.window_ns = int(window_minutes * 60e9)
+        self.rolling_window = rolling_window
+        self.temperatures = []
+        self.averages = []
+        self.hold = None  # (start ns, setpoint, list of UV sample arrays) of the open hold
+        self.finished = False
+
+    def update(self):
+        """Consume newly written records; returns True when a hold ended and the curve changed."""
+        records = self.follower.poll()
+        changed = False
+        boundaries = np.flatnonzero(np.isin(records['event'], BOUNDARY_EVENTS))
+        start = 0
+        for boundary in np.append(boundaries, len(records)):
+            if self.hold is not None and boundary > start:
+                segment = records[start:boundary]
+                uv = segment['uv']
+                keep = (np.isin(segment['event'], (EVENT_SAMPLE, EVENT_HOLD_SAMPLE)) & ~np.isnan(uv)
+                        & (segment['time_ns'] <= self.hold[0] + self.window_ns))
+                self.hold[2].append(uv[keep].astype(np.float64))
+            if boundary == len(records):
+                break
+            record = records[boundary]
+            if record['event'] == EVENT_HOLD_START:
+                self.hold = (int(record['time_ns']), float(record['setpoint']), [])
+            else:
+                changed |= self._close_hold()
+                self.finished |= record['event'] in (EVENT_COMPLETED, EVENT_STOPPED)
+            start = boundary + 1
+        return changed
+
+    def _close_hold(self):
+        if self.hold is None:
+            return False
+        _, setpoint, samples = self.hold
+        self.hold = None
+        values = np.concatenate(samples) if samples else np.zeros(0)
+        if not len(values):
+            return False
+        self.temperatures.append(setpoint)
+        self.averages.append(rolling_mean_average(values, self.rolling_window))
+        return True
+
+    def curve(self):
+        """(hold temperatures, normalized averages, provisional LCST or None) from the holds so far."""
+        normalized_avgs = normalize_averages(self.averages)
+        lcst = interpolate_temperature(self.temperatures, normalized_avgs)
+        return list(self.temperatures), normalized_avgs.tolist(), float(lcst) if isinstance(lcst, float) else None
@@ -0,0 +1,199 @@
+"""Vectorized parser for the temperature/UV text logs of temperature sweeps; event codes as in Functions.run_log."""
+import numpy as np
+import pandas as pd
+from .run_log import (EVENT_SAMPLE, EVENT_HOLD_SAMPLE, EVENT_SETPOINT, EVENT_STABILIZED, EVENT_HOLD_START,
+                      EVENT_HOLD_CONVERGED, EVENT_HOLD_ELAPSED, EVENT_COMPLETED, EVENT_STOPPED)
+
+EVENT_OTHER = 255
+
+# Line prefix after the timestamp -> event code. A (prefix, suffix) pair marks lines whose
+# number follows a sensor number, e.g. "Set Sensor 1 to 22.0°C".
+LINE_KINDS = [
+    (b'Set Sensor ', b' to ', EVENT_SETPOINT),
+    (b'UV Sensor ', b' Reading: ', EVENT_SAMPLE),
+    (b'Real-time Hold Temp: ', None, EVENT_HOLD_SAMPLE),
+    (b'Temperature sweep completed', None, EVENT_COMPLETED),
+    (b'Temperature sweep stopped', None, EVENT_STOPPED),
+    (b'Temperature ', None, EVENT_STABILIZED),
+    (b'Holding ', None, EVENT_HOLD_START),
+    (b'Hold at ', None, EVENT_HOLD_ELAPSED),
+]
+CONVERGED_MARKER = b'UV signal converged'
+SETPOINT_EVENTS = (EVENT_SETPOINT, EVENT_STABILIZED, EVENT_HOLD_START, EVENT_HOLD_CONVERGED, EVENT_HOLD_ELAPSED)
+
+PADDING = 64  # zero bytes around the data so fixed-width reads never leave the buffer
+WINDOW = 32  # widest byte row read from a line: stamp, prefix or number
+NUMBER_WIDTH = 16
+MAX_HOUR_DIGITS = 6
+STAMP_WIDTH = 26  # "YYYY-MM-DD HH:MM:SS.ffffff", read right-aligned on the seconds
+
+
+def read_buffer(path):
+    """Read a file into a zero-padded uint8 array; returns (array, data length). The data starts at PADDING."""
+    with open(path, 'rb') as f:
+        f.seek(0, 2)
+        size = f.tell()
+        f.seek(0)
+        buf = np.zeros(size + 2 * PADDING, dtype=np.uint8)
+        f.readinto(memoryview(buf)[PADDING:PADDING + size])
+    return buf, size
+
+
+def _columns(windows, positions, width):
+    """The `width` bytes at each position as a (width, rows) array, so every byte column is contiguous."""
+    return np.ascontiguousarray(windows[positions, :width].T)
+
+
+def _digits(columns, first, width):
+    """Integer value of the ASCII digits in columns first..first+width-1, and a mask of valid rows."""
+    digits = columns[first:first + width] - 48  # wraps to >= 10 for anything but a digit
+    ok = (digits < 10).all(axis=0)
+    value = digits[0].astype(np.int64)
+    for row in digits[1:]:
+        value = value * 10 + row
+    return value, ok
+
+
+def _matches(windows, positions, text):
+    block = np.ascontiguousarray(windows[positions, :len(text)])
+    return block.view(f'S{len(text)}')[:, 0] == text
+
+
+def _numbers(windows, buf, positions):
+    """Parse "[-]digits[.digits]" at each position; NaN where there is no number."""
+    negative = buf[positions] == ord('-')
+    columns = _columns(windows, positions + negative, NUMBER_WIDTH)
+    # Integer mantissa of all digits, divided by 10 ** (digits after the dot): correctly rounded
+    mantissa = np.zeros(len(positions))
+    fraction_digits = np.zeros(len(positions))
+    seen = np.zeros(len(positions), dtype=bool)
+    after_dot = np.zeros(len(positions), dtype=bool)
+    active = np.ones(len(positions), dtype=bool)
+    for column in columns:
+        digit = column - 48  # wraps to >= 10 for anything but a digit
+        is_digit = active & (digit < 10)
+        is_dot = active & ~after_dot & (column == ord('.'))
+        mantissa = np.where(is_digit, mantissa * 10 + digit, mantissa)
+        fraction_digits += is_digit & after_dot
+        seen |= is_digit
+        after_dot |= is_dot
+        active = is_digit | is_dot
+        if not active.any():
+            break
+    value = mantissa / 10.0 ** fraction_digits
+    value[negative] *= -1
+    value[~seen] = np.nan
+    return value
+
+
+def _timestamps(windows, buf, separators):
+    """
+    Decode the stamp in front of each ": " separator.
+    :return: (int64 ns since the epoch, or since the start of the run for elapsed stamps;
+              mask of rows with a valid stamp; mask of rows with a wall-clock stamp)
+    """
+    has_fraction = buf[separators - 7] == ord('.')
+    stamp = _columns(windows, separators - 7 * has_fraction - 19, STAMP_WIDTH)
+    seconds, ok = _digits(stamp, 17, 2)
+    minutes, ok_minutes = _digits(stamp, 14, 2)
+    microseconds, ok_fraction = _digits(stamp, 20, 6)
+    microseconds[~has_fraction] = 0
+    ok &= ok_minutes & (ok_fraction | ~has_fraction) & (stamp[13] == ord(':')) & (stamp[16] == ord(':'))
+
+    # Wall clock: "YYYY-MM-DD HH" in front of the minutes
+    years, ok_years = _digits(stamp, 0, 4)
+    months, ok_months = _digits(stamp, 5, 2)
+    days, ok_days = _digits(stamp, 8, 2)
+    hours, ok_hours = _digits(stamp, 11, 2)
+    is_wall = ok_years & ok_months & ok_days & ok_hours & (stamp[4] == ord('-')) & (stamp[7] == ord('-'))
+    is_wall &= (months >= 1) & (months <= 12)
+    dates = ((years - 1970) * 12 + np.clip(months, 1, 12) - 1).astype('datetime64[M]').astype('datetime64[D]')
+    day_ns = np.where(is_wall, (dates.astype(np.int64) + days - 1) * 86400 * 10 ** 9, 0)
+
+    # Elapsed: any number of hour digits in front of the minutes
+    elapsed_hours = np.zeros(len(separators), dtype=np.int64)
+    in_hours = np.ones(len(separators), dtype=bool)
+    scale = 1
+    for column in stamp[12:12 - MAX_HOUR_DIGITS:-1]:
+        digit = column.astype(np.int64) - 48
+        in_hours &= (digit >= 0) & (digit <= 9)
+        elapsed_hours += np.where(in_hours, digit * scale, 0)
+        scale *= 10
+    ok &= is_wall | ((stamp[12] >= ord('0')) & (stamp[12] <= ord('9')))
+
+    hours = np.where(is_wall, hours, elapsed_hours)
+    ns = ((hours * 60 + minutes) * 60 + seconds) * 10 ** 9 + microseconds * 1000 + day_ns
+    return ns, ok, is_wall
+
+
+def parse_log(path):
+    """
+    Parse one temperature or UV log; lines without a timestamp are skipped.
+    :return: DataFrame with one row per line and the columns time (datetime64[ns]; elapsed
+             stamps count from 1970-01-01), seconds (float64 since the first line), event
+             (uint8 code), setpoint (float64, the active setpoint), temperature and uv
+             (float64, NaN where the line carries no reading).
+             DataFrame.attrs['elapsed'] is True for elapsed-time stamps.
+    """
+    buf, size = read_buffer(path)
+    windows = np.lib.stride_tricks.sliding_window_view(buf, WINDOW)
+    newlines = np.flatnonzero(buf[PADDING:PADDING + size] == ord('\n')) + PADDING
+    starts = np.concatenate(([PADDING], newlines + 1))
+    ends = np.concatenate((newlines, [PADDING + size]))
+
+    # The first ": " of a line ends its timestamp (at least "H:MM:SS")
+    separator_positions = np.flatnonzero((buf[:-1] == ord(':')) & (buf[1:] == ord(' ')))
+    separators = np.append(separator_positions, len(buf))[np.searchsorted(separator_positions, starts + 7)]
+    found = separators < ends
+    ends, separators = ends[found], separators[found]
+    ns, valid, is_wall = _timestamps(windows, buf, separators)
+    ends, separators, ns, is_wall = ends[valid], separators[valid], ns[valid], is_wall[valid]
+
+    text = separators + 2
+    first_char = buf[text]
+    events = np.full(len(text), EVENT_OTHER, dtype=np.uint8)
+    values = np.full(len(text), np.nan)
+    for prefix, suffix, code in LINE_KINDS:
+        rows = np.flatnonzero(first_char == prefix[0])
+        rows = rows[(events[rows] == EVENT_OTHER) & _matches(windows, text[rows], prefix)]
+        positions = text[rows] + len(prefix)
+        if suffix is not None:
+            sensor = _columns(windows, positions, MAX_HOUR_DIGITS) - 48 < 10
+            positions += np.logical_and.accumulate(sensor, axis=0).sum(axis=0)
+            found = _matches(windows, positions, suffix)
+            rows, positions = rows[found], positions[found] + len(suffix)
+        events[rows] = code
+        values[rows] = _numbers(windows, buf, positions)
+
+    for row in np.flatnonzero(events == EVENT_HOLD_ELAPSED):
+        if CONVERGED_MARKER in buf[text[row]:ends[row]].tobytes():
+            events[row] = EVENT_HOLD_CONVERGED
+
+    # Setpoint lines carry their setpoint; every other line inherits the last one
+    is_setpoint = np.isin(events, (EVENT_SETPOINT, EVENT_HOLD_START))
+    setpoint = pd.Series(np.where(is_setpoint, values, np.nan)).ffill().to_numpy(copy=True)
+    explicit = np.isin(events, SETPOINT_EVENTS) & ~np.isnan(values)
+    setpoint[explicit] = values[explicit]
+
+    frame = pd.DataFrame({
+        'time': ns.astype('datetime64[ns]'),
+        'seconds': (ns - ns[0]) / 1e9 if len(ns) else np.zeros(0),
+        'event': events,
+        'setpoint': setpoint,
+        'temperature': np.where(events == EVENT_HOLD_SAMPLE, values, np.nan),
+        'uv': np.where(events == EVENT_SAMPLE, values, np.nan),
+    })
+    frame.attrs['elapsed'] = bool(len(is_wall)) and not is_wall[0]
+    return frame
+
+
+def parse_run(temperature_path, uv_path):
+    """Parse the temperature and UV log of one run; returns (temperature frame, UV frame)."""
+    return parse_log(temperature_path), parse_log(uv_path)
+
+
+def hold_temperatures(frame):
+    """Real-time hold readings paired with their setpoint, as plotted by TemperaturePlotWidget."""
+    holds = frame[(frame['event'] == EVENT_HOLD_SAMPLE) & frame['setpoint'].notna()]
+    return pd.DataFrame({'Sensor Temperature': holds['setpoint'].to_numpy(),
+                         'Real-time Temperature': holds['temperature'].to_numpy()})
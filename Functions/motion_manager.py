@@ -0,0 +1,113 @@
+import asyncio
+import concurrent.futures
+from .motor_control import rotate_stepper_async, volume_to_steps, SPEED_DELAYS
+
+
+class MotionJob:
+    def __init__(self, direction, delay, steps, queued_at):
+        self.direction = direction
+        self.delay = delay
+        self.steps = steps
+        self.queued_at = queued_at
+        self.future = concurrent.futures.Future()
+
+
+class MotionManager:
+    """
+    Runs one job queue per pump on the HardwareRuntime, so different pumps move concurrently
+    while commands for the same pump are queued and executed in order.
+    Each command returns a concurrent.futures.Future resolved with the job timing when the
+    move has finished.
+    :param motor_pins: Motor dictionary from setup_board.
+    :param runtime: HardwareRuntime the per-motor workers run on.
+    """
+
+    def __init__(self, motor_pins, runtime):
+        self.motor_pins = motor_pins
+        self.runtime = runtime
+        self.queues = {}  # motor id -> asyncio.Queue, created on the loop by the worker
+        self.pending = {motor_id: [] for motor_id in motor_pins}  # jobs queued before the worker started
+        self.stats = {motor_id: {'jobs': 0, 'failed': 0, 'steps': 0, 'busy_time': 0.0,
+                                 'max_job_time': 0.0, 'total_wait': 0.0, 'queued': 0}
+                      for motor_id in motor_pins}
+        for motor_id in motor_pins:
+            runtime.submit(f'motor:{motor_id}', self._worker(motor_id))
+
+    def move(self, motor_id, direction, speed, volume_g):
+        """Queue a dispense of volume_g on one pump; returns a Future (thread-safe)."""
+        motor = self.motor_pins[motor_id]
+        return self.move_steps(motor_id, direction, SPEED_DELAYS[speed], volume_to_steps(motor, volume_g))
+
+    def move_steps(self, motor_id, direction, delay, steps):
+        job = MotionJob(direction, delay, steps, self.runtime.now())
+        self.runtime.loop.call_soon_threadsafe(self._enqueue, motor_id, job)
+        return job.future
+
+    def _enqueue(self, motor_id, job):
+        self.stats[motor_id]['queued'] += 1
+        queue = self.queues.get(motor_id)
+        if queue is None:
+            self.pending[motor_id].append(job)
+        else:
+            queue.put_nowait(job)
+
+    def clear(self, motor_id):
+        """Cancel the jobs still waiting for a pump; a move already running completes."""
+        def drain():
+            queue = self.queues.get(motor_id)
+            jobs = self.pending[motor_id]
+            self.pending[motor_id] = []
+            while queue is not None and not queue.empty():
+                jobs.append(queue.get_nowait())
+            for job in jobs:
+                job.future.cancel()
+                self.stats[motor_id]['queued'] -= 1
+        self.runtime.loop.call_soon_threadsafe(drain)
+
+    async def _worker(self, motor_id):
+        queue = asyncio.Queue()
+        for job in self.pending[motor_id]:
+            queue.put_nowait(job)
+        self.pending[motor_id] = []
+        self.queues[motor_id] = queue
+        motor = self.motor_pins[motor_id]
+        stats = self.stats[motor_id]
+        try:
+            while True:
+                job = await queue.get()
+                stats['queued'] -= 1
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+                start = self.runtime.now()
+                try:
+                    await rotate_stepper_async(motor, job.direction, job.delay, job.steps, self.runtime)
+                except asyncio.CancelledError:
+                    job.future.cancel()
+                    raise
+                except Exception as e:
+                    stats['failed'] += 1
+                    print(f"{motor_id} move failed: {e}")
+                    job.future.set_exception(e)
+                    continue
+                finished = self.runtime.now()
+                elapsed = finished - start
+                stats['jobs'] += 1
+                stats['steps'] += job.steps
+                stats['busy_time'] += elapsed
+                stats['max_job_time'] = max(stats['max_job_time'], elapsed)
+                stats['total_wait'] += start - job.queued_at
+                job.future.set_result({'motor': motor_id, 'steps': job.steps, 'duration': elapsed,
+                                       'wait': start - job.queued_at, 'finished': finished})
+        finally:
+            # Runtime shutdown: nobody will run the remaining jobs
+            while not queue.empty():
+                queue.get_nowait().future.cancel()
+
+    def get_stats(self):
+        """Per-motor counters plus mean job duration and mean queue wait, in clock seconds."""
+        result = {}
+        for motor_id, stats in self.stats.items():
+            jobs = stats['jobs']
+            result[motor_id] = dict(stats, mean_job_time=stats['busy_time'] / jobs if jobs else 0.0,
+                                    mean_wait=stats['total_wait'] / jobs if jobs else 0.0)
+        return result
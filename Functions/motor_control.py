@@ -1,3 +1,4 @@
+import asyncio
 import time
 import threading
 import tkinter as tk
@@ -15,6 +16,21 @@ VOLUME_PER_STEP_MOTOR3 = 2.4
 # Constants for motor control
 ENABLE_SETTLING_TIME = 0.5  # 100ms settling time after enabling motor
 DISABLE_DELAY = 0.5  # 100ms delay before disabling motor
+STEPPER_ACCELERATION = 2000  # steps/s², used when the board generates the step pulses
+SPEED_DELAYS = {'slow': 2000, 'fast': 1000}  # µs per step phase
+
+def volume_to_steps(motor, volume_g):
+    if motor['dir'] == 22:
+        return int(volume_g / VOLUME_PER_STEP_MOTOR1)
+    elif motor['dir'] == 25:
+        return int(volume_g / VOLUME_PER_STEP_MOTOR2)
+    elif motor['dir'] == 28:
+        return int(volume_g / VOLUME_PER_STEP_MOTOR3)
+    raise ValueError(f"Unknown motor with direction pin {motor['dir']}")
+
+def step_rate(delay):
+    # Each step is a high and a low phase of `delay` microseconds
+    return 1000000.0 / (2 * delay)
 
 def rotate_stepper(motor, direction, delay, steps):
     try:
@@ -23,6 +39,15 @@ def rotate_stepper(motor, direction, delay, steps):
             motor['enable_pin'].write(0)  # Set enable pin to LOW to enable the motor
             time.sleep(ENABLE_SETTLING_TIME)
 
+        if 'stepper' in motor:
+            # The board generates the pulses; wait for its completion report
+            duration = motor['stepper'].move(int(steps) if direction else -int(steps), step_rate(delay), STEPPER_ACCELERATION)
+            if not motor['stepper'].wait(duration * 1.5 + 2):
+                motor['stepper'].stop()
+                print("Stepper did not report completion; is AccelStepperFirmata on the board?")
+            time.sleep(DISABLE_DELAY)
+            return
+
         motor['dir_pin'].write(direction)
         time.sleep(0.5)
         steps = int(steps)
@@ -40,16 +65,39 @@ def rotate_stepper(motor, direction, delay, steps):
         global motor_thread_active
         with motor_thread_lock:
             motor_thread_active = False  # Reset flag when done
+async def rotate_stepper_async(motor, direction, delay, steps, runtime):
+    """Coroutine version of rotate_stepper for the HardwareRuntime event loop."""
+    try:
+        if 'enable_pin' in motor:
+            motor['enable_pin'].write(0)  # Set enable pin to LOW to enable the motor
+            await runtime.sleep(ENABLE_SETTLING_TIME)
+
+        if 'stepper' in motor:
+            # One move command instead of two Firmata writes per step
+            await motor['stepper'].move_async(int(steps) if direction else -int(steps), step_rate(delay),
+                                              STEPPER_ACCELERATION, runtime)
+            await runtime.sleep(DISABLE_DELAY)
+            return
+
+        motor['dir_pin'].write(direction)
+        await runtime.sleep(0.5)
+        for _ in range(int(steps)):
+            motor['step_pin'].write(1)
+            await runtime.sleep(delay / 1000000.0)  # Convert microseconds to seconds
+            motor['step_pin'].write(0)
+            await runtime.sleep(delay / 1000000.0)
+
+        await runtime.sleep(DISABLE_DELAY)
+    finally:
+        if 'enable_pin' in motor:
+            motor['enable_pin'].write(1)  # Set enable pin to HIGH to disable the motor
+
 def control_motor(motor, direction, speed, volume_g):
+    # Thread-based path for the tkinter panel; the Qt GUI queues moves on a MotionManager
     global motor_thread_active
-    delay = 2000 if speed == 'slow' else 1000  # speed control
-    if motor['dir'] == 22:
-        steps = int(volume_g / VOLUME_PER_STEP_MOTOR1)
-    elif motor['dir'] == 25:
-        steps = int(volume_g / VOLUME_PER_STEP_MOTOR2)
-    elif motor['dir'] == 28:
-        steps = int(volume_g / VOLUME_PER_STEP_MOTOR3)
-    
+    delay = SPEED_DELAYS[speed]  # speed control
+    steps = volume_to_steps(motor, volume_g)
+
     # Ensure only one thread is active at a time
     with motor_thread_lock:
         if not motor_thread_active:
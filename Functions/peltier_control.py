@@ -1,42 +1,26 @@
-from simple_pid import PID
-import threading
-import time
+import contextlib
 
-def initialize_pids():
-    return {i: PID(1.0, 0.1, 0.05, setpoint=25) for i in range(5)}
+class ChannelBusyError(RuntimeError):
+    """Raised when a Peltier channel is already controlled by another sweep or monitor."""
 
-def set_pid_output_limits(pids):
-    for pid in pids.values():
-        pid.output_limits = (-0, 0.2)
-
-def start_monitoring(sensor_number, monitoring_events, pids, board, mdd3a_pins, temp_labels):
+def start_monitoring(sensor_number, monitoring_events, scheduler):
     if not monitoring_events[sensor_number].is_set():
+        try:
+            scheduler.acquire(sensor_number, f'monitor{sensor_number}')
+        except ChannelBusyError as e:
+            print(e)
+            return
         monitoring_events[sensor_number].set()
-        thread = threading.Thread(target=monitor_temperature, args=(sensor_number, monitoring_events, pids, board, mdd3a_pins, temp_labels))
-        thread.start()
         print(f"Monitoring started for sensor {sensor_number + 1}.")
 
-def stop_monitoring(sensor_number, monitoring_events, board, mdd3a_pins):
+def stop_monitoring(sensor_number, monitoring_events, scheduler):
     if monitoring_events[sensor_number].is_set():
         monitoring_events[sensor_number].clear()
-        disable_peltier(sensor_number+1, board, mdd3a_pins)
+        # Only release what a sweep or monitor holds; a stale stop must not free another owner's channel
+        for owner in (f'sweep{sensor_number}', f'monitor{sensor_number}'):
+            scheduler.release(sensor_number, owner)
         print(f"Monitoring stopped and Peltier disabled for sensor {sensor_number + 1}.")
 
-def monitor_temperature(sensor_number, monitoring_events, pids, board, mdd3a_pins, temp_labels):
-    pid = pids[sensor_number]
-    try:
-        while monitoring_events[sensor_number].is_set():
-            current_temp_str = temp_labels[sensor_number].cget("text").split(": ")[1].strip().split(' ')[0]
-            current_temp = float(current_temp_str)
-            control = pid(current_temp)
-            action = control > 0
-            pwm_value = abs(control)
-            board_name = f'board{sensor_number + 1}'
-            control_peltier(board, mdd3a_pins, board_name, heat=action, pwm=True, pwm_duty_cycle=pwm_value)
-            time.sleep(1)
-    except Exception as e:
-        print(f"Error in monitoring temperature for sensor {sensor_number + 1}: {e}")
-
 def disable_peltier(board_name, board, mdd3a_pins):
     try:
         board_name = f'board{board_name}'
@@ -59,6 +43,12 @@ def control_peltier(board,mdd3a_pins,board_name, heat, pwm=False, pwm_duty_cycle
 
     pwm_value = pwm_duty_cycle if pwm else 1
 
+    # Send both inputs together when the pins are managed; unchanged values are not re-sent
+    batch = inputA.manager.batch() if hasattr(inputA, 'manager') else contextlib.nullcontext()
+    with batch:
+        _write_peltier_inputs(inputA, inputB, heat, pwm_value)
+
+def _write_peltier_inputs(inputA, inputB, heat, pwm_value):
     if heat is None:
         inputA.write(0)
         inputB.write(0)
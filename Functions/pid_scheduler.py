@@ -0,0 +1,214 @@
+import contextlib
+import threading
+import numpy as np
+from .peltier_control import control_peltier, ChannelBusyError
+
+DEFAULT_GAINS = (1.0, 0.1, 0.05)  # Kp, Ki, Kd
+DEFAULT_OUTPUT_LIMITS = (0.0, 0.2)  # heating duty cycle range
+
+
+class PIDScheduler:
+    """
+    Owns the PID loops of all Peltier channels and steps them together at a fixed rate.
+    The PID math runs vectorized over channels (derivative on measurement, clamped integral
+    with conditional integration as anti-windup) and all outputs are written in one batch.
+    Each channel has at most one owner (a sweep or a monitor) at a time, see acquire().
+    Optionally a channel ramps its setpoint at a limited rate and adds a feedforward duty cycle
+    from an identified plant model (see Functions.pid_tuning); a manual duty cycle bypasses the PID.
+    :param telemetry: TelemetryStore providing the latest temperature per channel.
+    :param board: PyFirmata/Arduino board instance.
+    :param mdd3a_pins: Dictionary with Peltier driver pin mappings.
+    :param outputs: Optional PinOutputManager used to batch the writes of one tick.
+    :param rate_hz: Control rate in ticks per (clock) second.
+    :param stale_after: Readings older than this many seconds switch the channel output off.
+    """
+
+    def __init__(self, telemetry, board, mdd3a_pins, outputs=None, n_channels=5, rate_hz=1.0,
+                 gains=DEFAULT_GAINS, output_limits=DEFAULT_OUTPUT_LIMITS, stale_after=10.0):
+        self.telemetry = telemetry
+        self.board = board
+        self.mdd3a_pins = mdd3a_pins
+        self.outputs = outputs
+        self.n_channels = n_channels
+        self.rate_hz = rate_hz
+        self.stale_after = stale_after
+        self.kp = np.full(n_channels, float(gains[0]))
+        self.ki = np.full(n_channels, float(gains[1]))
+        self.kd = np.full(n_channels, float(gains[2]))
+        self.output_min = np.full(n_channels, float(output_limits[0]))
+        self.output_max = np.full(n_channels, float(output_limits[1]))
+        self.setpoints = np.full(n_channels, 25.0)  # setpoints the PID acts on (ramped)
+        self.targets = np.full(n_channels, 25.0)  # setpoints requested by the owner
+        self.ramp_rate = np.full(n_channels, np.inf)  # °C per second
+        self.plant_gain = np.full(n_channels, np.nan)  # °C per unit duty cycle, NaN disables feedforward
+        self.ambient = np.full(n_channels, np.nan)
+        self.manual = np.full(n_channels, np.nan)  # open-loop duty cycle, NaN for closed loop
+        self.integral = np.zeros(n_channels)
+        self.last_input = np.full(n_channels, np.nan)
+        self.output = np.zeros(n_channels)
+        self.enabled = np.zeros(n_channels, dtype=bool)
+        self.owners = {}  # channel -> owner name
+        self.lock = threading.RLock()
+        self.ticks = 0
+        self.max_jitter = 0.0
+        self.total_jitter = 0.0
+
+    def acquire(self, channel, owner):
+        """Give `owner` exclusive control of a channel; raises ChannelBusyError if another owner has it."""
+        with self.lock:
+            current = self.owners.get(channel)
+            if current is not None and current != owner:
+                raise ChannelBusyError(f"Peltier {channel + 1} is already controlled by {current}")
+            self.owners[channel] = owner
+            self.integral[channel] = 0.0
+            self.last_input[channel] = np.nan
+            self.setpoints[channel] = np.nan  # ramps start from the first measurement
+            self.manual[channel] = np.nan
+            self.enabled[channel] = True
+
+    def release(self, channel, owner=None):
+        """Stop controlling a channel and switch its Peltier off; owner=None releases unconditionally."""
+        with self.lock:
+            if owner is not None and self.owners.get(channel) != owner:
+                return
+            self.owners.pop(channel, None)
+            self.enabled[channel] = False
+            self.output[channel] = 0.0
+            control_peltier(self.board, self.mdd3a_pins, f'board{channel + 1}', heat=None, pwm=False, pwm_duty_cycle=0)
+
+    def owner(self, channel):
+        return self.owners.get(channel)
+
+    def set_setpoint(self, channel, setpoint):
+        with self.lock:
+            self.targets[channel] = setpoint
+            if not np.isfinite(self.ramp_rate[channel]):
+                self.setpoints[channel] = setpoint
+
+    def set_gains(self, channel, kp, ki, kd):
+        with self.lock:
+            self.kp[channel], self.ki[channel], self.kd[channel] = kp, ki, kd
+
+    def set_ramp(self, channel, rate):
+        """Limit how fast the setpoint of a channel moves, in °C per minute; None steps it directly."""
+        with self.lock:
+            self.ramp_rate[channel] = np.inf if rate is None else rate / 60.0
+
+    def set_model(self, channel, gain, ambient):
+        """Enable feedforward from a first-order model: duty = (setpoint - ambient) / gain."""
+        with self.lock:
+            self.plant_gain[channel], self.ambient[channel] = gain, ambient
+
+    def set_manual(self, channel, duty):
+        """Drive a channel open loop at a fixed duty cycle; None returns it to closed loop without a bump."""
+        with self.lock:
+            if duty is None:
+                if np.isfinite(self.manual[channel]):
+                    self.integral[channel] = self.manual[channel] - self._feedforward()[channel]
+                self.manual[channel] = np.nan
+            else:
+                self.manual[channel] = duty
+
+    def hold_output(self, channel):
+        """Duty cycle the controller settles on at its setpoint (integral plus feedforward)."""
+        with self.lock:
+            return float(np.clip(self.integral[channel] + self._feedforward()[channel],
+                                 self.output_min[channel], self.output_max[channel]))
+
+    def _feedforward(self):
+        feedforward = (self.setpoints - self.ambient) / self.plant_gain
+        return np.where(np.isfinite(feedforward), feedforward, 0.0)
+
+    def compute(self, measurements, dt):
+        """
+        Advance every enabled channel by one PID step.
+        :param measurements: Array of temperatures, NaN where no valid reading is available.
+        :param dt: Time since the previous step in seconds.
+        :return: Array of outputs (0 for disabled channels or missing readings).
+        """
+        with self.lock:
+            valid = self.enabled & np.isfinite(measurements)
+            # Ramp the working setpoints towards the requested ones
+            self.setpoints = np.where(np.isnan(self.setpoints) & valid, measurements, self.setpoints)
+            max_change = self.ramp_rate * dt
+            unset = np.where(np.isfinite(self.ramp_rate), np.nan, self.targets)
+            self.setpoints = np.where(np.isfinite(self.setpoints),
+                                      self.setpoints + np.clip(self.targets - self.setpoints, -max_change, max_change),
+                                      unset)
+            feedforward = self._feedforward()
+            error = self.setpoints - measurements
+            d_input = np.where(np.isfinite(self.last_input), measurements - self.last_input, 0.0)
+
+            proportional = self.kp * error
+            derivative = -self.kd * d_input / dt
+            integral = np.clip(self.integral + self.ki * error * dt, self.output_min - feedforward, self.output_max - feedforward)
+            unclamped = feedforward + proportional + integral + derivative
+
+            # Anti-windup: do not integrate further into a saturated output
+            saturated_high = (unclamped > self.output_max) & (error > 0)
+            saturated_low = (unclamped < self.output_min) & (error < 0)
+            integral = np.where(saturated_high | saturated_low, self.integral, integral)
+            output = np.clip(feedforward + proportional + integral + derivative, self.output_min, self.output_max)
+
+            manual = np.isfinite(self.manual)
+            output = np.where(manual, np.clip(self.manual, self.output_min, self.output_max), output)
+            integral = np.where(manual, self.integral, integral)
+
+            self.integral = np.where(valid, integral, self.integral)
+            self.last_input = np.where(valid, measurements, self.last_input)
+            self.output = np.where(valid, output, 0.0)
+            return self.output.copy()
+
+    def read_measurements(self, now):
+        measurements = np.full(self.n_channels, np.nan)
+        for channel in range(self.n_channels):
+            sample = self.telemetry.temperature[channel].latest()
+            if sample is not None and now - sample[0] <= self.stale_after:
+                measurements[channel] = sample[1]
+        return measurements
+
+    def drive(self, output):
+        batch = self.outputs.batch() if self.outputs is not None else contextlib.nullcontext()
+        with self.lock, batch:
+            for channel in np.flatnonzero(self.enabled):
+                control_peltier(self.board, self.mdd3a_pins, f'board{channel + 1}',
+                                heat=bool(output[channel] > 0), pwm=True, pwm_duty_cycle=float(abs(output[channel])))
+
+    def tick(self, now, dt):
+        output = self.compute(self.read_measurements(now), dt)
+        self.drive(output)
+        return output
+
+    async def run(self, runtime):
+        """Control loop task for HardwareRuntime; switches every Peltier off when cancelled."""
+        period = 1.0 / self.rate_hz
+        next_tick = runtime.now()
+        last_tick = None
+        try:
+            while True:
+                now = runtime.now()
+                jitter = max(0.0, now - next_tick)
+                self.ticks += 1
+                self.total_jitter += jitter
+                self.max_jitter = max(self.max_jitter, jitter)
+
+                self.tick(now, period if last_tick is None else max(now - last_tick, 1e-6))
+                last_tick = now
+
+                next_tick += period
+                if next_tick < runtime.now():
+                    # Fell behind (e.g. a blocked loop); resynchronise instead of bursting
+                    next_tick = runtime.now() + period
+                await runtime.sleep(next_tick - runtime.now())
+        finally:
+            for channel in list(self.owners):
+                self.release(channel)
+
+    def get_stats(self):
+        return {
+            'ticks': self.ticks,
+            'rate_hz': self.rate_hz,
+            'mean_jitter': self.total_jitter / self.ticks if self.ticks else 0.0,
+            'max_jitter': self.max_jitter,
+            'owners': dict(self.owners),
+        }
@@ -0,0 +1,172 @@
+import json
+import os
+import numpy as np
+from scipy.optimize import curve_fit
+from .peltier_control import ChannelBusyError
+from .stabilization import SampleWaiter, StabilityDetector
+
+PID_GAINS_FILE = 'pid_gains.json'
+SAMPLE_TIMEOUT = 5  # seconds to wait for a new temperature sample
+
+
+def fopdt_response(t, baseline, gain, tau, dead_time, step):
+    """Temperature of a first-order-plus-dead-time plant `t` seconds after a duty cycle step."""
+    elapsed = np.maximum(t - dead_time, 0.0)
+    return baseline + gain * step * (1.0 - np.exp(-elapsed / tau))
+
+
+def fit_fopdt(timestamps, temperatures, step):
+    """
+    Identify a first-order-plus-dead-time model from an open-loop step response.
+    :param timestamps: Seconds since the duty cycle step.
+    :param temperatures: Temperatures over the same samples.
+    :param step: Size of the duty cycle step.
+    :return: (gain in °C per unit duty, tau in s, dead_time in s, baseline temperature in °C)
+    """
+    baseline = temperatures[:5].mean()
+    final = temperatures[-5:].mean()
+    # Two-point estimate (28% / 63% rise times) as the starting guess for the least-squares fit
+    rise = (temperatures - baseline) / (final - baseline)
+    t28 = timestamps[np.argmax(rise >= 0.283)]
+    t63 = timestamps[np.argmax(rise >= 0.632)]
+    tau0 = max(1.5 * (t63 - t28), 1.0)
+    dead_time0 = max(t63 - tau0, 0.0)
+    gain0 = (final - baseline) / step
+
+    (baseline, gain, tau, dead_time), _ = curve_fit(
+        lambda t, b, k, tau, theta: fopdt_response(t, b, k, tau, theta, step),
+        timestamps, temperatures, p0=(baseline, gain0, tau0, dead_time0),
+        bounds=([-np.inf, 0.0, 1e-3, 0.0], [np.inf, np.inf, np.inf, timestamps[-1]]))
+    return gain, tau, dead_time, baseline
+
+
+def imc_gains(gain, tau, dead_time, closed_loop_tau=None):
+    """
+    IMC PID gains for a first-order-plus-dead-time plant.
+    :param closed_loop_tau: Desired closed-loop time constant; defaults to the larger of the
+                            dead time and tau / 10 (aggressive but robust to the dead time).
+    :return: (kp, ki, kd) in the units PIDScheduler uses (seconds).
+    """
+    if closed_loop_tau is None:
+        closed_loop_tau = max(dead_time, tau / 10.0)
+    kp = (tau + dead_time / 2.0) / (gain * (closed_loop_tau + dead_time / 2.0))
+    ti = tau + dead_time / 2.0
+    td = tau * dead_time / (2.0 * tau + dead_time)
+    return kp, kp / ti, kp * td
+
+
+def load_tuning(path=PID_GAINS_FILE):
+    """Return the stored tuning as {channel: {...}}, empty if no file exists."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return {int(channel): entry for channel, entry in json.load(f).items()}
+    except (OSError, ValueError) as e:
+        print(f"Could not read PID gains from {path}: {e}")
+        return {}
+
+
+def save_tuning(channel, entry, path=PID_GAINS_FILE):
+    """Store the tuning of one channel, keeping the entries of the others."""
+    tuning = load_tuning(path)
+    tuning[channel] = entry
+    with open(path, 'w') as f:
+        json.dump({str(channel): entry for channel, entry in sorted(tuning.items())}, f, indent=2)
+
+
+def apply_tuning(scheduler, tuning, feedforward=True):
+    """Load stored gains (and the feedforward model, if enabled) into a PIDScheduler."""
+    for channel, entry in tuning.items():
+        if channel >= scheduler.n_channels:
+            continue
+        scheduler.set_gains(channel, entry['kp'], entry['ki'], entry['kd'])
+        if feedforward:
+            scheduler.set_model(channel, entry['gain'], entry['ambient'])
+
+
+async def measure_settle_time(channel, setpoint, scheduler, telemetry, runtime, stability, timeout):
+    """Step the setpoint and return the seconds until the channel is stable, or None on timeout."""
+    waiter = SampleWaiter(telemetry, channel)
+    try:
+        scheduler.set_setpoint(channel, setpoint)
+        start = runtime.now()
+        while runtime.now() - start < timeout:
+            await waiter.wait(runtime, SAMPLE_TIMEOUT)
+            now = runtime.now()
+            if stability.is_stable(telemetry, channel, setpoint, now, start)[0]:
+                return now - start
+        return None
+    finally:
+        waiter.close()
+
+
+async def autotune(channel, scheduler, telemetry, runtime, step_duty=0.02, test_step=1.0,
+                   baseline=30.0, duration=600.0, settle_timeout=600.0, path=PID_GAINS_FILE):
+    """
+    Auto-tune one Peltier channel from an open-loop step response and report the settle time
+    of a closed-loop setpoint step with the old and the new gains.
+    :param step_duty: Heating duty cycle added for the step test (limited by the output range).
+    :param test_step: Setpoint step in °C used to measure the settle time.
+    :param baseline: Seconds recorded at constant duty before the step.
+    :param duration: Seconds recorded after the step; should cover several time constants.
+    :return: The stored tuning entry, or None if the channel is busy or the fit failed.
+    """
+    owner = f'tune{channel}'
+    try:
+        scheduler.acquire(channel, owner)
+    except ChannelBusyError as e:
+        print(e)
+        return None
+
+    stability = StabilityDetector()
+    try:
+        # Settle time with the current gains, starting from wherever the channel is
+        start_temp = telemetry.latest_temperature(channel)
+        if start_temp is None:
+            print(f"Auto-tune of Peltier {channel + 1} aborted: no temperature readings")
+            return None
+        settle_before = await measure_settle_time(channel, round(start_temp + test_step, 1), scheduler, telemetry,
+                                                  runtime, stability, settle_timeout)
+
+        # Open-loop step from the duty cycle that holds the current setpoint
+        hold_duty = scheduler.hold_output(channel)
+        step_duty = min(step_duty, scheduler.output_max[channel] - hold_duty)
+        scheduler.set_manual(channel, hold_duty)
+        await runtime.sleep(baseline)
+        step_start = runtime.now()
+        scheduler.set_manual(channel, hold_duty + step_duty)
+        await runtime.sleep(duration)
+        timestamps, temperatures = telemetry.temperature[channel].since(step_start - baseline)
+        timestamps = timestamps - step_start
+        pre = timestamps < 0
+        try:
+            gain, tau, dead_time, _ = fit_fopdt(timestamps, temperatures, step_duty)
+        except (RuntimeError, ValueError) as e:
+            print(f"Auto-tune of Peltier {channel + 1} failed: {e}")
+            return None
+        ambient = float(temperatures[pre].mean() if pre.any() else temperatures[0]) - gain * hold_duty
+        kp, ki, kd = imc_gains(gain, tau, dead_time)
+        # Install the new model first, so the integral is seeded against the feedforward that will drive the output
+        scheduler.set_gains(channel, kp, ki, kd)
+        scheduler.set_model(channel, gain, ambient)
+        scheduler.set_manual(channel, None)
+
+        # Settle time with the new gains
+        current = telemetry.latest_temperature(channel)
+        settle_after = await measure_settle_time(channel, round(current + test_step, 1), scheduler, telemetry,
+                                                 runtime, stability, settle_timeout)
+
+        entry = {'kp': kp, 'ki': ki, 'kd': kd, 'gain': gain, 'tau': tau, 'dead_time': dead_time,
+                 'ambient': ambient, 'settle_before': settle_before, 'settle_after': settle_after}
+        save_tuning(channel, entry, path)
+
+        def describe(seconds):
+            return f"{seconds:.1f} s" if seconds is not None else f"> {settle_timeout:.0f} s"
+        print(f"Peltier {channel + 1} tuned: K={gain:.1f}°C/duty, tau={tau:.1f} s, dead time={dead_time:.1f} s -> "
+              f"Kp={kp:.4f}, Ki={ki:.5f}, Kd={kd:.4f}; "
+              f"settle time {describe(settle_before)} before, {describe(settle_after)} after")
+        return entry
+    finally:
+        scheduler.set_manual(channel, None)
+        scheduler.release(channel, owner)
@@ -0,0 +1,123 @@
+import contextlib
+import threading
+import time
+
+PWM_LEVELS = 255  # Firmata PWM writes carry 8-bit duty cycles
+
+
+class ManagedPin:
+    """
+    Wrapper around a pyfirmata pin whose writes go through a PinOutputManager.
+    Drop-in for the raw pin in motor_pins/mdd3a_pins (write, read and mode work as before).
+    """
+
+    def __init__(self, manager, pin, spec):
+        self.manager = manager
+        self.pin = pin
+        self.spec = spec
+        self.pwm = spec.endswith(':p')
+
+    def write(self, value):
+        self.manager.write(self, value)
+
+    def read(self):
+        return self.pin.read()
+
+    @property
+    def mode(self):
+        return self.pin.mode
+
+    @mode.setter
+    def mode(self, mode):
+        self.pin.mode = mode
+
+
+class PinOutputManager:
+    """
+    Caches pin objects and filters output writes before they reach Firmata:
+    values are quantized to what the pin can resolve, writes that would not change the pin
+    are suppressed, and writes made inside batch() are sent together when the batch ends.
+    :param board: pyfirmata (or simulated) board.
+    """
+
+    def __init__(self, board, clock=time):
+        self.board = board
+        self.clock = clock
+        self.pins = {}  # spec -> ManagedPin
+        self.last_written = {}  # ManagedPin -> value currently on the pin
+        self.lock = threading.RLock()
+        self.local = threading.local()  # per thread: batch depth and pending (ManagedPin -> value staged in the batch)
+        self.messages = 0
+        self.suppressed = 0
+        self._rate_time = clock.monotonic()
+        self._rate_messages = 0
+
+    def pin(self, spec):
+        """Return the cached ManagedPin for a pyfirmata pin spec such as 'd:13:p'."""
+        with self.lock:
+            managed = self.pins.get(spec)
+            if managed is None:
+                managed = self.register(spec, self.board.get_pin(spec))
+            return managed
+
+    def register(self, spec, pin):
+        """Wrap a pin that was already obtained from the board."""
+        with self.lock:
+            managed = ManagedPin(self, pin, spec)
+            self.pins[spec] = managed
+            return managed
+
+    def quantize(self, managed, value):
+        if managed.pwm:
+            return round(min(max(float(value), 0.0), 1.0) * PWM_LEVELS) / PWM_LEVELS
+        return 1 if value else 0
+
+    def write(self, managed, value):
+        value = self.quantize(managed, value)
+        with self.lock:
+            if getattr(self.local, 'depth', 0) > 0:
+                self.local.pending[managed] = value
+            else:
+                self._send(managed, value)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Stage every write made in this thread until the outermost batch exits, then flush."""
+        self.local.depth = getattr(self.local, 'depth', 0) + 1
+        if self.local.depth == 1:
+            self.local.pending = {}
+        try:
+            yield self
+        finally:
+            self.local.depth -= 1
+            if self.local.depth == 0:
+                self.flush()
+
+    def flush(self):
+        """Send the writes this thread has staged so far; writes staged by other threads stay in their batches."""
+        with self.lock:
+            pending, self.local.pending = getattr(self.local, 'pending', {}), {}
+            for managed, value in pending.items():
+                self._send(managed, value)
+
+    def _send(self, managed, value):
+        if self.last_written.get(managed) == value:
+            self.suppressed += 1
+            return
+        managed.pin.write(value)
+        self.last_written[managed] = value
+        self.messages += 1
+
+    def get_stats(self):
+        """Return write counters; messages_per_sec covers the time since the previous call."""
+        with self.lock:
+            now = self.clock.monotonic()
+            elapsed = now - self._rate_time
+            messages_per_sec = (self.messages - self._rate_messages) / elapsed if elapsed > 0 else 0.0
+            self._rate_time = now
+            self._rate_messages = self.messages
+            return {
+                'messages': self.messages,
+                'messages_per_sec': messages_per_sec,
+                'suppressed': self.suppressed,
+            }
@@ -0,0 +1,226 @@
+"""SQLite index of the runs under Data/; python -m Functions.run_index rescans it."""
+import argparse
+import concurrent.futures
+import contextlib
+import datetime
+import os
+import re
+import sqlite3
+import pandas as pd
+from .analysis_cache import fingerprint
+from .analysis_pool import AnalysisPool, find_runs
+from .batch_analysis import find_run_folders, quality_flags
+from .lcst_analysis import HOLD_WINDOW_MINUTES, ROLLING_WINDOW, analyze_run
+from .run_log import read_run_info
+
+DATA_DIR = 'Data'
+RUN_INDEX_PATH = os.path.join(DATA_DIR, 'run_index.sqlite')
+COMPONENTS = ('NaCl', 'NaBr', 'CaCl2', 'polymer')  # as in dispense_planner.STOCK_CONCENTRATIONS
+SCHEMA_VERSION = 1
+FOLDER_STAMP = re.compile(r'_(\d{8}_\d{6})$')
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    folder TEXT UNIQUE NOT NULL,
+    name TEXT NOT NULL,
+    started TEXT,
+    status TEXT
+);
+CREATE TABLE IF NOT EXISTS channels (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    sensor INTEGER NOT NULL,
+    start_temp REAL, end_temp REAL, step REAL, hold_minutes REAL, n_holds INTEGER, n_samples INTEGER,
+    {', '.join(f'{component} REAL' for component in COMPONENTS)},
+    lcst REAL, crossing_slope REAL, sigmoid_lcst REAL, flags TEXT,
+    window_minutes REAL, rolling_window INTEGER,
+    temperature_log TEXT NOT NULL, temperature_fingerprint TEXT, uv_log TEXT, uv_fingerprint TEXT,
+    UNIQUE (run_id, sensor)
+);
+CREATE INDEX IF NOT EXISTS runs_started ON runs(started);
+CREATE INDEX IF NOT EXISTS channels_sensor ON channels(sensor);
+CREATE INDEX IF NOT EXISTS channels_lcst ON channels(lcst);
+"""
+
+
+def _fingerprint_text(path):
+    stamp = fingerprint(path)
+    return None if stamp is None else f"{stamp[1]}:{stamp[2]}"
+
+
+def _started(folder, info):
+    if info.get('started'):
+        return info['started']
+    match = FOLDER_STAMP.search(os.path.basename(folder))
+    if match is None:
+        return None
+    return datetime.datetime.strptime(match.group(1), "%Y%m%d_%H%M%S").isoformat(sep=' ')
+
+
+def _sweep_parameters(info, result):
+    """(start, end, step, hold minutes) from run_info.json, or from the hold setpoints of the log."""
+    if 'start_temp' in info:
+        return info['start_temp'], info.get('end_temp'), info.get('step'), info.get('hold_minutes')
+    setpoints = sorted(set(result['holds']['Sensor Temperature'].round(3)))
+    if not setpoints:
+        return None, None, None, None
+    steps = pd.Series(setpoints).diff().dropna()
+    return setpoints[0], setpoints[-1], float(steps.median()) if len(steps) else None, None
+
+
+class RunIndex:
+    """
+    :param path: SQLite file, created with its schema on first use.
+    Every call opens its own connection, so the sweep thread, the GUI and rescans can share it.
+    """
+
+    def __init__(self, path=RUN_INDEX_PATH):
+        self.path = path
+
+    @contextlib.contextmanager
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            db.execute("PRAGMA foreign_keys = ON")
+            if db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                db.executescript(SCHEMA)
+                db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _stale(self, db, runs, params):
+        """The runs (from find_runs) whose logs or analysis parameters changed since they were indexed."""
+        indexed = {(folder, sensor): row for folder, sensor, *row in db.execute(
+            "SELECT runs.folder, sensor, temperature_fingerprint, uv_fingerprint, window_minutes, rolling_window "
+            "FROM channels JOIN runs ON runs.id = channels.run_id")}
+        return [run for run in runs
+                if indexed.get((os.path.abspath(run[0]), run[1])) != [
+                    _fingerprint_text(run[2]), _fingerprint_text(run[3]),
+                    params['window_minutes'], params['rolling_window']]]
+
+    def _store(self, db, run, result, params):
+        folder, sensor, temperature_path, uv_path = run
+        folder = os.path.abspath(folder)
+        info = read_run_info(folder)
+        db.execute("INSERT INTO runs (folder, name, started, status) VALUES (?, ?, ?, ?) "
+                   "ON CONFLICT (folder) DO UPDATE SET started = excluded.started, status = excluded.status",
+                   (folder, os.path.basename(folder), _started(folder, info), result['end']))
+        run_id = db.execute("SELECT id FROM runs WHERE folder = ?", (folder,)).fetchone()[0]
+        composition = info.get('composition') or {}
+        values = {'run_id': run_id, 'sensor': sensor, 'n_holds': len(result['temperatures']),
+                  'n_samples': result['n_samples'], 'lcst': result['lcst'],
+                  'crossing_slope': result['crossing_slope'], 'sigmoid_lcst': result['sigmoid_lcst'],
+                  'flags': ';'.join(quality_flags(uv_path, result)), **params,
+                  'temperature_log': os.path.abspath(temperature_path),
+                  'temperature_fingerprint': _fingerprint_text(temperature_path),
+                  'uv_log': os.path.abspath(uv_path) if uv_path is not None else None,
+                  'uv_fingerprint': _fingerprint_text(uv_path)}
+        values.update(zip(('start_temp', 'end_temp', 'step', 'hold_minutes'), _sweep_parameters(info, result)))
+        values.update({component: composition.get(component) for component in COMPONENTS})
+        columns = ', '.join(values)
+        db.execute(f"INSERT OR REPLACE INTO channels ({columns}) VALUES ({', '.join('?' * len(values))})",
+                   list(values.values()))
+
+    def update_run(self, folder, window_minutes=HOLD_WINDOW_MINUTES, rolling_window=ROLLING_WINDOW, cache=None):
+        """Analyse and index the changed sensor logs of one run folder, in this process; returns how many."""
+        params = {'window_minutes': window_minutes, 'rolling_window': rolling_window}
+        with self._connect() as db:
+            stale = self._stale(db, find_runs([folder]), params)
+            for run in stale:
+                self._store(db, run, analyze_run(run[2], run[3], cache=cache, **params), params)
+        return len(stale)
+
+    def rescan(self, roots=(DATA_DIR,), window_minutes=HOLD_WINDOW_MINUTES, rolling_window=ROLLING_WINDOW,
+               max_workers=None, cache=None):
+        """
+        Index every run folder below `roots`: changed sensor logs are analysed in a process pool,
+        and runs whose folders were deleted are dropped.
+        :return: Number of channels (re-)analysed and stored.
+        """
+        params = {'window_minutes': window_minutes, 'rolling_window': rolling_window}
+        with self._connect() as db:
+            stale = self._stale(db, find_runs(find_run_folders(roots)), params)
+            gone = [(folder,) for folder, in db.execute("SELECT folder FROM runs") if not os.path.isdir(folder)]
+            db.executemany("DELETE FROM runs WHERE folder = ?", gone)
+        if not stale:
+            return 0
+        pool = AnalysisPool(max_workers, cache)
+        try:
+            pool.submit(stale, lambda batch, run, future: None, **params)
+            concurrent.futures.wait(pool.futures)
+            # Read the futures themselves: wait() can return before their done-callbacks have run
+            finished = list(zip(stale, pool.futures))
+        finally:
+            pool.shutdown()
+        indexed = 0
+        with self._connect() as db:
+            for run, future in finished:
+                try:
+                    self._store(db, run, future.result(), params)
+                    indexed += 1
+                except Exception as e:
+                    print(f"Error indexing {run[2]}: {e}")
+        return indexed
+
+    def query(self, sensor=None, lcst=None, started=None, composition=None, clean=False):
+        """
+        Indexed channels matching every given filter, newest run first.
+        :param lcst: (low, high) LCST range in °C; either end may be None.
+        :param started: (since, until) as 'YYYY-MM-DD[ HH:MM:SS]' strings; either end may be None.
+        :param composition: {component: (low, high)} ranges, components from COMPONENTS.
+        :param clean: Only channels without quality flags.
+        :return: DataFrame with the runs and channels columns.
+        """
+        conditions, values = [], []
+
+        def between(column, bounds):
+            low, high = bounds
+            if low is not None:
+                conditions.append(f"{column} >= ?")
+                values.append(low)
+            if high is not None:
+                conditions.append(f"{column} <= ?")
+                values.append(high)
+
+        if sensor is not None:
+            conditions.append("sensor = ?")
+            values.append(sensor)
+        if lcst is not None:
+            between('lcst', lcst)
+        if started is not None:
+            between('started', started)
+        for component, bounds in (composition or {}).items():
+            if component not in COMPONENTS:
+                raise ValueError(f"Unknown component {component}; expected one of {', '.join(COMPONENTS)}")
+            between(component, bounds)
+        if clean:
+            conditions.append("flags = ''")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._connect() as db:
+            return pd.read_sql_query(f"SELECT runs.folder, runs.name, runs.started, runs.status, channels.* "
+                                     f"FROM channels JOIN runs ON runs.id = channels.run_id {where} "
+                                     f"ORDER BY runs.started DESC, runs.folder, sensor", db, params=values)
+
+
+def indexed_runs(frame):
+    """(folder, sensor, temperature log, UV log or None) tuples of query() rows, as find_runs returns them."""
+    return [(row.folder, row.sensor, row.temperature_log, row.uv_log if isinstance(row.uv_log, str) else None)
+            for row in frame.itertuples()]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Update and query the SQLite index of LCST runs")
+    parser.add_argument('roots', nargs='*', default=[DATA_DIR], help="folders to rescan (default: Data)")
+    parser.add_argument('--index', default=RUN_INDEX_PATH, help="index file")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument('--lcst', type=float, nargs=2, metavar=('LOW', 'HIGH'), help="list channels in this LCST range")
+    args = parser.parse_args()
+
+    index = RunIndex(args.index)
+    print(f"Indexed {index.rescan(args.roots, max_workers=args.workers)} changed sensor logs in {args.index}")
+    if args.lcst:
+        print(index.query(lcst=args.lcst)[['name', 'sensor', 'lcst', 'flags', *COMPONENTS]].to_string(index=False))
@@ -0,0 +1,200 @@
+"""Binary run log of a temperature sweep: a 32-byte header followed by fixed-width RECORD_DTYPE records."""
+import datetime
+import json
+import os
+import struct
+import sys
+import time
+import numpy as np
+
+MAGIC = b'LCSTRUN1'
+VERSION = 1
+HEADER = struct.Struct('<8sHHIqq')  # magic, version, channel, reserved, wall start ns, monotonic start ns
+RECORD_DTYPE = np.dtype([('time_ns', '<i8'), ('channel', 'u1'), ('event', 'u1'),
+                         ('setpoint', '<f4'), ('temperature', '<f4'), ('uv', '<f4')])
+
+# Event records reuse the temperature/uv columns for their values
+EVENT_SAMPLE = 0  # UV reading while stabilizing; temperature: latest reading
+EVENT_HOLD_SAMPLE = 1  # temperature and UV reading while holding
+EVENT_SETPOINT = 2
+EVENT_STABILIZED = 3  # temperature: fitted slope in °C/min, uv: dwell in s
+EVENT_HOLD_START = 4  # uv: planned hold time in minutes
+EVENT_HOLD_CONVERGED = 5  # temperature: seconds held, uv: mean UV reading (NaN if unknown)
+EVENT_HOLD_ELAPSED = 6  # as EVENT_HOLD_CONVERGED
+EVENT_COMPLETED = 7
+EVENT_STOPPED = 8
+EVENT_HOLD_CI = 9  # temperature: CI half-width, uv: drift of the UV mean (adaptive holds)
+EVENT_HOLD_COUNT = 10  # uv: UV samples behind the CI (adaptive holds)
+EVENT_VISITED = 11  # one per setpoint an adaptive sweep visited, written when it ends
+
+RUN_LOG_NAME = "run_log_sensor_{}.bin"
+RUN_INFO_NAME = "run_info.json"
+
+
+class RunLogWriter:
+    """
+    Buffers records in a preallocated array and appends them to the file in blocks.
+    A block is written when the buffer is full or when a record arrives more than
+    flush_interval clock seconds after the previous write, so data reaches the OS no later
+    than one record after the interval has passed; close() writes the rest.
+    :param channel: Sensor index the run belongs to.
+    :param clock: Clock object providing time() and monotonic().
+    """
+
+    def __init__(self, path, channel, clock=time, flush_interval=1.0, buffer_records=4096):
+        self.path = path
+        self.channel = channel
+        self.clock = clock
+        self.flush_interval = flush_interval
+        self.buffer = np.zeros(buffer_records, dtype=RECORD_DTYPE)
+        self.count = 0
+        self.records = 0
+        self.flushes = 0
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, channel, 0, int(clock.time() * 1e9), int(clock.monotonic() * 1e9)))
+        self.last_flush = clock.monotonic()
+
+    def append(self, event, setpoint=np.nan, temperature=np.nan, uv=np.nan):
+        now = self.clock.monotonic()
+        record = self.buffer[self.count]
+        record['time_ns'] = int(now * 1e9)
+        record['channel'] = self.channel
+        record['event'] = event
+        record['setpoint'] = setpoint
+        record['temperature'] = np.nan if temperature is None else temperature
+        record['uv'] = np.nan if uv is None else uv
+        self.count += 1
+        self.records += 1
+        if self.count == len(self.buffer) or now - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self.count:
+            self.file.write(self.buffer[:self.count].tobytes())
+            self.count = 0
+        self.file.flush()
+        self.flushes += 1
+        self.last_flush = self.clock.monotonic()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+def read_header(path):
+    """Header dict of a run log (version, channel, wall_start_ns, monotonic_start_ns)."""
+    with open(path, 'rb') as f:
+        magic, version, channel, _, wall_start_ns, monotonic_start_ns = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a run log")
+    return {'version': version, 'channel': channel, 'wall_start_ns': wall_start_ns,
+            'monotonic_start_ns': monotonic_start_ns}
+
+
+def read_run_log(path):
+    """
+    Memory-map a run log.
+    :return: (header dict, structured record array); a partially written last record is ignored.
+    """
+    header = read_header(path)
+    count = (os.path.getsize(path) - HEADER.size) // RECORD_DTYPE.itemsize
+    if count == 0:
+        return header, np.zeros(0, dtype=RECORD_DTYPE)
+    return header, np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER.size, shape=(count,))
+
+
+def wall_clock_times(header, records):
+    """Local wall-clock datetime64[us] of every record, on the (possibly simulated) clock of the run."""
+    epoch_ns = header['wall_start_ns'] + (records['time_ns'] - header['monotonic_start_ns'])
+    utc_offset = datetime.datetime.fromtimestamp(header['wall_start_ns'] / 1e9).astimezone().utcoffset()
+    return (epoch_ns + int(utc_offset.total_seconds() * 1e9)).astype('datetime64[ns]').astype('datetime64[us]')
+
+
+def export_text_logs(path, folder=None):
+    """
+    Write the legacy temperature/UV text logs of a run log.
+    :param folder: Output folder; defaults to the folder of the run log.
+    :return: (temperature log path, UV log path)
+    """
+    header, records = read_run_log(path)
+    sensor = header['channel'] + 1
+    folder = folder or os.path.dirname(path)
+    stamps = np.char.replace(np.datetime_as_string(wall_clock_times(header, records), unit='us'), 'T', ' ')
+
+    temperature_lines, uv_lines = [], []
+    set_time = None
+    hold_stats = {}  # CI, drift and n of the hold being ended
+    visited = []
+    events = records['event']
+    for i, (stamp, record) in enumerate(zip(stamps, records)):
+        event = record['event']
+        setpoint, temperature, uv = float(record['setpoint']), float(record['temperature']), float(record['uv'])
+        if event in (EVENT_SAMPLE, EVENT_HOLD_SAMPLE) and not np.isnan(uv):
+            uv_lines.append(f"{stamp}: UV Sensor {sensor} Reading: {uv:.0f}\n")
+        if event == EVENT_HOLD_SAMPLE and not np.isnan(temperature):
+            temperature_lines.append(f"{stamp}: Real-time Hold Temp: {temperature:.2f}°C\n")
+        elif event == EVENT_SETPOINT:
+            set_time = record['time_ns']
+            temperature_lines.append(f"{stamp}: Set Sensor {sensor} to {setpoint:g}°C\n")
+        elif event == EVENT_STABILIZED:
+            transition = (record['time_ns'] - set_time) / 1e9 if set_time is not None else float('nan')
+            temperature_lines.append(f"{stamp}: Temperature {setpoint:g}°C stabilized for {uv:g} seconds "
+                                     f"(transition {transition:.1f} s, slope {temperature:.3f}°C/min)\n")
+        elif event == EVENT_HOLD_START:
+            temperature_lines.append(f"{stamp}: Holding {setpoint:g}°C for {uv:g} minutes\n")
+        elif event == EVENT_HOLD_CI:
+            hold_stats.update(ci_halfwidth=temperature, drift=uv)
+        elif event == EVENT_HOLD_COUNT:
+            hold_stats['samples'] = uv
+        elif event in (EVENT_HOLD_CONVERGED, EVENT_HOLD_ELAPSED):
+            reason = "UV signal converged" if event == EVENT_HOLD_CONVERGED else "hold time elapsed"
+            summary = f"{stamp}: Hold at {setpoint:g}°C ended after {temperature:.0f} s: {reason}"
+            if len(hold_stats) == 3:
+                summary += (f" (UV mean {uv:.1f}, CI ±{hold_stats['ci_halfwidth']:.1f}, "
+                            f"drift {hold_stats['drift']:.1f}, n={hold_stats['samples']:.0f})")
+            elif not np.isnan(uv):
+                summary += f" (UV mean {uv:.1f})"
+            temperature_lines.append(summary + "\n")
+            hold_stats = {}
+        elif event == EVENT_VISITED:
+            visited.append(f"{setpoint:g}")
+            if i + 1 == len(records) or events[i + 1] != EVENT_VISITED:
+                temperature_lines.append(f"{stamp}: Adaptive sweep visited {len(visited)} setpoints: "
+                                         f"{', '.join(visited)}°C\n")
+                visited = []
+        elif event == EVENT_COMPLETED:
+            temperature_lines.append(f"{stamp}: Temperature sweep completed for sensor {sensor}.\n")
+        elif event == EVENT_STOPPED:
+            temperature_lines.append(f"{stamp}: Temperature sweep stopped for sensor {sensor}.\n")
+
+    temperature_path = os.path.join(folder, f"temperature_log_sensor_{sensor}.txt")
+    uv_path = os.path.join(folder, f"uv_log_sensor_{sensor}.txt")
+    with open(temperature_path, 'w') as f:
+        f.writelines(temperature_lines)
+    with open(uv_path, 'w') as f:
+        f.writelines(uv_lines)
+    return temperature_path, uv_path
+
+
+def write_run_info(folder, info):
+    """Store sweep parameters and composition next to the logs of a run."""
+    with open(os.path.join(folder, RUN_INFO_NAME), 'w') as f:
+        json.dump(info, f, indent=2)
+
+
+def read_run_info(folder):
+    """Contents of run_info.json, or an empty dict for runs without one."""
+    try:
+        with open(os.path.join(folder, RUN_INFO_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable {RUN_INFO_NAME} in {folder}: {e}")
+        return {}
+
+
+if __name__ == '__main__':
+    for run_log_path in sys.argv[1:]:
+        print("Exported", *export_text_logs(run_log_path))
@@ -0,0 +1,56 @@
+class AdaptiveSetpoints:
+    """
+    Chooses the next sweep setpoint from the UV reading of the hold just finished.
+    Takes coarse steps while transmittance is flat, switches to fine steps once the hold
+    average has dropped by onset_drop of the baseline (the cloud point onset) and returns to
+    coarse steps after the signal has flattened again on the turbid side.
+    The sweep only ever moves upwards, so no setpoint is approached from the cooling side.
+    :param fine_step: Step in °C used through the transition; None uses coarse step / refine_factor.
+    :param onset_drop: Fractional drop below the baseline that marks the onset of the transition.
+    :param flat_change: Fractional change (of the baseline) between holds regarded as flat.
+    :param flat_steps: Consecutive flat fine steps after which the transition is considered passed.
+    """
+
+    def __init__(self, fine_step=None, refine_factor=4, onset_drop=0.05, flat_change=0.02, flat_steps=3):
+        self.fine_step = fine_step
+        self.refine_factor = refine_factor
+        self.onset_drop = onset_drop
+        self.flat_change = flat_change
+        self.flat_steps = flat_steps
+        self.reset(1.0)
+
+    def reset(self, coarse_step):
+        self.coarse_step = coarse_step
+        self.phase = 'coarse'  # 'coarse' -> 'refine' -> 'plateau'
+        self.baseline = None
+        self.previous = None
+        self.flat_count = 0
+        self.setpoints = []
+
+    def next_setpoint(self, setpoint, uv_mean):
+        """
+        Record the average UV reading of the hold at `setpoint` and return the next setpoint.
+        :param uv_mean: Mean UV reading over the hold, or None if no readings arrived.
+        """
+        self.setpoints.append(setpoint)
+        if uv_mean is not None:
+            self._update(uv_mean)
+        step = self.coarse_step
+        if self.phase == 'refine':
+            step = self.fine_step or self.coarse_step / self.refine_factor
+        return round(setpoint + step, 3)
+
+    def _update(self, uv_mean):
+        if self.phase == 'coarse':
+            if self.baseline is not None and uv_mean < self.baseline * (1 - self.onset_drop):
+                self.phase = 'refine'
+            else:
+                self.baseline = uv_mean if self.baseline is None else max(self.baseline, uv_mean)
+        elif self.phase == 'refine':
+            if abs(uv_mean - self.previous) < self.flat_change * self.baseline:
+                self.flat_count += 1
+                if self.flat_count >= self.flat_steps:
+                    self.phase = 'plateau'
+            else:
+                self.flat_count = 0
+        self.previous = uv_mean
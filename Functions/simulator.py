@@ -0,0 +1,415 @@
+"""Simulated ArduinoMega board, sensor serial stream and stepper firmware, running on a ScaledClock."""
+import collections
+import datetime
+import math
+import random
+import re
+import threading
+import time
+from .stepper_firmata import (ACCELSTEPPER_DATA, STEPPER_CONFIG, STEPPER_STEP, STEPPER_STOP, STEPPER_SET_SPEED,
+                              STEPPER_SET_ACCELERATION, STEPPER_MOVE_COMPLETE, encode_steps, decode_steps,
+                              decode_float, move_duration)
+
+SIMULATED_PORT = 'SIMULATED'
+
+# Peltier channel -> (heating pin, cooling pin), matching mdd3a_pins in initialize_board.setup_board
+PELTIER_PINS = {0: (5, 4), 1: (7, 6), 2: (9, 8), 3: (11, 10), 4: (13, 12)}
+
+ELAPSED_TIME_PATTERN = re.compile(r"(\d+):(\d{2}):(\d{2}(?:\.\d+)?)$")
+HOLD_TEMP_PATTERN = re.compile(r"Real-time Hold Temp: (-?[\d.]+)°C")
+UV_READING_PATTERN = re.compile(r"UV Sensor (\d+) Reading: (-?[\d.]+)")
+
+
+class ScaledClock:
+    """
+    Clock running `speedup` times faster than real time, with the same time/monotonic/sleep
+    interface as the time module so it can be passed wherever a clock is expected.
+    """
+
+    def __init__(self, speedup=1.0):
+        self.speedup = float(speedup)
+        self._real_start = time.monotonic()
+        self._wall_start = time.time()
+
+    def monotonic(self):
+        return (time.monotonic() - self._real_start) * self.speedup
+
+    def time(self):
+        return self._wall_start + self.monotonic()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds / self.speedup)
+
+
+class SimulatedPin:
+    def __init__(self, board, pin_type, pin_number):
+        self.board = board
+        self.type = pin_type
+        self.pin_number = pin_number
+        self.mode = None
+        self.value = 0
+        self.taken = False
+        self.writes = 0
+
+    def write(self, value):
+        self.value = value
+        self.writes += 1
+        self.board.messages += 1
+
+    def read(self):
+        if self.type == 'a':
+            return self.board.read_analog(self.pin_number)
+        return self.value
+
+    def enable_reporting(self):
+        pass
+
+
+class ThermalModel:
+    """
+    First-order-plus-dead-time model of one Peltier sample holder and its photodiode.
+    :param ambient: Ambient temperature in °C.
+    :param tau: Thermal time constant in seconds.
+    :param heating_gain: Steady-state temperature rise in °C at 100% heating duty cycle.
+    :param cooling_gain: Steady-state temperature drop in °C at 100% cooling duty cycle.
+    :param dead_time: Delay in seconds between a duty cycle change and its effect.
+    :param lcst: Cloud point of the simulated sample in °C.
+    :param transition_width: Width of the transmittance drop in °C.
+    :param uv_high: Photodiode reading below the cloud point.
+    :param uv_low: Photodiode reading above the cloud point.
+    """
+
+    def __init__(self, ambient=22.0, tau=120.0, heating_gain=150.0, cooling_gain=60.0, dead_time=4.0,
+                 lcst=32.0, transition_width=0.6, uv_high=950, uv_low=80,
+                 temperature_noise=0.03, uv_noise=8.0):
+        self.ambient = ambient
+        self.tau = tau
+        self.heating_gain = heating_gain
+        self.cooling_gain = cooling_gain
+        self.dead_time = dead_time
+        self.lcst = lcst
+        self.transition_width = transition_width
+        self.uv_high = uv_high
+        self.uv_low = uv_low
+        self.temperature_noise = temperature_noise
+        self.uv_noise = uv_noise
+        self.temperature = ambient
+        self.time = None
+        self.inputs = collections.deque()  # (time, heating duty, cooling duty)
+
+    def advance(self, now, heating, cooling, max_step=0.5):
+        if self.time is None:
+            self.time = now
+        self.inputs.append((now, heating, cooling))
+        while now - self.time > 1e-9:
+            dt = min(max_step, now - self.time)
+            delayed_heating, delayed_cooling = self._delayed_input(self.time)
+            drive = self.heating_gain * delayed_heating - self.cooling_gain * delayed_cooling
+            self.temperature += (self.ambient + drive - self.temperature) * dt / self.tau
+            self.time += dt
+
+    def _delayed_input(self, t):
+        target = t - self.dead_time
+        # Drop inputs that were superseded before the delayed time
+        while len(self.inputs) > 1 and self.inputs[1][0] <= target:
+            self.inputs.popleft()
+        first = self.inputs[0]
+        return (first[1], first[2]) if first[0] <= target else (0.0, 0.0)
+
+    def read_temperature(self):
+        return self.temperature + random.gauss(0.0, self.temperature_noise)
+
+    def read_uv(self):
+        x = (self.temperature - self.lcst) / self.transition_width
+        transmittance = 1.0 / (1.0 + math.exp(max(-50.0, min(50.0, x))))
+        value = self.uv_low + (self.uv_high - self.uv_low) * transmittance + random.gauss(0.0, self.uv_noise)
+        return max(0, min(1023, int(round(value))))
+
+
+class SimulatedStepperFirmata:
+    """
+    Board-side AccelStepperFirmata: accepts config/speed/acceleration/step/stop messages and
+    reports MOVE_COMPLETE after the time the trapezoidal move would take on the board.
+    """
+
+    def __init__(self, board):
+        self.board = board
+        self.devices = {}  # device -> dict(dir_pin, speed, acceleration, position, move)
+        self.pulses = 0
+        self.lock = threading.RLock()
+
+    def handle(self, data):
+        subcommand, device = data[0], data[1]
+        with self.lock:
+            if subcommand == STEPPER_CONFIG:
+                self.devices[device] = {'dir_pin': data[4], 'speed': 1.0, 'acceleration': 0.0,
+                                        'position': 0, 'move': None}
+                return
+            stepper = self.devices.get(device)
+            if stepper is None:
+                return
+            if subcommand == STEPPER_SET_SPEED:
+                stepper['speed'] = decode_float(data[2:6])
+            elif subcommand == STEPPER_SET_ACCELERATION:
+                stepper['acceleration'] = decode_float(data[2:6])
+            elif subcommand == STEPPER_STEP:
+                self._start(device, stepper, decode_steps(data[2:7]))
+            elif subcommand == STEPPER_STOP and stepper['move'] is not None:
+                timer, start, steps, duration = stepper['move']
+                timer.cancel()
+                # Report the position reached so far, proportional to the elapsed time
+                elapsed = self.board.clock.monotonic() - start
+                done = int(steps * min(1.0, elapsed / duration)) if duration > 0 else steps
+                self._finish(device, stepper['position'] - steps + done)
+
+    def _start(self, device, stepper, steps):
+        if stepper['move'] is not None:
+            stepper['move'][0].cancel()
+        self.board.digital[stepper['dir_pin']].value = 1 if steps >= 0 else 0
+        duration = move_duration(steps, stepper['speed'], stepper['acceleration'])
+        speedup = getattr(self.board.clock, 'speedup', 1.0)
+        timer = threading.Timer(duration / speedup, self._finish, (device, stepper['position'] + steps))
+        timer.daemon = True
+        stepper['move'] = (timer, self.board.clock.monotonic(), steps, duration)
+        stepper['position'] += steps
+        self.pulses += abs(steps)
+        timer.start()
+
+    def _finish(self, device, position):
+        with self.lock:
+            stepper = self.devices[device]
+            stepper['position'] = position
+            stepper['move'] = None
+        self.board.report_sysex(ACCELSTEPPER_DATA, [STEPPER_MOVE_COMPLETE, device] + encode_steps(position))
+
+
+class SimulatedArduinoMega:
+    """
+    Drop-in replacement for pyfirmata.ArduinoMega driving one ThermalModel per Peltier channel.
+    :param clock: Clock object with monotonic() and sleep(), e.g. ScaledClock.
+    :param models: Optional {channel: ThermalModel} overriding the default sample holders.
+    """
+
+    def __init__(self, port=SIMULATED_PORT, clock=time, models=None):
+        self.name = port
+        self.clock = clock
+        self.digital = [SimulatedPin(self, 'd', i) for i in range(70)]
+        self.analog = [SimulatedPin(self, 'a', i) for i in range(16)]
+        self.models = models or {channel: ThermalModel() for channel in PELTIER_PINS}
+        self.messages = 0  # Firmata messages the real board would have received
+        self.lock = threading.Lock()
+        self._command_handlers = {}
+        self.steppers = SimulatedStepperFirmata(self)
+
+    def get_pin(self, pin_def):
+        pin_type, pin_number, mode = pin_def.split(':')
+        pins = self.analog if pin_type == 'a' else self.digital
+        pin = pins[int(pin_number)]
+        pin.mode = mode
+        pin.taken = True
+        return pin
+
+    def iterate(self):
+        pass
+
+    def add_cmd_handler(self, cmd, func):
+        self._command_handlers[cmd] = func
+
+    def send_sysex(self, sysex_cmd, data):
+        self.messages += 1
+        if sysex_cmd == ACCELSTEPPER_DATA:
+            self.steppers.handle(list(data))
+
+    def report_sysex(self, sysex_cmd, data):
+        """Deliver a sysex reply to the registered handler, as pyfirmata's iterate() would."""
+        handler = self._command_handlers.get(sysex_cmd)
+        if handler is not None:
+            handler(*data)
+
+    def exit(self):
+        for pin in self.digital:
+            pin.value = 0
+
+    def advance(self):
+        """Bring every thermal model up to the current simulated time."""
+        now = self.clock.monotonic()
+        with self.lock:
+            for channel, model in self.models.items():
+                heat_pin, cool_pin = PELTIER_PINS[channel]
+                model.advance(now, float(self.digital[heat_pin].value or 0), float(self.digital[cool_pin].value or 0))
+
+    def read_analog(self, channel):
+        self.advance()
+        model = self.models.get(channel)
+        return model.read_uv() / 1023 if model else 0.0
+
+    def sensor_lines(self):
+        """Return one firmware-formatted temperature and analog line per channel."""
+        self.advance()
+        lines = []
+        for channel, model in sorted(self.models.items()):
+            lines.append(f"Sensor {channel}Object = {model.read_temperature():.2f}*C\r\n".encode())
+            lines.append(f"Analog Reading {channel} = {model.read_uv()}\r\n".encode())
+        return b"".join(lines)
+
+    def open_serial(self, port=SIMULATED_PORT, baud_rate=57600, timeout=1, rate_hz=1.0):
+        """Serial factory with the pyserial.Serial call signature used by ingest_serial."""
+        return SimulatedSerial(board=self, rate_hz=rate_hz, timeout=timeout, clock=self.clock, port=port)
+
+
+def load_replay(temperature_log, uv_log, channel=0):
+    """
+    Convert a recorded temperature/UV log pair into (seconds, line) events for SimulatedSerial.
+    Both elapsed-time ("0:00:24.031045") and wall-clock timestamps are accepted.
+    :param channel: Sensor number written into the replayed lines.
+    """
+    events = []
+    for path, pattern, fmt in ((temperature_log, HOLD_TEMP_PATTERN, "Sensor {0}Object = {1}*C\r\n"),
+                               (uv_log, UV_READING_PATTERN, "Analog Reading {0} = {1}\r\n")):
+        if path is None:
+            continue
+        with open(path, 'r') as f:
+            for line in f:
+                stamp, _, message = line.strip().partition(': ')
+                match = pattern.search(message)
+                seconds = _parse_log_timestamp(stamp)
+                if match is None or seconds is None:
+                    continue
+                events.append((seconds, fmt.format(channel, match.groups()[-1]).encode()))
+    events.sort(key=lambda event: event[0])
+    if events:
+        start = events[0][0]
+        events = [(seconds - start, line) for seconds, line in events]
+    return events
+
+
+def _parse_log_timestamp(stamp):
+    match = ELAPSED_TIME_PATTERN.match(stamp)
+    if match:
+        hours, minutes, seconds = match.groups()
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    try:
+        return datetime.datetime.fromisoformat(stamp).timestamp()
+    except ValueError:
+        return None
+
+
+class SimulatedSerial:
+    """
+    pyserial.Serial stand-in producing firmware lines at `rate_hz` samples per channel
+    (in simulated seconds), either from a SimulatedArduinoMega or from replay events.
+    :param board: SimulatedArduinoMega to synthesize lines from.
+    :param replay: List of (seconds, line bytes) from load_replay; used instead of the board.
+    :param loop: Restart the replay from the beginning once it is exhausted.
+    """
+
+    def __init__(self, board=None, replay=None, rate_hz=1.0, timeout=1, clock=time, port=SIMULATED_PORT, loop=False):
+        if board is None and replay is None:
+            raise ValueError("SimulatedSerial needs a board or replay events")
+        self.board = board
+        self.replay = replay
+        self.rate_hz = rate_hz
+        self.timeout = timeout
+        self.clock = clock
+        self.port = port
+        self.loop = loop
+        self.is_open = True
+        self.pending = bytearray()
+        self.start_time = clock.monotonic()
+        self.next_index = 0  # next replay event or synthesized frame
+        self.lock = threading.Lock()
+
+    def _next_due(self):
+        if self.replay is None:
+            return self.start_time + self.next_index / self.rate_hz
+        if self.next_index >= len(self.replay):
+            if not self.loop or not self.replay:
+                return None
+            # Shift the replay so it continues seamlessly after the last event
+            self.start_time += self.replay[-1][0] + 1.0 / self.rate_hz
+            self.next_index = 0
+        return self.start_time + self.replay[self.next_index][0]
+
+    def _generate(self):
+        now = self.clock.monotonic()
+        with self.lock:
+            due = self._next_due()
+            while due is not None and due <= now:
+                if self.replay is None:
+                    self.pending += self.board.sensor_lines()
+                else:
+                    self.pending += self.replay[self.next_index][1]
+                self.next_index += 1
+                due = self._next_due()
+            return due
+
+    @property
+    def in_waiting(self):
+        self._generate()
+        return len(self.pending)
+
+    def read(self, size=1):
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while self.is_open:
+            due = self._generate()
+            with self.lock:
+                if self.pending:
+                    data = bytes(self.pending[:size])
+                    del self.pending[:size]
+                    return data
+            if deadline is not None and time.monotonic() >= deadline:
+                return b""
+            wait = 0.05 if due is None else max(0.0, due - self.clock.monotonic()) / getattr(self.clock, 'speedup', 1.0)
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+            time.sleep(max(wait, 0.0005))
+        return b""
+
+    def readline(self):
+        line = bytearray()
+        while not line.endswith(b"\n"):
+            data = self.read(1)
+            if not data:
+                break
+            line += data
+        return bytes(line)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+
+def run_ingestion_benchmark(rate_hz=1000.0, speedup=100.0, duration=5.0):
+    """
+    Stream synthesized firmware lines through SerialIngestor and report throughput.
+    :param rate_hz: Samples per channel per simulated second.
+    :param speedup: Simulated seconds per real second.
+    :param duration: Real seconds to run.
+    """
+    from .temp_reader import SerialIngestor
+    from .telemetry_store import TelemetryStore
+
+    clock = ScaledClock(speedup)
+    board = SimulatedArduinoMega(clock=clock)
+    ser = board.open_serial(rate_hz=rate_hz, timeout=0.1)
+    telemetry = TelemetryStore(clock=clock.monotonic)
+    ingestor = SerialIngestor(telemetry.update_temperature, telemetry.update_analog)
+
+    start = time.monotonic()
+    while time.monotonic() - start < duration:
+        data = ser.read(max(ser.in_waiting, 1))
+        if data:
+            ingestor.feed(data)
+    stats = ingestor.get_stats()
+    expected = 2 * len(board.models) * rate_hz * speedup
+    print(f"Ingested {stats['lines']} lines at {stats['lines_per_sec']:.0f} lines/s "
+          f"(offered {expected:.0f} lines/s), {stats['parse_failures']} parse failures, "
+          f"buffer high-water {stats['buffer_high_water']} bytes")
+    return stats
+
+
+if __name__ == '__main__':
+    run_ingestion_benchmark()
@@ -0,0 +1,135 @@
+import asyncio
+import numpy as np
+from scipy.stats import t as t_distribution
+
+
+class SampleWaiter:
+    """
+    Lets a runtime coroutine sleep until the telemetry store receives a new sample for one channel.
+    Must be created on the event loop that will wait on it; close() unregisters it.
+    :param kind: 'temperature' or 'analog'.
+    """
+
+    def __init__(self, telemetry, channel, kind='temperature'):
+        self.telemetry = telemetry
+        self.channel = channel
+        self.kind = kind
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+        telemetry.add_listener(self._on_sample)
+
+    def _on_sample(self, kind, channel):
+        if kind == self.kind and channel == self.channel:
+            self.loop.call_soon_threadsafe(self.event.set)
+
+    async def wait(self, runtime, timeout):
+        """Wait for the next sample; returns False if none arrived within timeout clock seconds."""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout / runtime.speedup)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.event.clear()
+
+    def close(self):
+        self.telemetry.remove_listener(self._on_sample)
+
+
+class StabilityDetector:
+    """
+    Sliding-window stability criterion for a setpoint: over the last `dwell` seconds every sample
+    lies within ±band of the setpoint and the fitted temperature slope stays below max_slope.
+    :param band: Allowed deviation from the setpoint in °C.
+    :param max_slope: Allowed drift of the least-squares trend in °C per minute.
+    :param dwell: Length of the window in seconds.
+    :param min_samples: Minimum number of samples the window must contain.
+    """
+
+    def __init__(self, band=0.5, max_slope=1.0, dwell=10.0, min_samples=3):
+        self.band = band
+        self.max_slope = max_slope
+        self.dwell = dwell
+        self.min_samples = min_samples
+
+    def evaluate(self, timestamps, temperatures, setpoint, window_start):
+        """
+        Check one window of samples.
+        :param window_start: Time the window should reach back to; samples must cover it.
+        :return: (stable, slope in °C/min or None)
+        """
+        if len(temperatures) < self.min_samples:
+            return False, None
+        # Samples must span the dwell; allow one sampling interval of slack at the start
+        interval = (timestamps[-1] - timestamps[0]) / (len(timestamps) - 1)
+        if timestamps[0] > window_start + interval:
+            return False, None
+        centered = timestamps - timestamps.mean()
+        denominator = np.dot(centered, centered)
+        slope = 60.0 * np.dot(centered, temperatures - temperatures.mean()) / denominator if denominator > 0 else 0.0
+        within_band = np.all(np.abs(temperatures - setpoint) <= self.band)
+        return bool(within_band and abs(slope) <= self.max_slope), slope
+
+    def is_stable(self, telemetry, channel, setpoint, now, set_time=None):
+        """
+        Evaluate the newest `dwell` seconds of a channel in the telemetry store.
+        :param set_time: Time the setpoint was set; only later samples count, so a channel is
+                         not stable until they cover the full dwell.
+        """
+        if set_time is not None and now - set_time < self.dwell:
+            return False, None
+        window_start = now - self.dwell if set_time is None else max(set_time, now - self.dwell)
+        timestamps, temperatures = telemetry.temperature[channel].since(window_start)
+        return self.evaluate(timestamps, temperatures, setpoint, window_start)
+
+
+class AdaptiveHold:
+    """
+    Ends a hold early once the UV signal has converged: over the last `window` seconds the
+    batch-means confidence interval of the mean is narrower than ci_halfwidth and the fitted
+    drift across the window is below max_drift (both in ADC counts).
+    :param min_hold: Seconds a hold always lasts.
+    :param max_hold: Seconds after which a hold ends regardless; None uses the sweep hold time.
+    :param batches: Number of batches the window is split into for the confidence interval.
+    :param confidence: Two-sided confidence level of the interval.
+    """
+
+    def __init__(self, min_hold=120.0, max_hold=None, window=60.0, batches=6,
+                 ci_halfwidth=5.0, max_drift=10.0, confidence=0.95):
+        self.min_hold = min_hold
+        self.max_hold = max_hold
+        self.window = window
+        self.batches = batches
+        self.ci_halfwidth = ci_halfwidth
+        self.max_drift = max_drift
+        self.t_critical = t_distribution.ppf(0.5 + confidence / 2, batches - 1)
+
+    def evaluate(self, timestamps, values, window_start):
+        """
+        Check one window of UV samples.
+        :return: (converged, {'mean', 'ci_halfwidth', 'drift', 'samples'}) or (False, None) if the window is too short.
+        """
+        if len(values) < 2 * self.batches:
+            return False, None
+        interval = (timestamps[-1] - timestamps[0]) / (len(timestamps) - 1)
+        if timestamps[0] > window_start + interval:
+            return False, None
+
+        # Batch means absorb the short-range autocorrelation of the photodiode signal
+        usable = len(values) - len(values) % self.batches
+        batch_means = values[-usable:].reshape(self.batches, -1).mean(axis=1)
+        halfwidth = self.t_critical * batch_means.std(ddof=1) / np.sqrt(self.batches)
+
+        centered = timestamps - timestamps.mean()
+        denominator = np.dot(centered, centered)
+        slope = np.dot(centered, values - values.mean()) / denominator if denominator > 0 else 0.0
+        drift = slope * (timestamps[-1] - timestamps[0])
+
+        stats = {'mean': float(values.mean()), 'ci_halfwidth': float(halfwidth),
+                 'drift': float(drift), 'samples': len(values)}
+        return bool(halfwidth <= self.ci_halfwidth and abs(drift) <= self.max_drift), stats
+
+    def is_converged(self, telemetry, channel, now):
+        """Evaluate the newest `window` seconds of a channel's UV readings in the telemetry store."""
+        timestamps, values = telemetry.analog[channel].since(now - self.window)
+        return self.evaluate(timestamps, values, now - self.window)
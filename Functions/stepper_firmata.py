@@ -0,0 +1,176 @@
+"""Host side of the AccelStepperFirmata protocol: a move is sent once and the board generates the pulses."""
+import asyncio
+import math
+import threading
+
+ACCELSTEPPER_DATA = 0x62
+
+# AccelStepperFirmata subcommands
+STEPPER_CONFIG = 0x00
+STEPPER_ZERO = 0x01
+STEPPER_STEP = 0x02
+STEPPER_TO = 0x03
+STEPPER_ENABLE = 0x04
+STEPPER_STOP = 0x05
+STEPPER_REPORT_POSITION = 0x06
+STEPPER_SET_ACCELERATION = 0x08
+STEPPER_SET_SPEED = 0x09
+STEPPER_MOVE_COMPLETE = 0x0A
+
+STEPPER_INTERFACE_DRIVER = 0x10  # step + direction driver, whole steps, no enable pin
+
+
+def encode_steps(steps):
+    """Encode a signed 32-bit step count as five 7-bit bytes (magnitude LSB first, sign in bit 3 of the last)."""
+    magnitude = abs(int(steps))
+    return [magnitude & 0x7F, (magnitude >> 7) & 0x7F, (magnitude >> 14) & 0x7F, (magnitude >> 21) & 0x7F,
+            ((magnitude >> 28) & 0x07) | (0x08 if steps < 0 else 0)]
+
+
+def decode_steps(data):
+    magnitude = data[0] | (data[1] << 7) | (data[2] << 14) | (data[3] << 21) | ((data[4] & 0x07) << 28)
+    return -magnitude if data[4] & 0x08 else magnitude
+
+
+def encode_float(value):
+    """
+    Encode a float in the four-byte Firmata format: 23-bit significand, base-10 exponent
+    biased by 11 in bits 2-5 of the last byte and the sign in bit 6.
+    """
+    sign = 1 if value < 0 else 0
+    value = abs(value)
+    significand, exponent = 0, 0
+    if value > 0:
+        for exponent in range(-11, 5):
+            significand = round(value / 10.0 ** exponent)
+            if significand <= 0x7FFFFF:
+                break
+        else:
+            raise ValueError(f"{value} is too large for a Firmata float")
+    return [significand & 0x7F, (significand >> 7) & 0x7F, (significand >> 14) & 0x7F,
+            ((significand >> 21) & 0x03) | (((exponent + 11) & 0x0F) << 2) | (sign << 6)]
+
+
+def decode_float(data):
+    significand = data[0] | (data[1] << 7) | (data[2] << 14) | ((data[3] & 0x03) << 21)
+    exponent = ((data[3] >> 2) & 0x0F) - 11
+    value = significand * 10.0 ** exponent
+    return -value if data[3] & 0x40 else value
+
+
+def move_duration(steps, speed, acceleration):
+    """Seconds a trapezoidal (or triangular) move of `steps` takes, starting and ending at rest."""
+    steps = abs(steps)
+    if steps == 0:
+        return 0.0
+    if acceleration <= 0:
+        return steps / speed
+    if steps >= speed ** 2 / acceleration:
+        return steps / speed + speed / acceleration
+    return 2.0 * math.sqrt(steps / acceleration)
+
+
+class StepperController:
+    """
+    Configures AccelStepperFirmata devices on a board and routes their completion reports.
+    Reports arrive on the thread running board.iterate() (pyfirmata's Iterator).
+    :param board: pyfirmata (or simulated) board.
+    """
+
+    def __init__(self, board):
+        self.board = board
+        self.steppers = {}  # device number -> FirmataStepper
+        self.lock = threading.Lock()
+        self.messages = 0
+        board.add_cmd_handler(ACCELSTEPPER_DATA, self._handle_stepper_data)
+
+    def stepper(self, device, step_pin, dir_pin):
+        """Configure a step/direction driver as `device` and return its FirmataStepper."""
+        stepper = FirmataStepper(self, device, step_pin, dir_pin)
+        self.steppers[device] = stepper
+        self.send(STEPPER_CONFIG, device, [STEPPER_INTERFACE_DRIVER, step_pin, dir_pin])
+        return stepper
+
+    def send(self, subcommand, device, payload=()):
+        with self.lock:
+            self.board.send_sysex(ACCELSTEPPER_DATA, bytearray([subcommand, device, *payload]))
+            self.messages += 1
+
+    def _handle_stepper_data(self, *data):
+        if len(data) < 7 or data[0] not in (STEPPER_MOVE_COMPLETE, STEPPER_REPORT_POSITION):
+            return
+        stepper = self.steppers.get(data[1])
+        if stepper is None:
+            return
+        position = decode_steps(data[2:7])
+        if data[0] == STEPPER_MOVE_COMPLETE:
+            stepper._complete(position)
+        else:
+            stepper.position = position
+
+
+class FirmataStepper:
+    """One stepper driver whose pulses are generated by the board."""
+
+    def __init__(self, controller, device, step_pin, dir_pin):
+        self.controller = controller
+        self.device = device
+        self.step_pin = step_pin
+        self.dir_pin = dir_pin
+        self.position = 0
+        self.done = threading.Event()
+        self.done.set()
+        self.on_complete = None  # callable(position), called on the board reader thread
+
+    def move(self, steps, speed, acceleration):
+        """
+        Start a relative move; returns immediately with the expected duration in seconds.
+        :param steps: Signed number of steps; positive drives the direction pin high.
+        :param speed: Maximum speed in steps per second.
+        :param acceleration: Acceleration in steps per second squared (0 for constant speed).
+        """
+        self.done.clear()
+        self.controller.send(STEPPER_SET_ACCELERATION, self.device, encode_float(acceleration))
+        self.controller.send(STEPPER_SET_SPEED, self.device, encode_float(speed))
+        self.controller.send(STEPPER_STEP, self.device, encode_steps(steps))
+        return move_duration(steps, speed, acceleration)
+
+    def stop(self):
+        """Decelerate to a stop; the board reports MOVE_COMPLETE with the final position."""
+        self.controller.send(STEPPER_STOP, self.device)
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def _complete(self, position):
+        self.position = position
+        self.done.set()
+        callback = self.on_complete
+        if callback is not None:
+            callback(position)
+
+    async def move_async(self, steps, speed, acceleration, runtime, margin=2.0):
+        """
+        Move and wait for the completion report on the runtime loop; stops the motor if cancelled.
+        Raises TimeoutError if no report arrives within the expected duration plus `margin` seconds.
+        """
+        loop = asyncio.get_running_loop()
+        finished = loop.create_future()
+
+        def resolve(position):
+            if not finished.done():
+                finished.set_result(position)
+        self.on_complete = lambda position: loop.call_soon_threadsafe(resolve, position)
+        try:
+            duration = self.move(steps, speed, acceleration)
+            try:
+                return await asyncio.wait_for(finished, (duration * 1.5 + margin) / runtime.speedup)
+            except asyncio.TimeoutError:
+                self.stop()
+                raise TimeoutError(f"Stepper {self.device} did not report completion; "
+                                   "is AccelStepperFirmata on the board?")
+            except asyncio.CancelledError:
+                self.stop()
+                raise
+        finally:
+            self.on_complete = None
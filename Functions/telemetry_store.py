@@ -0,0 +1,121 @@
+import threading
+import time
+import numpy as np
+
+# One day of samples at 1 Hz per signal, roughly 1.4 MB per channel
+DEFAULT_CAPACITY = 86400
+
+
+class RingBuffer:
+    """
+    Thread-safe, fixed-capacity buffer of (timestamp, value) samples backed by NumPy arrays.
+    :param capacity: Number of samples kept; the oldest samples are overwritten first.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = int(capacity)
+        self.timestamps = np.zeros(self.capacity, dtype=np.float64)
+        self.values = np.zeros(self.capacity, dtype=np.float64)
+        self.count = 0  # total number of samples ever appended
+        self.lock = threading.Lock()
+
+    def append(self, timestamp, value):
+        with self.lock:
+            index = self.count % self.capacity
+            self.timestamps[index] = timestamp
+            self.values[index] = value
+            self.count += 1
+
+    def latest(self):
+        """Return the newest (timestamp, value) pair, or None if nothing was written yet."""
+        with self.lock:
+            if self.count == 0:
+                return None
+            index = (self.count - 1) % self.capacity
+            return float(self.timestamps[index]), float(self.values[index])
+
+    def last(self, n=None):
+        """Return copies of the newest n samples (all stored samples if n is None) in chronological order."""
+        with self.lock:
+            return self._last(n)
+
+    def since(self, timestamp):
+        """Return copies of all stored samples taken at or after timestamp."""
+        with self.lock:
+            size = min(self.count, self.capacity)
+            split = self.count % self.capacity if self.count > self.capacity else 0
+            # The stored samples are two sorted runs: [split:size] (older) and [:split] (newer)
+            older = self.timestamps[split:size]
+            newer = self.timestamps[:split]
+            n = (older.size - np.searchsorted(older, timestamp, side='left')
+                 + newer.size - np.searchsorted(newer, timestamp, side='left'))
+            return self._last(n)
+
+    def read_from(self, count):
+        """
+        Return copies of the samples appended after the first `count`, in chronological order,
+        and the new total count to pass next time; samples already overwritten are skipped.
+        """
+        with self.lock:
+            return (*self._last(self.count - count), self.count)
+
+    def _last(self, n):
+        size = min(self.count, self.capacity)
+        n = size if n is None else max(0, min(int(n), size))
+        # Fancy indexing copies and handles the wrap-around in one step
+        indices = (self.count - n + np.arange(n)) % self.capacity
+        return self.timestamps[indices], self.values[indices]
+
+
+class TelemetryStore:
+    """
+    Latest readings and bounded history for every sensor channel.
+    Written by the serial reader, read by control loops, loggers and the GUI.
+    :param n_channels: Number of sensor channels (temperature + analog pairs).
+    :param capacity: Samples kept per signal and channel.
+    :param clock: Callable returning the current time in seconds, used when no timestamp is given.
+    """
+
+    def __init__(self, n_channels=5, capacity=DEFAULT_CAPACITY, clock=time.monotonic):
+        self.n_channels = n_channels
+        self.clock = clock
+        self.temperature = [RingBuffer(capacity) for _ in range(n_channels)]
+        self.analog = [RingBuffer(capacity) for _ in range(n_channels)]
+        self.listeners = ()  # callables(kind, channel), replaced rather than mutated so writers can iterate freely
+
+    def add_listener(self, callback):
+        """Call callback(kind, channel) after every new sample; kind is 'temperature' or 'analog'."""
+        self.listeners = self.listeners + (callback,)
+
+    def remove_listener(self, callback):
+        self.listeners = tuple(listener for listener in self.listeners if listener != callback)
+
+    def update_temperature(self, channel, temperature, timestamp=None):
+        if 0 <= channel < self.n_channels:
+            self.temperature[channel].append(self.clock() if timestamp is None else timestamp, temperature)
+            for listener in self.listeners:
+                listener('temperature', channel)
+
+    def update_analog(self, channel, analog_value, timestamp=None):
+        if 0 <= channel < self.n_channels:
+            self.analog[channel].append(self.clock() if timestamp is None else timestamp, analog_value)
+            for listener in self.listeners:
+                listener('analog', channel)
+
+    def latest_temperature(self, channel):
+        """Return the newest temperature of a channel in °C, or None if none was received yet."""
+        sample = self.temperature[channel].latest()
+        return None if sample is None else sample[1]
+
+    def latest_analog(self, channel):
+        """Return the newest analog (UV) reading of a channel, or None if none was received yet."""
+        sample = self.analog[channel].latest()
+        return None if sample is None else sample[1]
+
+    def temperature_window(self, channel, seconds):
+        """Return (timestamps, temperatures) of the last `seconds` seconds of a channel."""
+        return self.temperature[channel].since(self.clock() - seconds)
+
+    def analog_window(self, channel, seconds):
+        """Return (timestamps, analog values) of the last `seconds` seconds of a channel."""
+        return self.analog[channel].since(self.clock() - seconds)
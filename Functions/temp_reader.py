@@ -1,104 +1,160 @@
+import asyncio
+import concurrent.futures
+import functools
 import serial
 import re
 import time
-from PyQt6.QtCore import QThread, pyqtSignal
-
-class SerialReader(QThread):
-    temperature_updated = pyqtSignal(int, float)
-    analog_updated = pyqtSignal(int, int)
-
-    def __init__(self, port, baud_rate):
-        super().__init__()
-        self.port = port
-        self.baud_rate = baud_rate
-        self.running = True
-        self.ser = None
-        self.reconnect_delay = 2  # seconds between reconnection attempts
-
-    def connect_serial(self):
-        """Attempt to connect to the serial port with retry logic"""
-        retry_count = 0
-        max_retries = 3
-        
-        while retry_count < max_retries and self.running:
-            try:
-                # Close any existing connection
-                self.close_port()
-                
-                # Wait before attempting to connect
-                time.sleep(self.reconnect_delay)
-                
-                # Try to open new connection
-                self.ser = serial.Serial(self.port, self.baud_rate, timeout=1)
-                print(f"Successfully connected to {self.port}")
-                return True
-                
-            except serial.SerialException as e:
-                print(f"Connection attempt {retry_count + 1} failed: {e}")
-                retry_count += 1
-        
-        return False
 
-    def run(self):
-        while self.running:
-            try:
-                if not self.ser or not self.ser.is_open:
-                    if not self.connect_serial():
-                        continue
-
-                if self.ser.in_waiting > 0:
-                    try:
-                        line = self.ser.readline().decode('utf-8', errors='replace').strip()
-                    except UnicodeDecodeError:
-                        try:
-                            line = self.ser.readline().decode('ascii', errors='ignore').strip()
-                        except Exception as decode_error:
-                            print(f"Decoding error: {decode_error}")
-                            continue
-
-                    if line:  # Only process non-empty lines
-                        try:
-                            temp_match = re.search(r"Sensor (\d)Object = ([\d.]+)\*C", line)
-                            analog_match = re.search(r"Analog Reading (\d) = (\d+)", line)
-                            
-                            if temp_match:
-                                sensor_number = int(temp_match.group(1))
-                                temperature = float(temp_match.group(2))
-                                self.temperature_updated.emit(sensor_number, temperature)
-                            if analog_match:
-                                sensor_number = int(analog_match.group(1))
-                                analog_value = int(analog_match.group(2))
-                                self.analog_updated.emit(sensor_number, analog_value)
-                        except Exception as parse_error:
-                            print(f"Error parsing line '{line}': {parse_error}")
-                            continue
+# One precompiled pattern covering both line types printed by the firmware,
+# used when a line does not match the fixed layout fast path.
+LINE_PATTERN = re.compile(rb"Sensor (\d)Object = (-?[\d.]+)\*C|Analog Reading (\d) = (\d+)")
+
+TEMPERATURE_PREFIX = b"Sensor "
+TEMPERATURE_INFIX = b"Object = "
+TEMPERATURE_SUFFIX = b"*C"
+ANALOG_PREFIX = b"Analog Reading "
+ANALOG_INFIX = b" = "
+
+
+class SerialIngestor:
+    """
+    Frames and parses raw serial bytes into temperature and analog readings.
+    :param on_temperature: Callable taking (sensor_number, temperature).
+    :param on_analog: Callable taking (sensor_number, analog_value).
+    :param max_line_length: Unterminated data longer than this is discarded as garbage.
+    """
+
+    def __init__(self, on_temperature, on_analog, max_line_length=256):
+        self.on_temperature = on_temperature
+        self.on_analog = on_analog
+        self.max_line_length = max_line_length
+        self.buffer = bytearray()
+        self.lines = 0
+        self.parse_failures = 0
+        self.overflows = 0
+        self.buffer_high_water = 0
+        self._rate_time = time.monotonic()
+        self._rate_lines = 0
+
+    def feed(self, data):
+        """Append a chunk of raw bytes and parse every complete line in it."""
+        buffer = self.buffer
+        buffer += data
+        if len(buffer) > self.buffer_high_water:
+            self.buffer_high_water = len(buffer)
+
+        end = buffer.rfind(b"\n")
+        if end < 0:
+            if len(buffer) > self.max_line_length:
+                # No terminator in sight, most likely noise after a reconnect
+                self.overflows += 1
+                buffer.clear()
+            return
+
+        frames = bytes(buffer[:end]).split(b"\n")
+        del buffer[:end + 1]
+        for frame in frames:
+            self.parse_line(frame)
+
+    def parse_line(self, line):
+        line = line.strip()
+        if not line:
+            return
+        self.lines += 1
+        try:
+            # Fixed layout fast path: "Sensor NObject = x*C" / "Analog Reading N = v"
+            if (line.startswith(TEMPERATURE_PREFIX) and line.endswith(TEMPERATURE_SUFFIX)
+                    and line[8:17] == TEMPERATURE_INFIX and 48 <= line[7] <= 57):
+                self.on_temperature(line[7] - 48, float(line[17:-2]))
+                return
+            if (line.startswith(ANALOG_PREFIX) and line[16:19] == ANALOG_INFIX
+                    and 48 <= line[15] <= 57):
+                self.on_analog(line[15] - 48, int(line[19:]))
+                return
+        except ValueError:
+            pass
 
+        match = LINE_PATTERN.search(line)
+        if match is None:
+            self.parse_failures += 1
+            return
+        try:
+            if match.group(1) is not None:
+                self.on_temperature(int(match.group(1)), float(match.group(2)))
+            else:
+                self.on_analog(int(match.group(3)), int(match.group(4)))
+        except ValueError:
+            self.parse_failures += 1
+
+    def reset(self):
+        """Drop any partial line, e.g. after the port was reopened."""
+        self.buffer.clear()
+
+    def get_stats(self):
+        """Return ingestion counters; lines_per_sec covers the time since the previous call."""
+        now = time.monotonic()
+        elapsed = now - self._rate_time
+        lines_per_sec = (self.lines - self._rate_lines) / elapsed if elapsed > 0 else 0.0
+        self._rate_time = now
+        self._rate_lines = self.lines
+        return {
+            'lines': self.lines,
+            'lines_per_sec': lines_per_sec,
+            'parse_failures': self.parse_failures,
+            'overflows': self.overflows,
+            'buffer_high_water': self.buffer_high_water,
+        }
+
+
+def read_chunk(ser, read_size):
+    """Block until at least one byte arrives or the port times out, then drain whatever is queued."""
+    return ser.read(min(max(ser.in_waiting, 1), read_size))
+
+
+def close_port(ser, port):
+    if ser.is_open:
+        ser.close()
+        print(f"Closed serial port {port}")
+
+
+async def ingest_serial(ingestor, port, baud_rate, serial_factory=serial.Serial, read_size=4096, read_timeout=1,
+                        reconnect_delay=2):
+    """
+    Serial ingestion task for HardwareRuntime: blocking bulk reads run in a thread of their own
+    and every chunk is fed to the ingestor on the event loop, reconnecting on errors.
+    :param ingestor: SerialIngestor receiving the raw bytes.
+    :param serial_factory: Callable with the serial.Serial signature, e.g. SimulatedArduinoMega.open_serial.
+    :param read_size: Upper bound on bytes taken per read call.
+    :param read_timeout: Port timeout in seconds; a read still blocked on cancellation ends within it.
+    """
+    loop = asyncio.get_running_loop()
+    # Every port call runs in this one thread, so closing the port never races a read in progress
+    port_thread = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix=f"serial {port}")
+    ser = None
+    try:
+        while True:
+            if ser is None or not ser.is_open:
+                try:
+                    ser = await loop.run_in_executor(
+                        port_thread, functools.partial(serial_factory, port, baud_rate, timeout=read_timeout))
+                    ingestor.reset()
+                    print(f"Successfully connected to {port}")
+                except serial.SerialException as e:
+                    print(f"Connection attempt to {port} failed: {e}")
+                    ser = None
+                    await asyncio.sleep(reconnect_delay)
+                    continue
+            try:
+                data = await loop.run_in_executor(port_thread, read_chunk, ser, read_size)
             except serial.SerialException as e:
                 print(f"Serial connection error: {e}")
-                # Try to reconnect on error
-                self.connect_serial()
-            except Exception as e:
-                print(f"Unexpected error: {e}")
-                time.sleep(self.reconnect_delay)
-
-        self.close_port()
-
-    def stop(self):
-        """Stop the reader thread safely"""
-        print("Stopping SerialReader...")
-        self.running = False
-        self.close_port()
-        self.wait()
-        print("SerialReader stopped")
-
-    def close_port(self):
-        """Safely close the serial port"""
-        try:
-            if self.ser:
-                if self.ser.is_open:
-                    self.ser.flush()
-                    self.ser.close()
-                    print(f"Closed serial port {self.port}")
-                self.ser = None
-        except Exception as e:
-            print(f"Error closing serial port: {e}")
+                port_thread.submit(ser.close)
+                ser = None
+                await asyncio.sleep(reconnect_delay)
+                continue
+            if data:
+                ingestor.feed(data)
+    finally:
+        if ser is not None:
+            port_thread.submit(close_port, ser, port)
+        port_thread.shutdown(wait=False)
@@ -1,102 +1,171 @@
-import threading
-import time
+import asyncio
 import datetime
 import os
-from .peltier_control import control_peltier, stop_monitoring
+import sqlite3
+from .peltier_control import stop_monitoring, ChannelBusyError
+from .stabilization import SampleWaiter, StabilityDetector
+from .run_log import (RunLogWriter, export_text_logs, write_run_info, RUN_LOG_NAME, EVENT_SAMPLE, EVENT_HOLD_SAMPLE, EVENT_SETPOINT,
+                      EVENT_STABILIZED, EVENT_HOLD_START, EVENT_HOLD_CONVERGED, EVENT_HOLD_ELAPSED,
+                      EVENT_HOLD_CI, EVENT_HOLD_COUNT, EVENT_VISITED, EVENT_COMPLETED, EVENT_STOPPED)
 
-def start_temperature_sweep(sensor_index, start_temps, end_temps, step_sizes, hold_times, pids, monitoring_events, temp_labels, analog_labels, board, mdd3a_pins):
+LOG_INTERVAL = 3  # seconds between UV log entries while stabilizing and holding
+SAMPLE_TIMEOUT = 5  # seconds to wait for a new temperature sample before re-checking
+
+def start_temperature_sweep(sensor_index, start_temps, end_temps, step_sizes, hold_times, scheduler, monitoring_events, telemetry, runtime, stability=None, hold_policy=None, setpoint_plan=None, composition=None):
     try:
         start_temp = float(start_temps[sensor_index].text())
         end_temp = float(end_temps[sensor_index].text())
         step_size = float(step_sizes[sensor_index].text())
         hold_time = float(hold_times[sensor_index].text())
 
-        threading.Thread(target=temperature_sweep, args=(sensor_index, start_temp, end_temp, step_size, hold_time, pids, monitoring_events, temp_labels, analog_labels, board, mdd3a_pins)).start()
+        return runtime.submit(f'sweep{sensor_index}', temperature_sweep(sensor_index, start_temp, end_temp, step_size, hold_time, scheduler, monitoring_events, telemetry, runtime, stability, hold_policy, setpoint_plan, composition))
 
     except ValueError as e:
         print(f"Invalid input for temperature sweep parameters on sensor {sensor_index+1}: {e}")
-
-def temperature_sweep(sensor_index, start_temp, end_temp, step, hold_time_minutes, pids, monitoring_events, temp_labels, analog_labels, board, mdd3a_pins):
-    # Create a new folder for this run
-    current_time = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    folder_name = f"Data/Sensor{sensor_index + 1}_{current_time}"
-    os.makedirs(folder_name, exist_ok=True)
-
-    temp_log_file = open(os.path.join(folder_name, f"temperature_log_sensor_{sensor_index + 1}.txt"), "a")
-    uv_log_file = open(os.path.join(folder_name, f"uv_log_sensor_{sensor_index + 1}.txt"), "a")
-
+        return None
+
+async def temperature_sweep(sensor_index, start_temp, end_temp, step, hold_time_minutes, scheduler, monitoring_events, telemetry, runtime, stability=None, hold_policy=None, setpoint_plan=None, composition=None):
+    """
+    Step the setpoint of one channel from start_temp to end_temp, waiting for stability and
+    holding each setpoint while logging temperature and UV readings.
+    :param stability: StabilityDetector deciding when a setpoint is reached (default ±0.5 °C for 10 s).
+    :param hold_policy: Optional AdaptiveHold that may end a hold early once the UV signal has converged.
+    :param setpoint_plan: Optional AdaptiveSetpoints choosing the next setpoint; `step` is then the coarse step.
+    :param composition: Dispensed composition of the sample ({'NaCl': M, ...}), recorded in the run index.
+    Samples and events go to a binary run log (Functions.run_log); the legacy text logs are
+    exported from it when the sweep ends, and the run is then added to the run index.
+    """
+    clock = runtime.clock
+    stability = stability or StabilityDetector()
+    # The scheduler runs the PID loop; the sweep only moves the setpoint
+    try:
+        scheduler.acquire(sensor_index, f'sweep{sensor_index}')
+    except ChannelBusyError as e:
+        print(e)
+        monitoring_events[sensor_index].clear()
+        return
+
+    run_log = None
+    sample_waiter = None
     try:
+        # Create a new folder for this run
+        now = datetime.datetime.now()
+        folder_name = f"Data/Sensor{sensor_index + 1}_{now.strftime('%Y%m%d_%H%M%S')}"
+        os.makedirs(folder_name, exist_ok=True)
+        write_run_info(folder_name, {'sensor': sensor_index + 1, 'started': now.isoformat(sep=' ', timespec='seconds'),
+                                     'start_temp': start_temp, 'end_temp': end_temp, 'step': step,
+                                     'hold_minutes': hold_time_minutes, 'adaptive_hold': hold_policy is not None,
+                                     'adaptive_setpoints': setpoint_plan is not None, 'composition': composition})
+
+        run_log = RunLogWriter(os.path.join(folder_name, RUN_LOG_NAME.format(sensor_index + 1)), sensor_index, clock)
+
+        sample_waiter = SampleWaiter(telemetry, sensor_index)
+        if setpoint_plan is not None:
+            setpoint_plan.reset(step)
         current_temp = start_temp
-        pids[sensor_index].setpoint = start_temp
 
         while current_temp <= end_temp and monitoring_events[sensor_index].is_set():
-            pids[sensor_index].setpoint = current_temp
+            scheduler.set_setpoint(sensor_index, current_temp)
             print(f"Sensor {sensor_index + 1} set to {current_temp}°C")
-            temp_log_file.write(f"{datetime.datetime.now()}: Set Sensor {sensor_index + 1} to {current_temp}°C\n")
+            run_log.append(EVENT_SETPOINT, current_temp)
 
-            stable_time_start = None
+            # Wake on every new temperature sample and test the sliding-window criterion
+            set_time = runtime.now()
+            last_uv_log = None
             while monitoring_events[sensor_index].is_set():
-                current_reading = float(temp_labels[sensor_index].text().split(": ")[1].strip().split(' ')[0])
-                
-                # Control Peltier
-                control = pids[sensor_index](current_reading)
-                action = control > 0
-                pwm_value = abs(control)
-                board_name = f'board{sensor_index + 1}'
-                control_peltier(board, mdd3a_pins, board_name, heat=action, pwm=True, pwm_duty_cycle=pwm_value)
-
-                if abs(current_reading - current_temp) <= 0.5:
-                    if stable_time_start is None:
-                        stable_time_start = time.time()
-                    elif time.time() - stable_time_start >= 10:
-                        temp_log_file.write(f"{datetime.datetime.now()}: Temperature {current_temp}°C stabilized for 10 seconds\n")
-                        break
-                else:
-                    stable_time_start = None
+                await sample_waiter.wait(runtime, SAMPLE_TIMEOUT)
+                now = runtime.now()
+                stable, slope = stability.is_stable(telemetry, sensor_index, current_temp, now, set_time)
+                if stable:
+                    transition = now - set_time
+                    print(f"Sensor {sensor_index + 1} reached {current_temp}°C after {transition:.1f} s")
+                    run_log.append(EVENT_STABILIZED, current_temp, slope, stability.dwell)
+                    break
 
-                uv_reading = analog_labels[f'analog{sensor_index + 1}'].text().split(": ")[1]
-                uv_log_file.write(f"{datetime.datetime.now()}: UV Sensor {sensor_index + 1} Reading: {uv_reading}\n")
-                uv_log_file.flush()
-                time.sleep(3)
+                if last_uv_log is None or now - last_uv_log >= LOG_INTERVAL:
+                    last_uv_log = now
+                    uv_reading = telemetry.latest_analog(sensor_index)
+                    if uv_reading is not None:
+                        run_log.append(EVENT_SAMPLE, current_temp, telemetry.latest_temperature(sensor_index), uv_reading)
 
             if not monitoring_events[sensor_index].is_set():
                 break
 
             hold_time_seconds = hold_time_minutes * 60
             print(f"Holding {current_temp}°C for {hold_time_minutes} minutes...")
-            temp_log_file.write(f"{datetime.datetime.now()}: Holding {current_temp}°C for {hold_time_minutes} minutes\n")
-
-            hold_start_time = time.time()
-            while time.time() - hold_start_time < hold_time_seconds and monitoring_events[sensor_index].is_set():
-                current_reading = float(temp_labels[sensor_index].text().split(": ")[1].strip().split(' ')[0])
-                
-                # Control Peltier during hold time
-                control = pids[sensor_index](current_reading)
-                action = control > 0
-                pwm_value = abs(control)
-                board_name = f'board{sensor_index + 1}'
-                control_peltier(board, mdd3a_pins, board_name, heat=action, pwm=True, pwm_duty_cycle=pwm_value)
-
-                uv_reading = analog_labels[f'analog{sensor_index + 1}'].text().split(": ")[1]
-                uv_log_file.write(f"{datetime.datetime.now()}: UV Sensor {sensor_index + 1} Reading: {uv_reading}\n")
-                uv_log_file.flush()
-                current_hold_temp = float(temp_labels[sensor_index].text().split(": ")[1].strip().split(' ')[0])
-                temp_log_file.write(f"{datetime.datetime.now()}: Real-time Hold Temp: {current_hold_temp}°C\n")
-                temp_log_file.flush()
-                time.sleep(3)
-                
+            run_log.append(EVENT_HOLD_START, current_temp, uv=hold_time_minutes)
+
+            hold_start_time = clock.time()
+            hold_start = runtime.now()
+            max_hold_seconds = hold_time_seconds
+            if hold_policy is not None and hold_policy.max_hold is not None:
+                max_hold_seconds = hold_policy.max_hold
+            hold_end_reason, hold_end_event = "hold time elapsed", EVENT_HOLD_ELAPSED
+            uv_stats = None
+            while clock.time() - hold_start_time < max_hold_seconds and monitoring_events[sensor_index].is_set():
+                current_reading = telemetry.latest_temperature(sensor_index)
+                if current_reading is None:
+                    await runtime.sleep(LOG_INTERVAL)
+                    continue
+
+                run_log.append(EVENT_HOLD_SAMPLE, current_temp, current_reading, telemetry.latest_analog(sensor_index))
+
+                if hold_policy is not None and clock.time() - hold_start_time >= hold_policy.min_hold:
+                    converged, stats = hold_policy.is_converged(telemetry, sensor_index, runtime.now())
+                    uv_stats = stats or uv_stats
+                    if converged:
+                        hold_end_reason, hold_end_event = "UV signal converged", EVENT_HOLD_CONVERGED
+                        break
+
+                await runtime.sleep(LOG_INTERVAL)
+
                 if not monitoring_events[sensor_index].is_set():
                     break
 
-            current_temp += step
+            if hold_policy is not None and monitoring_events[sensor_index].is_set():
+                held = clock.time() - hold_start_time
+                summary = f"Hold at {current_temp}°C ended after {held:.0f} s: {hold_end_reason}"
+                if uv_stats is not None:
+                    summary += (f" (UV mean {uv_stats['mean']:.1f}, CI ±{uv_stats['ci_halfwidth']:.1f}, "
+                                f"drift {uv_stats['drift']:.1f}, n={uv_stats['samples']})")
+                print(f"Sensor {sensor_index + 1}: {summary}")
+                if uv_stats is not None:
+                    run_log.append(EVENT_HOLD_CI, current_temp, uv_stats['ci_halfwidth'], uv_stats['drift'])
+                    run_log.append(EVENT_HOLD_COUNT, current_temp, uv=uv_stats['samples'])
+                run_log.append(hold_end_event, current_temp, held, uv_stats['mean'] if uv_stats is not None else None)
+
+            if setpoint_plan is not None:
+                _, hold_uv = telemetry.analog[sensor_index].since(hold_start)
+                current_temp = setpoint_plan.next_setpoint(current_temp, float(hold_uv.mean()) if len(hold_uv) else None)
+            else:
+                current_temp += step
+
+        if setpoint_plan is not None:
+            visited = ", ".join(f"{t:g}" for t in setpoint_plan.setpoints)
+            print(f"Sensor {sensor_index + 1} adaptive sweep visited {len(setpoint_plan.setpoints)} setpoints: {visited}")
+            for setpoint in setpoint_plan.setpoints:
+                run_log.append(EVENT_VISITED, setpoint)
 
         if monitoring_events[sensor_index].is_set():
             print(f"Temperature sweep completed for sensor {sensor_index + 1}.")
-            temp_log_file.write(f"{datetime.datetime.now()}: Temperature sweep completed for sensor {sensor_index + 1}.\n")
+            run_log.append(EVENT_COMPLETED)
         else:
-            temp_log_file.write(f"{datetime.datetime.now()}: Temperature sweep stopped for sensor {sensor_index + 1}.\n")
+            run_log.append(EVENT_STOPPED)
     finally:
         # Stop monitoring and disable Peltier after sweep
-        stop_monitoring(sensor_index, monitoring_events, board, mdd3a_pins)
-        temp_log_file.close()
-        uv_log_file.close()
\ No newline at end of file
+        if sample_waiter is not None:
+            sample_waiter.close()
+        stop_monitoring(sensor_index, monitoring_events, scheduler)
+        if run_log is not None:
+            run_log.close()
+            try:
+                export_text_logs(run_log.path)
+            except (OSError, ValueError) as e:
+                print(f"Could not export text logs for sensor {sensor_index + 1}: {e}")
+            else:
+                from .run_index import RunIndex  # the analysis stack is only needed once the run is over
+                try:
+                    # Parsing, analysing and writing the index would stall every other runtime task
+                    await asyncio.get_running_loop().run_in_executor(None, RunIndex().update_run, folder_name)
+                except (sqlite3.Error, OSError, ValueError) as e:
+                    print(f"Could not index the run of sensor {sensor_index + 1}: {e}")
\ No newline at end of file
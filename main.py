@@ -1,19 +1,38 @@
 import sys
+import asyncio
 import os
+import time
+import argparse
+import sqlite3
 import serial
 import serial.tools.list_ports
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
-                             QLabel, QPushButton, QComboBox, QLineEdit, QGroupBox, QTabWidget, QFileDialog, QListWidget, QMessageBox, QInputDialog)
+                             QLabel, QPushButton, QComboBox, QLineEdit, QGroupBox, QTabWidget, QFileDialog, QListWidget, QMessageBox, QInputDialog, QCheckBox, QProgressBar)
 from PyQt6.QtCore import Qt, QThread, pyqtSignal, QTimer
 from PyQt6.QtGui import QFont, QPixmap
 import pyfirmata
-from Functions.motor_control import control_motor
-from Functions.initialize_board import initialize_board
+from Functions.motion_manager import MotionManager
+from Functions.dispense_planner import plan_dispense, load_compositions, execute_plan, format_plan, N_HOLDERS
+from Functions.initialize_board import initialize_board, setup_board
+from Functions.simulator import SimulatedArduinoMega, ScaledClock, SIMULATED_PORT
 import threading
 from Functions.valves_control import create_valve_control_section
-from Functions.peltier_control import initialize_pids, set_pid_output_limits, start_monitoring, stop_monitoring
-from Functions.temp_reader import SerialReader
+from Functions.peltier_control import start_monitoring, stop_monitoring
+from Functions.pid_scheduler import PIDScheduler
+from Functions.pid_tuning import autotune, load_tuning, apply_tuning
+from Functions.temp_reader import SerialIngestor, ingest_serial
+from Functions.async_runtime import HardwareRuntime
+from Functions.telemetry_store import TelemetryStore
+from Functions.gui_coalescer import ReadingCoalescer
 from Functions.temperature_sweep import start_temperature_sweep
+from Functions.stabilization import AdaptiveHold
+from Functions.setpoint_planner import AdaptiveSetpoints
+from Functions.analysis_pool import AnalysisPool, find_runs
+from Functions.analysis_cache import AnalysisCache
+from Functions.live_analysis import LiveLCST
+from Functions.run_index import RunIndex, indexed_runs, COMPONENTS
+from Functions.decimation import MinMaxDecimator
+from Functions.lcst_analysis import HOLD_WINDOW_MINUTES, ROLLING_WINDOW
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.backends.backend_qtagg import NavigationToolbar2QT as NavigationToolbar
 from matplotlib.figure import Figure
@@ -37,7 +56,17 @@ valve_group_pins = {
     'Group3': [45, 44, 43, 42, 41],
 }
 
+pin_outputs = None  # PinOutputManager created by setup_board
 port = None
+serial_factory = serial.Serial
+clock = time  # replaced by a ScaledClock when running against the simulator
+GUI_FRAME_RATE_HZ = 15  # label refresh rate of the Control Panel
+OUTPUT_STATS_INTERVAL_MS = 5000
+LIVE_POLL_INTERVAL_MS = 2000  # run log polling of followed sweeps
+STRIP_CHART_RATE_HZ = 5  # frame rate of the Live Charts tab
+STRIP_CHART_SPANS = {"10 min": 600, "1 h": 3600, "6 h": 21600, "24 h": 86400}  # label -> seconds
+PID_RATE_HZ = 1.0  # control rate shared by all Peltier channels
+SETPOINT_RAMP_RATE = None  # °C per minute for sweep setpoint changes; None steps them directly
 
 def find_arduino_port():
     """
@@ -55,11 +84,19 @@ def find_arduino_port():
                 return port.device
     return None
 
-def initialize_hardware():
-    global board, motor_pins, mdd3a_pins, valve_group_pins
+def initialize_hardware(simulate=False, speedup=1.0, firmware_steppers=False):
+    global board, motor_pins, mdd3a_pins, valve_group_pins, pin_outputs, port, serial_factory, clock
+    if simulate:
+        clock = ScaledClock(speedup)
+        board, motor_pins, mdd3a_pins, valve_group_pins, pin_outputs = setup_board(SimulatedArduinoMega(clock=clock), firmware_steppers=True)
+        port = SIMULATED_PORT
+        serial_factory = board.open_serial
+        print(f"Running against the simulated board at {speedup}x real time.")
+        return
+
     port = find_arduino_port()
     if port:
-        board, motor_pins, mdd3a_pins, valve_group_pins = initialize_board(port)
+        board, motor_pins, mdd3a_pins, valve_group_pins, pin_outputs = initialize_board(port, firmware_steppers)
         it = pyfirmata.util.Iterator(board)
         it.start()
         # Initialize photodiode pins and other components as in your original script
@@ -67,9 +104,10 @@ def initialize_hardware():
         print("Arduino not found. Please check your connections.")
 
 class MotorControlWidget(QGroupBox):
-    def __init__(self, motor_id):
+    def __init__(self, motor_id, motion):
         super().__init__(f"Motor {motor_id}")
         self.motor_id = motor_id
+        self.motion = motion
         self.init_ui()
         self.disable_motor()  # Disable motor on initialization
 
@@ -104,22 +142,30 @@ class MotorControlWidget(QGroupBox):
         mode = self.mode_var.currentData()
         volume = float(self.volume_entry.text()) if self.volume_entry.text() else 0
         direction, speed = mode.split('-')
-        motor = motor_pins[self.motor_id]
-        
-        # Enable the motor before starting
-        if 'enable_pin' in motor:
-            motor['enable_pin'].write(0)  # Set enable pin to LOW to enable the motor
-        
-        threading.Thread(target=control_motor, args=(motor, int(direction), speed, volume)).start()
+        if self.motion is None:
+            print(f"Cannot run {self.motor_id}. Board not available.")
+            return
+
+        # Queued behind earlier moves of this pump; other pumps run concurrently
+        future = self.motion.move(self.motor_id, int(direction), speed, volume)
+        future.add_done_callback(self.report_move)
+
+    def report_move(self, future):
+        if not future.cancelled() and future.exception() is None:
+            result = future.result()
+            print(f"{self.motor_id} moved {result['steps']} steps in {result['duration']:.1f} s "
+                  f"(queued {result['wait']:.1f} s)")
 
 class TemperatureControlWidget(QWidget):
-    def __init__(self, board, mdd3a_pins):
+    def __init__(self, board, mdd3a_pins, telemetry, runtime, scheduler):
         super().__init__()
         self.board = board
         self.mdd3a_pins = mdd3a_pins
-        self.pids = initialize_pids()
-        set_pid_output_limits(self.pids)
+        self.telemetry = telemetry
+        self.runtime = runtime
+        self.scheduler = scheduler
         self.monitoring_events = {i: threading.Event() for i in range(5)}
+        self.holder_compositions = {}  # holder/sensor index -> composition dispensed into it
         self.init_ui()
 
     def init_ui(self):
@@ -129,6 +175,8 @@ class TemperatureControlWidget(QWidget):
         self.end_temps = {}
         self.step_sizes = {}
         self.hold_times = {}
+        self.adaptive_holds = {}
+        self.adaptive_steps = {}
         self.analog_labels = {}
 
         for i in range(5):
@@ -169,6 +217,20 @@ class TemperatureControlWidget(QWidget):
             disable_button.clicked.connect(lambda checked, i=i: self.stop_monitoring(i))
             layout.addWidget(disable_button, row, 10)
 
+            adaptive_check = QCheckBox("Adaptive hold")
+            adaptive_check.setToolTip("End each hold early once the UV reading has converged")
+            layout.addWidget(adaptive_check, row, 11)
+            self.adaptive_holds[i] = adaptive_check
+
+            refine_check = QCheckBox("Adaptive steps")
+            refine_check.setToolTip("Use the step as a coarse step and refine it through the cloud point")
+            layout.addWidget(refine_check, row, 12)
+            self.adaptive_steps[i] = refine_check
+
+            tune_button = QPushButton(f"Auto-tune {i+1}")
+            tune_button.clicked.connect(lambda checked, i=i: self.start_autotune(i))
+            layout.addWidget(tune_button, row, 13)
+
         # Add analog labels
         for i in range(5):
             analog_label = QLabel(f"Analog Reading {i+1}: --")
@@ -178,30 +240,49 @@ class TemperatureControlWidget(QWidget):
         self.setLayout(layout)
 
     def start_temperature_sweep(self, i):
-        if not self.monitoring_events[i].is_set():
+        if self.runtime.is_running(f'sweep{i}') and not self.monitoring_events[i].is_set():
+            # Setting the event now would revive the stopped sweep on a channel it no longer owns
+            print(f"The previous sweep on sensor {i + 1} is still shutting down; start again in a moment")
+        elif not self.monitoring_events[i].is_set():
             self.monitoring_events[i].set()
-            start_temperature_sweep(i, 
+            task = start_temperature_sweep(i, 
                                     self.start_temps,
                                     self.end_temps,
                                     self.step_sizes,
                                     self.hold_times,
-                                    self.pids,
+                                    self.scheduler,
                                     self.monitoring_events,
-                                    self.temp_labels,
-                                    self.analog_labels,
-                                    self.board,
-                                    self.mdd3a_pins)
+                                    self.telemetry,
+                                    self.runtime,
+                                    hold_policy=AdaptiveHold() if self.adaptive_holds[i].isChecked() else None,
+                                    setpoint_plan=AdaptiveSetpoints() if self.adaptive_steps[i].isChecked() else None,
+                                    composition=self.holder_compositions.get(i))
+            if task is None:
+                self.monitoring_events[i].clear()
+                if self.runtime.is_running(f'sweep{i}'):
+                    print(f"The previous sweep on sensor {i + 1} is still shutting down; start again in a moment")
         else:
             print(f"Temperature sweep already in progress for sensor {i + 1}")
 
+    def start_autotune(self, i):
+        if self.monitoring_events[i].is_set():
+            print(f"Stop the sweep on sensor {i + 1} before auto-tuning")
+            return
+        if self.runtime.submit(f'tune{i}', autotune(i, self.scheduler, self.telemetry, self.runtime)) is None:
+            print(f"Auto-tune already in progress for sensor {i + 1}")
+        else:
+            print(f"Auto-tuning Peltier {i + 1}; this takes about 20 minutes")
+
     def stop_monitoring(self, i):
-        stop_monitoring(i, self.monitoring_events, self.board, self.mdd3a_pins)
+        self.runtime.cancel(f'tune{i}')
+        stop_monitoring(i, self.monitoring_events, self.scheduler)
 
 
 class ValveControlWidget(QWidget):
-    def __init__(self, board):
+    def __init__(self, board, outputs):
         super().__init__()
         self.board = board
+        self.outputs = outputs
         self.init_ui()
 
     def init_ui(self):
@@ -219,27 +300,57 @@ class ValveControlWidget(QWidget):
 
     def toggle_valve(self, pin, state):
         if self.board:
-            try:
-                # Try to get the existing pin object
-                valve_pin = self.board.get_pin(f'd:{pin}:o')
-            except pyfirmata.pyfirmata.PinAlreadyTakenError:
-                # If the pin is already taken, it's likely set up correctly, so we can use it
-                valve_pin = self.board.digital[pin]
-            
+            # Valve pins are configured and cached by the output manager in setup_board
+            valve_pin = self.outputs.pin(f'd:{pin}:o')
             valve_pin.write(1 if state else 0)
             print(f"Valve {pin} {'opened' if state else 'closed'}")
         else:
             print(f"Cannot toggle valve {pin}. Board not available.")
 
 class MainWindow(QMainWindow):
+    task_finished = pyqtSignal(str, object)  # emitted from the runtime thread, handled on the GUI thread
+    analysis_progress = pyqtSignal(int, object, object)  # emitted from the analysis pool, handled on the GUI thread
+    index_rescanned = pyqtSignal(object)  # number of re-indexed logs, or the error; emitted from the rescan thread
+
     def __init__(self, board, mdd3a_pins):
         super().__init__()
         self.board = board
         self.mdd3a_pins = mdd3a_pins
         self.setWindowTitle("Automated Liquid Distribution System")
-        self.serial_reader = None
+        self.serial_ingestor = None
+        self.dispensing_compositions = {}  # holder -> composition of the dispense plan that is running
+        self.task_finished.connect(self.on_task_finished)
+        self.analysis_pool = AnalysisPool(cache=AnalysisCache())
+        self.analysis_batch = None
+        # Queued so cached results reported from inside submit() arrive after analysis_batch is set
+        self.analysis_progress.connect(self.on_analysis_result, Qt.ConnectionType.QueuedConnection)
+        self.live_runs = {}  # run log path -> LiveLCST
+        self.run_index = RunIndex()
+        self.indexed_runs = None  # runs loaded from the index instead of selected folders
+        self.index_rescanned.connect(self.on_index_rescanned)
+        self.live_timer = QTimer(self)
+        self.live_timer.timeout.connect(self.update_live_runs)
+        self.runtime = HardwareRuntime(clock, on_task_done=self.task_finished.emit)
+        self.runtime.start()
+        self.telemetry = TelemetryStore(clock=clock.monotonic)
+        self.pid_scheduler = PIDScheduler(self.telemetry, board, mdd3a_pins, pin_outputs, rate_hz=PID_RATE_HZ)
+        apply_tuning(self.pid_scheduler, load_tuning())
+        for channel in range(self.pid_scheduler.n_channels):
+            self.pid_scheduler.set_ramp(channel, SETPOINT_RAMP_RATE)
+        self.motion = None
+        if board is not None:
+            self.runtime.submit('pid', self.pid_scheduler.run(self.runtime))
+            self.motion = MotionManager(motor_pins, self.runtime)
+        self.reading_coalescer = ReadingCoalescer(self.telemetry, GUI_FRAME_RATE_HZ, self)
+        self.reading_coalescer.readings_updated.connect(self.update_readings_slot)
         self.init_ui()
         self.start_serial_reader()
+        self.reading_coalescer.start()
+
+        # Firmata traffic summary in the status bar
+        self.output_stats_timer = QTimer(self)
+        self.output_stats_timer.timeout.connect(self.update_output_stats)
+        self.output_stats_timer.start(OUTPUT_STATS_INTERVAL_MS)
 
     def init_ui(self):
         central_widget = QWidget()
@@ -255,6 +366,10 @@ class MainWindow(QMainWindow):
         control_panel_tab.setLayout(control_panel_layout)
         tab_widget.addTab(control_panel_tab, "Control Panel")
 
+        # Create and add Live Charts tab
+        self.strip_chart = StripChartWidget(self.telemetry)
+        tab_widget.addTab(self.strip_chart, "Live Charts")
+
         # Create and add Data Analysis tab
         data_analysis_tab = QWidget()
         data_analysis_layout = QVBoxLayout()
@@ -313,16 +428,19 @@ class MainWindow(QMainWindow):
         # Motor Control Section
         motor_layout = QHBoxLayout()
         for motor_id in motor_pins.keys():
-            motor_widget = MotorControlWidget(motor_id)
+            motor_widget = MotorControlWidget(motor_id, self.motion)
             motor_layout.addWidget(motor_widget)
+        dispense_button = QPushButton("Run Dispense Plan...")
+        dispense_button.clicked.connect(self.run_dispense_plan)
+        motor_layout.addWidget(dispense_button)
         layout.addLayout(motor_layout)
 
         # Temperature Control Section
-        self.temp_widget = TemperatureControlWidget(self.board, self.mdd3a_pins)
+        self.temp_widget = TemperatureControlWidget(self.board, self.mdd3a_pins, self.telemetry, self.runtime, self.pid_scheduler)
         layout.addWidget(self.temp_widget)
 
         # Valve Control Section
-        valve_widget = ValveControlWidget(self.board)
+        valve_widget = ValveControlWidget(self.board, pin_outputs)
         layout.addWidget(valve_widget)
 
 
@@ -331,6 +449,28 @@ class MainWindow(QMainWindow):
         self.folder_list = QListWidget()
         select_folder_button = QPushButton("Select Folders")
         analyze_button = QPushButton("Analyze")
+        self.cancel_analysis_button = QPushButton("Cancel")
+        self.cancel_analysis_button.setEnabled(False)
+        self.analysis_progress_bar = QProgressBar()
+        follow_button = QPushButton("Follow Live Run...")
+        follow_button.setToolTip("Plot the LCST curve of a running sweep from its run log, updated after every hold")
+        stop_follow_button = QPushButton("Stop Following")
+        self.window_entry = QLineEdit(f"{HOLD_WINDOW_MINUTES:g}")
+        self.rolling_entry = QLineEdit(str(ROLLING_WINDOW))
+        self.rescan_button = QPushButton("Rescan Index")
+        self.rescan_button.setToolTip("Add new or changed runs under Data/ to the run index")
+        load_index_button = QPushButton("Load from Index")
+        self.index_sensor = QComboBox()
+        self.index_sensor.addItems(["All"] + [str(i + 1) for i in range(5)])
+        self.index_lcst_min = QLineEdit()
+        self.index_lcst_max = QLineEdit()
+        self.index_since = QLineEdit()
+        self.index_since.setPlaceholderText("YYYY-MM-DD")
+        self.index_component = QComboBox()
+        self.index_component.addItems(["Any"] + list(COMPONENTS))
+        self.index_component_min = QLineEdit()
+        self.index_component_max = QLineEdit()
+        self.index_clean = QCheckBox("Unflagged only")
         
         # Create plot widgets
         plot_layout = QHBoxLayout()
@@ -342,19 +482,52 @@ class MainWindow(QMainWindow):
         # Connect buttons to functions
         select_folder_button.clicked.connect(self.select_folders)
         analyze_button.clicked.connect(self.analyze_data)
+        self.cancel_analysis_button.clicked.connect(self.cancel_analysis)
+        follow_button.clicked.connect(self.follow_live_run)
+        stop_follow_button.clicked.connect(self.stop_following)
+        self.rescan_button.clicked.connect(self.rescan_index)
+        load_index_button.clicked.connect(self.load_from_index)
 
         # Create layout
         button_layout = QHBoxLayout()
         button_layout.addWidget(select_folder_button)
+        button_layout.addWidget(QLabel("Hold window (mins):"))
+        button_layout.addWidget(self.window_entry)
+        button_layout.addWidget(QLabel("Rolling size:"))
+        button_layout.addWidget(self.rolling_entry)
         button_layout.addWidget(analyze_button)
+        button_layout.addWidget(self.cancel_analysis_button)
+        button_layout.addWidget(self.analysis_progress_bar)
+        button_layout.addWidget(follow_button)
+        button_layout.addWidget(stop_follow_button)
+
+        index_layout = QHBoxLayout()
+        index_layout.addWidget(self.rescan_button)
+        index_layout.addWidget(QLabel("Sensor:"))
+        index_layout.addWidget(self.index_sensor)
+        index_layout.addWidget(QLabel("LCST (°C):"))
+        index_layout.addWidget(self.index_lcst_min)
+        index_layout.addWidget(QLabel("to"))
+        index_layout.addWidget(self.index_lcst_max)
+        index_layout.addWidget(QLabel("Since:"))
+        index_layout.addWidget(self.index_since)
+        index_layout.addWidget(QLabel("Component:"))
+        index_layout.addWidget(self.index_component)
+        index_layout.addWidget(self.index_component_min)
+        index_layout.addWidget(QLabel("to"))
+        index_layout.addWidget(self.index_component_max)
+        index_layout.addWidget(self.index_clean)
+        index_layout.addWidget(load_index_button)
 
         layout.addWidget(QLabel("Selected Folders:"))
         layout.addWidget(self.folder_list)
+        layout.addLayout(index_layout)
         layout.addLayout(button_layout)
         layout.addLayout(plot_layout)
 
     def select_folders(self):
         self.folder_list.clear()
+        self.indexed_runs = None
         while True:
             folder = QFileDialog.getExistingDirectory(self, "Select Folder", "", QFileDialog.Option.ShowDirsOnly)
             if folder:
@@ -371,61 +544,208 @@ class MainWindow(QMainWindow):
         if self.folder_list.count() == 0:
             QMessageBox.information(self, "No Folders Selected", "No folders were selected for analysis.")
 
+    def analysis_parameters(self):
+        """(hold window in minutes, rolling size) from the Data Analysis tab, or None if invalid."""
+        try:
+            window_minutes = float(self.window_entry.text())
+            rolling_window = int(self.rolling_entry.text())
+        except ValueError as e:
+            print(f"Invalid analysis parameters: {e}")
+            return None
+        if window_minutes <= 0 or rolling_window < 1:
+            print("Hold window and rolling size must be positive")
+            return None
+        return window_minutes, rolling_window
+
     def analyze_data(self):
         folders = [self.folder_list.item(i).text() for i in range(self.folder_list.count())]
         if not folders:
             print("No folders selected")
             return
+        parameters = self.analysis_parameters()
+        if parameters is None:
+            return
+        window_minutes, rolling_window = parameters
+
+        runs = self.indexed_runs if self.indexed_runs is not None else find_runs(folders)
+        if not runs:
+            print("No temperature logs found in the selected folders")
+            return
+        self.analysis_runs = runs
+        self.analysis_results = {}
+        self.analysis_progress_bar.setRange(0, len(runs))
+        self.analysis_progress_bar.setValue(0)
+        self.cancel_analysis_button.setEnabled(True)
+        self.analysis_batch = self.analysis_pool.submit(runs, self.analysis_progress.emit,
+                                                        window_minutes=window_minutes, rolling_window=rolling_window)
+
+    def rescan_index(self):
+        parameters = self.analysis_parameters()
+        if parameters is None:
+            return
+        self.rescan_button.setEnabled(False)
+        threading.Thread(target=self._rescan_index, args=parameters, daemon=True).start()
+
+    def _rescan_index(self, window_minutes, rolling_window):
+        try:
+            self.index_rescanned.emit(self.run_index.rescan(window_minutes=window_minutes, rolling_window=rolling_window,
+                                                            cache=self.analysis_pool.cache))
+        except (sqlite3.Error, OSError) as e:
+            self.index_rescanned.emit(e)
+
+    def on_index_rescanned(self, outcome):
+        self.rescan_button.setEnabled(True)
+        if isinstance(outcome, Exception):
+            print(f"Run index rescan failed: {outcome}")
+        else:
+            print(f"Run index updated: {outcome} sensor logs re-analysed")
 
-        all_data = []
-        for folder in folders:
-            for file in os.listdir(folder):
-                if file.startswith("temperature_log_sensor_") and file.endswith(".txt"):
-                    file_path = os.path.join(folder, file)
-                    sensor_data = self.parse_temperature_file(file_path)
-                    all_data.append((os.path.basename(folder), sensor_data))
+    def load_from_index(self):
+        def bound(entry):
+            return float(entry.text()) if entry.text().strip() else None
+
+        try:
+            lcst = (bound(self.index_lcst_min), bound(self.index_lcst_max))
+            component = self.index_component.currentText()
+            composition = {component: (bound(self.index_component_min), bound(self.index_component_max))} \
+                if component != "Any" else None
+        except ValueError as e:
+            print(f"Invalid index filter: {e}")
+            return
+        sensor = self.index_sensor.currentText()
+        since = self.index_since.text().strip() or None
+        try:
+            frame = self.run_index.query(sensor=int(sensor) if sensor != "All" else None, lcst=lcst,
+                                         started=(since, None), composition=composition,
+                                         clean=self.index_clean.isChecked())
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Run index query failed: {e}")
+            return
+        self.indexed_runs = indexed_runs(frame)
+        self.folder_list.clear()
+        for row in frame.itertuples():
+            lcst_text = f"{row.lcst:.2f} °C" if pd.notna(row.lcst) else "no LCST"
+            self.folder_list.addItem(f"{row.folder}  (sensor {row.sensor}, {lcst_text})")
+        print(f"Loaded {len(frame)} sensor logs from the run index")
 
+    def on_analysis_result(self, batch, run, future):
+        if batch != self.analysis_batch or future.cancelled():
+            return
+        try:
+            self.analysis_results[run] = future.result()
+        except Exception as e:
+            print(f"Analysis of {run[2]} failed: {e}")
+            self.analysis_results[run] = None
+        self.analysis_progress_bar.setValue(len(self.analysis_results))
+        if len(self.analysis_results) == len(self.analysis_runs):
+            self.cancel_analysis_button.setEnabled(False)
+            self.show_analysis()
+
+    def show_analysis(self):
+        all_data, lcst_data = [], []
+        for run in self.analysis_runs:
+            result = self.analysis_results[run]
+            if result is None:
+                continue
+            folder_name = os.path.basename(run[0])
+            all_data.append((folder_name, result['holds']))
+            if result['normalized_avgs']:
+                lcst_data.append((folder_name, result['temperatures'], result['normalized_avgs'], result['lcst']))
         self.temp_plot_widget.plot_data(all_data)
-        self.lcst_plot_widget.plot_lcst_data(folders)
-
-    def parse_temperature_file(self, file_path):
-        with open(file_path, 'r') as file:
-            lines = file.readlines()
-
-        sensor_temps = []
-        real_time_temps = []
-        current_temp = None
-
-        for line in lines:
-            if "Set Sensor" in line:
-                current_temp = float(line.split('to')[1].strip()[:-2].strip())
-            if "Real-time Hold Temp:" in line:
-                temp = float(line.split(':')[-1].strip()[:-2].strip())
-                if current_temp is not None:
-                    sensor_temps.append(current_temp)
-                    real_time_temps.append(temp)
-
-        return pd.DataFrame({
-            'Sensor Temperature': sensor_temps,
-            'Real-time Temperature': real_time_temps
-        })
+        self.lcst_plot_widget.plot_lcst_data(lcst_data)
+
+    def cancel_analysis(self):
+        self.analysis_pool.cancel()
+        self.analysis_batch = None
+        self.cancel_analysis_button.setEnabled(False)
+        self.analysis_progress_bar.setValue(0)
+        print("Analysis cancelled")
+
+    def follow_live_run(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Select Run Log", "Data", "Run logs (run_log_sensor_*.bin)")
+        parameters = self.analysis_parameters()
+        if not path or parameters is None:
+            return
+        self.live_runs[path] = LiveLCST(path, *parameters)
+        self.live_timer.start(LIVE_POLL_INTERVAL_MS)
+        self.update_live_runs()
+
+    def update_live_runs(self):
+        changed = [live.update() for live in self.live_runs.values()]
+        if any(changed):
+            results = []
+            for path, live in self.live_runs.items():
+                temperatures, normalized_avgs, lcst = live.curve()
+                label = f"{os.path.basename(os.path.dirname(path))} ({'finished' if live.finished else 'live'})"
+                results.append((label, temperatures, normalized_avgs, lcst))
+            self.lcst_plot_widget.plot_lcst_data(results)
+        if all(live.finished for live in self.live_runs.values()):
+            self.live_timer.stop()
+
+    def stop_following(self):
+        self.live_timer.stop()
+        self.live_runs = {}
 
     def start_serial_reader(self):
-        port = find_arduino_port()
         if port:
-            print(f"Initializing SerialReader with port: {port}")
-            if hasattr(self, 'serial_reader') and self.serial_reader:
-                self.serial_reader.stop()
-                self.serial_reader.wait()
-            
-            self.serial_reader = SerialReader(port, 57600)
-            self.serial_reader.temperature_updated.connect(self.update_temperature_slot)
-            self.serial_reader.analog_updated.connect(self.update_analog_slot)
-            self.serial_reader.start()
-            print("SerialReader started")
+            print(f"Starting serial ingestion on port: {port}")
+            # Labels are refreshed from the telemetry store by the coalescer, not per serial line
+            self.serial_ingestor = SerialIngestor(self.telemetry.update_temperature, self.telemetry.update_analog)
+            self.runtime.submit('serial', ingest_serial(self.serial_ingestor, port, 57600, serial_factory))
         else:
             print("Arduino port not found. Serial reading not started.")
 
+    def run_dispense_plan(self):
+        if self.motion is None:
+            print("Cannot dispense. Board not available.")
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "Select Target Compositions", "", "CSV Files (*.csv)")
+        if not path:
+            return
+        try:
+            plan = plan_dispense(load_compositions(path), firmware_steppers='stepper' in motor_pins['motor1'])
+        except (OSError, ValueError, KeyError) as e:
+            QMessageBox.warning(self, "Dispense Plan", f"Could not plan {path}: {e}")
+            return
+        print(format_plan(plan))
+        # The holders have to be emptied between rounds, so one run fills at most one round
+        first_round = plan['rounds'][0] if plan['rounds'] else []
+        duration = max((job['end'] for job in first_round), default=0.0)
+        message = f"{len(first_round)} moves, planned duration {duration:.0f} s. Start dispensing?"
+        if len(plan['rounds']) > 1:
+            message = (f"The file has {len(plan['samples'])} samples; only the first {len(set(j['sample'] for j in first_round))} "
+                       f"are dispensed now. " + message)
+        reply = QMessageBox.question(self, "Dispense Plan", message)
+        if reply == QMessageBox.StandardButton.Yes:
+            if self.runtime.submit('dispense', execute_plan(plan, self.motion, valve_group_pins, pin_outputs,
+                                                            self.runtime, rounds=[0])) is None:
+                print("A dispense plan is already running.")
+            else:
+                # The holders are being refilled; their compositions are known again once the plan completes
+                self.temp_widget.holder_compositions = {}
+                self.dispensing_compositions = {sample['holder']: sample['composition']
+                                                for sample in plan['samples'][:N_HOLDERS]}
+
+    def update_output_stats(self):
+        if pin_outputs is not None:
+            stats = pin_outputs.get_stats()
+            self.statusBar().showMessage(f"Firmata writes: {stats['messages_per_sec']:.1f}/s "
+                                         f"({stats['messages']} sent, {stats['suppressed']} suppressed)")
+
+    def on_task_finished(self, name, error):
+        if name == 'dispense':
+            if error is None:
+                self.temp_widget.holder_compositions = self.dispensing_compositions
+            self.dispensing_compositions = {}
+        if error is not None and not isinstance(error, asyncio.CancelledError):
+            print(f"Hardware task {name} stopped with an error: {error}")
+
+    def update_readings_slot(self, temperatures, analog_values):
+        for sensor_number, temperature in temperatures.items():
+            self.update_temperature_slot(sensor_number, temperature)
+        for sensor_number, analog_value in analog_values.items():
+            self.update_analog_slot(sensor_number, int(analog_value))
+
     def update_temperature_slot(self, sensor_number, temperature):
         try:
             label = self.temp_widget.temp_labels.get(sensor_number)
@@ -449,64 +769,181 @@ class MainWindow(QMainWindow):
             print(f"Failed to update analog label: {e}")
 
     def closeEvent(self, event):
-        if self.serial_reader:
-            self.serial_reader.stop()
-            self.serial_reader.wait()
+        self.reading_coalescer.stop()
+        # Cancels sweeps, monitors, motor jobs and serial ingestion; their cleanup disables the hardware
+        self.runtime.shutdown()
+        self.analysis_pool.shutdown()
         event.accept()
 
+class StripChartWidget(QWidget):
+    """
+    Rolling charts of the temperature and UV history of all channels, read from the telemetry store.
+    Each frame only the samples received since the previous one are merged into min/max buckets
+    (Functions.decimation), and the lines are blitted over a cached background; the axes are
+    redrawn only when a reading leaves the y range or the span changes. Hidden charts are not drawn.
+    """
+
+    def __init__(self, telemetry):
+        super().__init__()
+        self.telemetry = telemetry
+        self.figure = Figure(figsize=(10, 6), dpi=100)
+        self.canvas = FigureCanvas(self.figure)
+        self.temperature_ax, self.uv_ax = self.figure.subplots(2, 1, sharex=True)
+        self.temperature_ax.set_ylabel("Temperature (°C)")
+        self.uv_ax.set_ylabel("UV reading")
+        self.uv_ax.set_xlabel("Minutes ago")
+        self.lines = {}
+        for kind, ax in (('temperature', self.temperature_ax), ('analog', self.uv_ax)):
+            for channel in range(telemetry.n_channels):
+                self.lines[kind, channel], = ax.plot([], [], lw=1, label=f"Sensor {channel + 1}", animated=True)
+            ax.grid(True, alpha=0.3)
+        self.temperature_ax.legend(loc='upper left', fontsize='small', ncol=telemetry.n_channels)
+        self.figure.tight_layout()
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
+        self.span_box = QComboBox()
+        self.span_box.addItems(STRIP_CHART_SPANS)
+        self.span_box.currentTextChanged.connect(self.set_span)
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel("History:"))
+        controls.addWidget(self.span_box)
+        controls.addStretch()
+        layout = QVBoxLayout()
+        layout.addLayout(controls)
+        layout.addWidget(self.canvas)
+        self.setLayout(layout)
+
+        self.set_span(self.span_box.currentText())
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(int(1000 / STRIP_CHART_RATE_HZ))
+
+    def set_span(self, label):
+        self.span = STRIP_CHART_SPANS[label]
+        # Rebuilt from the whole stored history, which the telemetry store keeps for a day
+        self.decimators = {key: MinMaxDecimator(self.span) for key in self.lines}
+        self.read_counts = {key: 0 for key in self.lines}
+        self.temperature_ax.set_xlim(-self.span / 60, 0)
+        self.refresh(force=True)
+
+    def on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.draw_lines()
+
+    def refresh(self, force=False):
+        if not self.isVisible() and not force:
+            return
+        now = self.telemetry.clock()
+        for key, line in self.lines.items():
+            kind, channel = key
+            buffer = self.telemetry.temperature[channel] if kind == 'temperature' else self.telemetry.analog[channel]
+            timestamps, values, self.read_counts[key] = buffer.read_from(self.read_counts[key])
+            self.decimators[key].add(timestamps, values)
+            times, envelope = self.decimators[key].envelope()
+            line.set_data((times - now) / 60, envelope)
+
+        rescaled = force
+        for kind, ax in (('temperature', self.temperature_ax), ('analog', self.uv_ax)):
+            ranges = [self.decimators[key].value_range(now - self.span) for key in self.lines if key[0] == kind]
+            ranges = [r for r in ranges if r is not None]
+            if not ranges:
+                continue
+            low, high = min(r[0] for r in ranges), max(r[1] for r in ranges)
+            bottom, top = ax.get_ylim()
+            margin = max(high - low, 1.0) * 0.1
+            # Rescale when a reading leaves the axis or the data shrank to a small part of it
+            if low < bottom or high > top or (top - bottom) > 4 * (high - low + 2 * margin):
+                ax.set_ylim(low - margin, high + margin)
+                rescaled = True
+        if rescaled or self.background is None:
+            self.canvas.draw_idle()  # on_draw captures the new background and blits the lines
+        else:
+            self.draw_lines()
+
+    def draw_lines(self):
+        if self.background is None:
+            return
+        self.canvas.restore_region(self.background)
+        for (kind, _), line in self.lines.items():
+            (self.temperature_ax if kind == 'temperature' else self.uv_ax).draw_artist(line)
+        self.canvas.blit(self.figure.bbox)
+
+
 class PlotWidget(QWidget):
+    """
+    Figure with a toolbar and a "Rename Legend Items" button.
+    Subclasses keep their artists between plots and update them in place; redraws go through
+    draw_idle, so repeated plots and clicks never pile up handlers or full redraws.
+    """
+
     def __init__(self, title):
         super().__init__()
         self.figure = Figure(figsize=(5, 4), dpi=100)
         self.canvas = FigureCanvas(self.figure)
         self.ax = self.figure.add_subplot(111)
         self.toolbar = NavigationToolbar(self.canvas, self)
-        
+        self.lines = []  # lines of the current plot, in legend order
+        self.data = {}
+        self.legend = None
+        self.legend_texts = {}  # plotted line -> its legend text
+
+        # Add a rename button
+        self.rename_button = QPushButton("Rename Legend Items")
+        self.rename_button.clicked.connect(self.rename_legend_items)
+
         layout = QVBoxLayout()
         layout.addWidget(self.toolbar)
+        layout.addWidget(self.rename_button)
         layout.addWidget(self.canvas)
         self.setLayout(layout)
         
         self.ax.set_title(title)
+        self.ax.grid(True)
         
         # Enable tight layout to prevent clipping of labels
         self.figure.tight_layout()
 
-class TemperaturePlotWidget(PlotWidget):
-    def __init__(self):
-        super().__init__('Set Temperature vs Real-time Reading Temperature')
-        self.lines = []
-        self.data = {}
-        
-        # Add a rename button
-        self.rename_button = QPushButton("Rename Legend Items")
-        self.rename_button.clicked.connect(self.rename_legend_items)
-        self.layout().insertWidget(1, self.rename_button)  # Insert button after the toolbar
-
-    def plot_data(self, all_data):
-        self.ax.clear()
-        self.lines = []
-        self.data = {}
-
-        for folder_name, df in all_data:
-            summary_df = df.groupby('Sensor Temperature').agg(['mean', 'std']).reset_index()
-            summary_df.columns = ['Sensor Temperature', 'Mean Temperature', 'Temperature STD']
-            
-            line, = self.ax.plot(summary_df['Sensor Temperature'], summary_df['Mean Temperature'], 
-                                 '-o', label=folder_name)
-            self.ax.fill_between(summary_df['Sensor Temperature'],
-                                 summary_df['Mean Temperature'] - summary_df['Temperature STD'],
-                                 summary_df['Mean Temperature'] + summary_df['Temperature STD'],
-                                 alpha=0.3)
-            self.lines.append(line)
-            self.data[folder_name] = {'line': line, 'df': summary_df}
-
-        self.ax.set_xlabel('Set Temperature (°C)')
-        self.ax.set_ylabel('Real-time Reading Temperature (°C)')
-        self.ax.legend()
-        self.ax.grid(True)
-
-        self.canvas.draw()
+    def reuse_lines(self, pool, count, **style):
+        """The first `count` lines of `pool`, plotting new ones only when the pool is too small; the rest are hidden."""
+        while len(pool) < count:
+            line, = self.ax.plot([], [], **style)
+            pool.append(line)
+        for line in pool[count:]:
+            line.set_data([], [])
+            line.set_visible(False)
+        for line in pool[:count]:
+            line.set_visible(True)
+            line.set_alpha(None)
+        return pool[:count]
+
+    def rebuild_legend(self):
+        """New legend for the current lines; called once per plot, not per interaction."""
+        if self.legend is not None:
+            self.legend.set_draggable(False)  # disconnects the old legend's mouse handlers
+            self.legend.remove()
+            self.legend = None
+        self.legend_texts = {}
+        if not self.lines:
+            return None
+        self.legend = self.ax.legend(handles=self.lines)
+        self.legend.set_draggable(True)
+        self.legend_texts = dict(zip(self.lines, self.legend.get_texts()))
+        return self.legend
+
+    def rescale(self, extra_points=()):
+        """Fit the axes to the visible lines and any (n, 2) point arrays relim does not see."""
+        self.ax.relim(visible_only=True)
+        for points in extra_points:
+            self.ax.update_datalim(points)
+        self.ax.autoscale_view()
+
+    def rename_line(self, line, new_label):
+        old_label = line.get_label()
+        line.set_label(new_label)
+        self.data[new_label] = self.data.pop(old_label)
+        self.legend_texts[line].set_text(new_label)
+        self.canvas.draw_idle()
 
     def rename_legend_items(self):
         if not self.lines:
@@ -518,182 +955,110 @@ class TemperaturePlotWidget(PlotWidget):
         if ok and item:
             new_label, ok = QInputDialog.getText(self, 'Rename Legend Item', f'Enter new label for {item}:', text=item)
             if ok and new_label:
-                for line in self.lines:
-                    if line.get_label() == item:
-                        line.set_label(new_label)
-                        self.data[new_label] = self.data.pop(item)
-                        break
-                self.ax.legend()
-                self.canvas.draw()
+                self.rename_line(self.lines[items.index(item)], new_label)
 
-class LCSTPlotWidget(PlotWidget):
+class TemperaturePlotWidget(PlotWidget):
     def __init__(self):
-        super().__init__('Normalized Rolling Average UV Readings Across Different Conditions')
-        self.lines = []
-        self.data = {}
-        
-        # Add a rename button
-        self.rename_button = QPushButton("Rename Legend Items")
-        self.rename_button.clicked.connect(self.rename_legend_items)
-        self.layout().insertWidget(1, self.rename_button)
+        super().__init__('Set Temperature vs Real-time Reading Temperature')
+        self.line_pool = []
+        self.bands = []  # ±1 std band of each pooled line
+        self.ax.set_xlabel('Set Temperature (°C)')
+        self.ax.set_ylabel('Real-time Reading Temperature (°C)')
 
-    def plot_lcst_data(self, folders):
-        self.ax.clear()
-        colors = ['blue', 'green', 'red', 'purple', 'orange']
-        self.lines = []
+    def plot_data(self, all_data):
+        self.lines = self.reuse_lines(self.line_pool, len(all_data), linestyle='-', marker='o')
         self.data = {}
 
-        for folder in folders:
-            for sensor in range(1, 6):  # Assuming up to 5 sensors
-                temp_file = os.path.join(folder, f'temperature_log_sensor_{sensor}.txt')
-                uv_file = os.path.join(folder, f'uv_log_sensor_{sensor}.txt')
-                if os.path.exists(temp_file) and os.path.exists(uv_file):
-                    temp_df, uv_df = self.parse_file(temp_file, uv_file)
-                    temperatures, normalized_avgs = self.compute_normalized_averages(temp_df, uv_df)
-                    if normalized_avgs:
-                        lcst = self.interpolate_temperature(temperatures, normalized_avgs)
-                        label = f"{os.path.basename(folder)}"
-                        if isinstance(lcst, float):  # Only add LCST if it's a valid number
-                            label += f' (50% at {lcst:.2f}°C)'
-                        color = colors[(len(self.lines) % len(colors))]
-                        line, = self.ax.plot(temperatures, normalized_avgs, marker='o', 
-                                           linestyle='-', color=color, label=label)
-                        self.lines.append(line)
-                        self.data[label] = {
-                            'line': line, 
-                            'temperatures': temperatures, 
-                            'normalized_avgs': normalized_avgs
-                        }
+        for i, ((folder_name, df), line) in enumerate(zip(all_data, self.lines)):
+            summary_df = df.groupby('Sensor Temperature').agg(['mean', 'std']).reset_index()
+            summary_df.columns = ['Sensor Temperature', 'Mean Temperature', 'Temperature STD']
+            x = summary_df['Sensor Temperature'].to_numpy()
+            mean = summary_df['Mean Temperature'].to_numpy()
+            std = summary_df['Temperature STD'].fillna(0).to_numpy()
+
+            line.set_data(x, mean)
+            line.set_label(folder_name)
+            if i == len(self.bands):
+                self.bands.append(self.ax.fill_between([], [], [], alpha=0.3))
+            band = self.bands[i]
+            band.set_verts([np.column_stack((np.concatenate((x, x[::-1])),
+                                             np.concatenate((mean - std, (mean + std)[::-1]))))])
+            band.set_facecolor(line.get_color())
+            band.set_alpha(0.3)
+            band.set_visible(True)
+            self.data[folder_name] = {'line': line, 'df': summary_df}
+        for band in self.bands[len(all_data):]:
+            band.set_visible(False)
+
+        self.rebuild_legend()
+        self.rescale([band.get_paths()[0].vertices for band in self.bands[:len(all_data)]])
+        self.canvas.draw_idle()
 
+class LCSTPlotWidget(PlotWidget):
+    def __init__(self):
+        super().__init__('Normalized Rolling Average UV Readings Across Different Conditions')
+        self.line_pool = []
+        self.legend_lines = {}  # legend line -> plotted line it toggles
         self.ax.set_xlabel('Holding Temperature (°C)')
         self.ax.set_ylabel('Normalized Average UV Reading (%)')
-        self.ax.grid(True)
         self.ax.axhline(y=50, color='red', linestyle='--')
+        # Connected once; plot_lcst_data only swaps the artists the handler looks up
+        self.canvas.mpl_connect('pick_event', self.on_pick)
 
-        leg = self.ax.legend()
-        leg.set_draggable(True)
-        for legline, origline in zip(leg.get_lines(), self.lines):
-            legline.set_picker(5)
-            legline.set_pickradius(5)
+    def plot_lcst_data(self, results):
+        """:param results: (label, temperatures, normalized averages, LCST or None) per run."""
+        colors = ['blue', 'green', 'red', 'purple', 'orange']
+        self.lines = self.reuse_lines(self.line_pool, len(results), marker='o', linestyle='-', picker=5)
+        self.data = {}
 
-        self.canvas.mpl_connect('pick_event', self.on_pick)
-        self.canvas.mpl_connect('button_press_event', self.on_click)
-        self.canvas.draw()
-
-    def parse_file(self, temp_file, uv_file):
-        temp_data, uv_data = [], []
-        with open(temp_file, 'r') as f:
-            for line in f:
-                parts = line.strip().split(': ', 1)
-                if len(parts) == 2:
-                    temp_data.append(parts)
-        temp_df = pd.DataFrame(temp_data, columns=['Time', 'Event'])
-        temp_df['Time'] = pd.to_datetime(temp_df['Time'], errors='coerce')
-
-        with open(uv_file, 'r') as f:
-            for line in f:
-                parts = line.strip().split(': ', 2)
-                if len(parts) == 3:
-                    uv_data.append(parts)
-        uv_df = pd.DataFrame(uv_data, columns=['Time', 'Label', 'Value'])
-        uv_df['Time'] = pd.to_datetime(uv_df['Time'], errors='coerce')
-        uv_df['Value'] = pd.to_numeric(uv_df['Value'], errors='coerce')
-
-        return temp_df, uv_df
-
-    def compute_normalized_averages(self, temp_df, uv_df):
-        holding_events = temp_df[temp_df['Event'].str.contains('Holding')]
-        temperatures, normalized_avgs = [], []
-
-        for _, row in holding_events.iterrows():
-            start_time = row['Time']
-            end_time = start_time + pd.Timedelta(minutes=5)
-            mask = (uv_df['Time'] >= start_time) & (uv_df['Time'] <= end_time)
-            filtered_uv = uv_df.loc[mask, 'Value']
-
-            temp_value = float(row['Event'].split(' ')[1].replace('°C', ''))
-            temperatures.append(temp_value)
-
-            if not filtered_uv.empty:
-                rolling_avg = filtered_uv.rolling(window=20, min_periods=1).mean()
-                normalized_avgs.append(rolling_avg.mean())
-
-        if normalized_avgs:
-            max_val = max(normalized_avgs[:5])
-            min_val = min(normalized_avgs[-8:])
-            range_val = max_val - min_val
-            normalized_avgs = [(x - min_val) / range_val * 100 for x in normalized_avgs]
-
-        return temperatures, normalized_avgs
-
-    def interpolate_temperature(self, temperatures, normalized_avgs):
-        temps = np.array(temperatures)
-        avgs = np.array(normalized_avgs)
-
-        crossings = []
-        for i in range(len(avgs)-1):
-            if (avgs[i] - 50) * (avgs[i+1] - 50) <= 0:
-                t1, t2 = temps[i], temps[i+1]
-                v1, v2 = avgs[i], avgs[i+1]
-                if v1 != v2:
-                    t_50 = t1 + (t2 - t1) * (50 - v1) / (v2 - v1)
-                    crossings.append((t_50, i))
-
-        if not crossings:
-            return "50% is out of the interpolation range."
-
-        slopes = []
-        for t_50, i in crossings:
-            slope = abs(avgs[i+1] - avgs[i]) / (temps[i+1] - temps[i])
-            slopes.append((t_50, slope))
-
-        return max(slopes, key=lambda x: x[1])[0]
+        for i, ((label, temperatures, normalized_avgs, lcst), line) in enumerate(zip(results, self.lines)):
+            if lcst is not None:
+                label += f' (50% at {lcst:.2f}°C)'
+            line.set_data(temperatures, normalized_avgs)
+            line.set_color(colors[i % len(colors)])
+            line.set_label(label)
+            self.data[label] = {
+                'line': line,
+                'temperatures': temperatures,
+                'normalized_avgs': normalized_avgs
+            }
+
+        leg = self.rebuild_legend()
+        self.legend_lines = {}
+        if leg is not None:
+            for legline, origline in zip(leg.get_lines(), self.lines):
+                legline.set_picker(5)
+                legline.set_pickradius(5)
+                self.legend_lines[legline] = origline
+        self.rescale()
+        self.canvas.draw_idle()
 
     def on_pick(self, event):
-        if isinstance(event.artist, matplotlib.lines.Line2D):
-            line = event.artist
+        """Click a legend entry to hide or show its curve; double-click a curve to rename it."""
+        if event.artist in self.legend_lines:
+            line = self.legend_lines[event.artist]
             visible = not line.get_visible()
             line.set_visible(visible)
-            line.set_alpha(1.0 if visible else 0.2)
-            self.canvas.draw()
-
-    def on_click(self, event):
-        if event.dblclick:
-            for line in self.lines:
-                if line.contains(event)[0]:
-                    self.rename_legend_item(line)
-                    break
+            event.artist.set_alpha(1.0 if visible else 0.2)
+            self.canvas.draw_idle()
+        elif event.artist in self.legend_texts and event.mouseevent.dblclick:
+            self.rename_legend_item(event.artist)
 
     def rename_legend_item(self, line):
         old_label = line.get_label()
         new_label, ok = QInputDialog.getText(self, 'Rename Legend Item', f'Enter new label for {old_label}:', text=old_label)
         if ok and new_label:
-            line.set_label(new_label)
-            self.data[new_label] = self.data.pop(old_label)
-            self.ax.legend()
-            self.canvas.draw()
-
-    def rename_legend_items(self):
-        if not self.lines:
-            QMessageBox.information(self, "No Data", "No data to rename. Please plot data first.")
-            return
-
-        items = [line.get_label() for line in self.lines]
-        item, ok = QInputDialog.getItem(self, "Select Item to Rename", "Choose a legend item:", items, 0, False)
-        if ok and item:
-            new_label, ok = QInputDialog.getText(self, 'Rename Legend Item', f'Enter new label for {item}:', text=item)
-            if ok and new_label:
-                for line in self.lines:
-                    if line.get_label() == item:
-                        line.set_label(new_label)
-                        self.data[new_label] = self.data.pop(item)
-                        break
-                self.ax.legend()
-                self.canvas.draw()
+            self.rename_line(line, new_label)
 
 if __name__ == '__main__':
-    initialize_hardware()
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="Automated Liquid Distribution System")
+    parser.add_argument('--simulate', action='store_true', help="use the simulated board instead of an Arduino")
+    parser.add_argument('--speedup', type=float, default=1.0, help="simulated seconds per real second")
+    parser.add_argument('--firmware-steppers', action='store_true',
+                        help="let the board generate step pulses (requires ConfigurableFirmata with AccelStepperFirmata)")
+    args, qt_args = parser.parse_known_args()
+    initialize_hardware(simulate=args.simulate, speedup=args.speedup, firmware_steppers=args.firmware_steppers)
+    app = QApplication(sys.argv[:1] + qt_args)
     main_window = MainWindow(board, mdd3a_pins)
     main_window.show()
     sys.exit(app.exec())
\ No newline at end of file